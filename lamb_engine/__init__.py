@@ -5,4 +5,10 @@ from . import parser
 from .runner import Runner
 from .runner import StopReason
 
+from . import batch
+from . import pool
+from . import server
+from . import bench
+from . import binary
+
 from .__main__ import main
\ No newline at end of file
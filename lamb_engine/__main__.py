@@ -9,6 +9,18 @@ import lamb_engine
 
 def main():
 
+	# Run files without a prompt
+	if (len(sys.argv) > 1) and (sys.argv[1] == "--batch"):
+		sys.exit(lamb_engine.batch.main(sys.argv[2:]))
+
+	# Serve requests from other programs
+	if (len(sys.argv) > 1) and (sys.argv[1] == "--server"):
+		sys.exit(lamb_engine.server.main(sys.argv[2:]))
+
+	# Measure performance
+	if (len(sys.argv) > 1) and (sys.argv[1] == "--bench"):
+		sys.exit(lamb_engine.bench.main(sys.argv[2:]))
+
 	lamb_engine.utils.show_greeting()
 
 
@@ -31,7 +43,7 @@ def main():
 					("class:warn", "\nLoading file "),
 					("class:code", sys.argv[i]),
 				]), style = lamb_engine.utils.style)
-				r.run(":load " + sys.argv[i])
+				r.run(":load --quiet " + sys.argv[i])
 			except:
 				printf(FormattedText([
 					("class:err", "Error. Does this file exist?"),
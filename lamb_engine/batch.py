@@ -0,0 +1,401 @@
+from prompt_toolkit.application.current import create_app_session
+from prompt_toolkit.output import create_output
+from pyparsing import exceptions as ppx
+import json
+import signal
+import sys
+
+import lamb_engine
+from lamb_engine.runner.misc import MacroDef
+from lamb_engine.runner.misc import Command
+from lamb_engine.runner.misc import StopReason
+
+
+# Stop reasons that mean we found a result.
+found = {
+	StopReason.BETA_NORMAL.name.lower(),
+	StopReason.WEAK_NORMAL.name.lower(),
+	StopReason.HEAD_NORMAL.name.lower(),
+	StopReason.WEAK_HEAD_NORMAL.name.lower(),
+	StopReason.SHOW_MACRO.name.lower()
+}
+
+class Timeout(KeyboardInterrupt):
+	"""
+	Raised by a timer when a line takes too long.
+	Runner.evaluate() stops on this just like it does on Ctrl-C.
+	"""
+	pass
+
+def evaluate_line(
+		runner: lamb_engine.Runner,
+		line: str,
+		*,
+		timeout = None,
+		expressions_only = False
+	): # -> dict | None
+	"""
+	Run one line with a runner.
+
+	If the line is an expression, return what happened as a dict of plain
+	values, with an "error" key if something went wrong. Otherwise, run it
+	and return None, or return an error if `expressions_only` is True
+	or if it's a command that failed.
+
+	If `timeout` isn't None, we give up after that many seconds.
+	This needs signal.setitimer, so timeouts are ignored on Windows.
+	"""
+
+	info = {"input": line}
+	timer = (timeout is not None) and hasattr(signal, "setitimer")
+	timed_out = []
+
+	def alarm(signum, frame):
+		# Exceptions raised in __del__ are ignored, and the garbage
+		# collector may run one anywhere. Try again a little later.
+		f = frame
+		while f is not None:
+			if f.f_code.co_name == "__del__":
+				signal.setitimer(signal.ITIMER_REAL, 0.01)
+				return
+			f = f.f_back
+		timed_out.append(True)
+		raise Timeout()
+
+	try:
+		if timer:
+			old_handler = signal.signal(signal.SIGALRM, alarm)
+			signal.setitimer(signal.ITIMER_REAL, timeout)
+		try:
+			e, w = runner.parse(line)
+			if isinstance(e, MacroDef) or isinstance(e, Command):
+				if expressions_only:
+					info["error"] = "Only expressions can be run here."
+					return info
+				if isinstance(e, MacroDef):
+					runner.save_macro(e, silent = True)
+				elif not runner.run_command(e):
+					info["error"] = f"Command :{e.name} failed."
+					return info
+				return None
+
+			r = runner.evaluate(e, warnings = w)
+		finally:
+			if timer:
+				signal.setitimer(signal.ITIMER_REAL, 0)
+				signal.signal(signal.SIGALRM, old_handler) # type: ignore
+
+	except ppx.ParseException as x:
+		info["error"] = f"Syntax error at char {x.loc}."
+	except lamb_engine.nodes.ReductionError as x:
+		info["error"] = x.msg
+	except Timeout:
+		info["error"] = StopReason.TIMEOUT.value[1]
+	else:
+		if timed_out and (r.stop_reason == StopReason.INTERRUPT):
+			r.stop_reason = StopReason.TIMEOUT
+		info.update(r.to_dict())
+	return info
+
+def format_text(info: dict) -> str:
+	"""
+	Format the result of evaluate_line() as one line of plain text:
+	the expression we found, or "!" and the reason we didn't find one.
+	Expressions we stopped reducing early, like loops, aren't results.
+	"""
+	if "error" in info:
+		return f"! {info['error']}"
+	elif (info["result"] is None) or (info["stop_reason"] not in found):
+		return f"! {info['exit_reason']}"
+	return info["result"]
+
+
+def run_file(
+		runner: lamb_engine.Runner,
+		lines,
+		out,
+		*,
+		as_json = False,
+		source = None,
+		timeout = None
+	) -> int:
+	"""
+	Run lines of a file in order, and write one result
+	for every expression in it to `out`.
+
+	Results are written as plain text, or as JSON lines if `as_json` is True.
+	See format_text() for the plain text format.
+
+	Returns the number of lines that had errors.
+	"""
+
+	errors = 0
+	for i, l in enumerate(lines):
+		l = l.strip()
+
+		# Skip comments and empty lines
+		if (l == "") or l.startswith("#"):
+			continue
+
+		info = evaluate_line(runner, l, timeout = timeout)
+		if info is None:
+			continue
+
+		info = {"line": i + 1, **info}
+		if source is not None:
+			info = {"file": source, **info}
+		if "error" in info:
+			errors += 1
+
+		if as_json:
+			out.write(json.dumps(info, ensure_ascii = False) + "\n")
+		else:
+			out.write(format_text(info) + "\n")
+
+	return errors
+
+def run_pool(
+		files: list[tuple[str, list]],
+		out,
+		*,
+		processes = None,
+		setup = [],
+		as_json = False,
+		ordered = True,
+		reduction_limit = None,
+		timeout = None
+	) -> int:
+	"""
+	Like run_file, but spreads expressions over worker processes.
+	`files` holds (name, lines) pairs.
+
+	Macro definitions and commands are run first, in every worker,
+	after the lines in `setup`. Expressions are then run independently,
+	so they can't use history.
+
+	That only gives the same results as run_file() if nothing an
+	expression may use changes after it. Files that run a command,
+	or define a macro that's already defined or that an expression
+	used, after an expression raise a ValueError before anything runs.
+
+	Errors in definitions and commands are written first.
+	If `ordered` is False, results are written as soon as they're done.
+	Plain text results then start with their line number, like errors
+	in definitions always do.
+
+	Returns the number of lines that had errors.
+	"""
+
+	# Find the expressions.
+	# Everything else sets up the workers.
+	# We run that here too, to report errors in it once.
+	runner = lamb_engine.Runner(None, None)
+	runner.interactive = False
+	for l in setup:
+		evaluate_line(runner, l)
+
+	setup = list(setup)
+	jobs = []
+	failed = []
+
+	# Names the expressions so far use, as macros or free variables.
+	used = set()
+
+	for name, lines in files:
+		for i, l in enumerate(lines):
+			l = l.strip()
+			if (l == "") or l.startswith("#"):
+				continue
+
+			try:
+				e = runner.parser.parse_line(l)
+			except ppx.ParseException:
+				e = None
+
+			if not (isinstance(e, MacroDef) or isinstance(e, Command)):
+				jobs.append((name, i + 1, l))
+				if e is not None:
+					for _, n in runner.parse(l)[0]:
+						if (n.kind == lamb_engine.nodes.Kind.MACRO) or (n.kind == lamb_engine.nodes.Kind.FREEVAR):
+							used.add(n.name)
+				continue
+
+			if jobs and isinstance(e, Command):
+				raise ValueError(
+					f"{name}, line {i + 1}: :{e.name} comes after an expression, "
+					"so it can't be run first. Move it up, or run without --jobs."
+				)
+			if jobs and ((e.label in runner.macro_table) or (e.label in used)):
+				raise ValueError(
+					f"{name}, line {i + 1}: {e.label} is defined after an expression "
+					"that may use it. Move it up, or run without --jobs."
+				)
+
+			setup.append(l)
+			info = evaluate_line(runner, l)
+			if info is not None:
+				info = {"line": i + 1, **info}
+				if len(files) > 1:
+					info = {"file": name, **info}
+				failed.append(info)
+
+	errors = len(failed)
+	for info in failed:
+		if as_json:
+			out.write(json.dumps(info, ensure_ascii = False) + "\n")
+		else:
+			out.write(f"{info['line']}\t{format_text(info)}\n")
+
+	with lamb_engine.pool.RunnerPool(processes, setup = setup) as p:
+		results = p.run(
+			[
+				lamb_engine.pool.Job(l, reduction_limit = reduction_limit, timeout = timeout)
+				for _, _, l in jobs
+			],
+			ordered = ordered
+		)
+
+		for info in results:
+			name, line, _ = jobs[info.pop("index")]
+			info = {"line": line, **info}
+			if len(files) > 1:
+				info = {"file": name, **info}
+			if "error" in info:
+				errors += 1
+
+			if as_json:
+				out.write(json.dumps(info, ensure_ascii = False) + "\n")
+			elif ordered:
+				out.write(format_text(info) + "\n")
+			else:
+				out.write(f"{line}\t{format_text(info)}\n")
+
+			if not ordered:
+				out.flush()
+
+	return errors
+
+
+usage = (
+	"Usage: lamb --batch [options] file.lamb ...\n"
+	"\n"
+	"Options:\n"
+	"\t--json\t\tWrite results as JSON lines\n"
+	"\t--text\t\tWrite results as plain text (default)\n"
+	"\t--load FILE\tLoad macros from FILE first\n"
+	"\t--limit N\tStop each expression after N reductions\n"
+	"\t--timeout S\tStop each expression after S seconds\n"
+	"\t--jobs N\tRun expressions in N worker processes\n"
+	"\t--unordered\tWith --jobs, write results as soon as they're done\n"
+)
+
+def main(args: list[str]) -> int:
+	"""
+	Run files without a prompt.
+	`args` are the arguments after --batch. "-" reads standard input.
+
+	Only results are written to standard output.
+	Everything else the runner prints goes to standard error.
+
+	Returns the exit code: 0 if every line ran without errors,
+	1 if some didn't, and 2 if the arguments are wrong, a file given
+	with --load can't be loaded, or --jobs can't run the files.
+	"""
+
+	as_json = False
+	ordered = True
+	processes = None
+	reduction_limit = None
+	timeout = None
+	setup = []
+	files = []
+
+	args = list(args)
+	try:
+		while args:
+			a = args.pop(0)
+			if a == "--json":
+				as_json = True
+			elif a == "--text":
+				as_json = False
+			elif a == "--unordered":
+				ordered = False
+			elif a == "--load":
+				setup.append(":load --quiet " + args.pop(0))
+			elif a == "--limit":
+				reduction_limit = int(args.pop(0))
+				if reduction_limit < 1:
+					raise ValueError()
+			elif a == "--timeout":
+				timeout = float(args.pop(0))
+				if timeout <= 0:
+					raise ValueError()
+			elif a == "--jobs":
+				processes = int(args.pop(0))
+				if processes < 1:
+					raise ValueError()
+			elif a.startswith("--"):
+				raise ValueError()
+			else:
+				files.append(a)
+	except (IndexError, ValueError):
+		files = []
+
+	if len(files) == 0:
+		sys.stderr.write(usage)
+		return 2
+
+	errors = 0
+	contents = []
+	for f in files:
+		try:
+			if f == "-":
+				contents.append((f, sys.stdin.readlines()))
+			else:
+				with open(f, "r") as fp:
+					contents.append((f, fp.readlines()))
+		except OSError as x:
+			sys.stderr.write(f"Can't read {f}: {x.strerror}\n")
+			errors += 1
+
+	with create_app_session(output = create_output(stdout = sys.stderr)):
+		# Evaluating without the macros we were asked
+		# to load would give wrong results, not errors.
+		runner = lamb_engine.Runner(None, None)
+		runner.interactive = False
+		for l in setup:
+			if evaluate_line(runner, l) is not None:
+				return 2
+
+		if processes is not None:
+			try:
+				errors += run_pool(
+					contents,
+					sys.stdout,
+					processes = processes,
+					setup = setup,
+					as_json = as_json,
+					ordered = ordered,
+					reduction_limit = reduction_limit,
+					timeout = timeout
+				)
+			except ValueError as x:
+				sys.stderr.write(f"{x}\n")
+				return 2
+			return 0 if errors == 0 else 1
+
+		if reduction_limit is not None:
+			runner.reduction_limit = reduction_limit
+
+		for name, lines in contents:
+			errors += run_file(
+				runner,
+				lines,
+				sys.stdout,
+				as_json = as_json,
+				source = name if len(contents) > 1 else None,
+				timeout = timeout
+			)
+			sys.stdout.flush()
+
+	return 0 if errors == 0 else 1
@@ -0,0 +1,386 @@
+from prompt_toolkit.application.current import create_app_session
+from prompt_toolkit.output import DummyOutput
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import lamb_engine
+import lamb_engine.nodes as lbn
+
+
+# Benchmarks, run with `lamb --bench`.
+# These use the macros in macros.lamb, from the current directory
+# or wherever --macros says it is.
+#
+# Every benchmark has a setup function, which isn't timed,
+# and a run function, which is. Setup returns the state run needs,
+# run returns the number of operations it did and the number of
+# reductions (0 if it doesn't reduce).
+#
+# We time a few runs and keep the fastest. Then we do one more run
+# to count peak memory (with tracemalloc) and nodes allocated
+# (with lbn.stats). Both slow things down a lot, so they aren't
+# part of the timed runs.
+
+
+# The macros benchmarks are run with, if --macros isn't given.
+default_macro_file = "macros.lamb"
+
+# Expressions used by the small benchmarks.
+sample = [
+	"λab.a",
+	"(λx.x x) (λx.x x)",
+	"Y FAC 3",
+	"λfa.(f (f (f a)))",
+	"PAIR (ADD 2 3) (MULT 4 5)",
+	"NOT (AND T F)",
+	"λnfa.(f ((n f) a)) 1",
+	"XOR T (OR F T)"
+]
+
+
+def make_runner(macro_file: str, engine = "tree") -> lamb_engine.Runner:
+	"""
+	Make a quiet runner with the macros in `macro_file`.
+	Delta rules and loop detection are off, so every
+	reduction is really done.
+	"""
+	r = lamb_engine.Runner(None, None)
+	r.interactive = False
+	r.run(f":load --quiet {macro_file}")
+	r.delta_rules = False
+	r.loop_detection = False
+	r.engine = engine
+	return r
+
+def macro_lines(macro_file: str) -> list[str]:
+	"""
+	The definitions in a macro file.
+	"""
+	with open(macro_file, "r") as f:
+		return [
+			l.strip() for l in f
+			if l.strip() != "" and not l.strip().startswith("#")
+		]
+
+
+class Benchmark:
+	def __init__(self, name: str, setup, run, *, unit = "ops"):
+		self.name = name
+		self.setup = setup
+		self.run = run
+
+		# What run() counts.
+		self.unit = unit
+
+
+def bench_parse(macro_file: str, scale: int) -> Benchmark:
+	def setup(engine):
+		return make_runner(macro_file, engine), (macro_lines(macro_file) + sample) * scale
+
+	def run(state):
+		r, lines = state
+		for l in lines:
+			r.parser.parse_line(l)
+		return len(lines), 0
+
+	return Benchmark("parse", setup, run, unit = "lines")
+
+def bench_prepare(macro_file: str, scale: int) -> Benchmark:
+	def setup(engine):
+		r = make_runner(macro_file, engine)
+		return r, [
+			lbn.Root(r.parser.parse_line(l), runner = r)
+			for l in sample * scale * 50
+		]
+
+	def run(state):
+		_, roots = state
+		for root in roots:
+			lbn.prepare(root)
+		return len(roots), 0
+
+	return Benchmark("prepare", setup, run, unit = "exprs")
+
+def big_tree(r: lamb_engine.Runner, line: str) -> lbn.Node:
+	"""
+	Parse a line, and expand every macro in it.
+	"""
+	return lbn.expand(r.parse(line)[0], force_all = True)[1].left
+
+def bench_clone(macro_file: str, scale: int) -> Benchmark:
+	def setup(engine):
+		return big_tree(make_runner(macro_file, engine), "Y FAC 3")
+
+	def run(tree):
+		for _ in range(20 * scale):
+			lbn.clone(tree)
+		return tree.size * 20 * scale, 0
+
+	return Benchmark("clone", setup, run, unit = "nodes")
+
+def bench_print(macro_file: str, scale: int) -> Benchmark:
+	def setup(engine):
+		return big_tree(make_runner(macro_file, engine), "Y FAC 3")
+
+	def run(tree):
+		for _ in range(20 * scale):
+			lbn.print_node(tree)
+		return tree.size * 20 * scale, 0
+
+	return Benchmark("print_node", setup, run, unit = "nodes")
+
+def bench_church(macro_file: str, scale: int) -> Benchmark:
+	def setup(engine):
+		return make_runner(macro_file, engine)
+
+	def run(r):
+		n = 2000 * scale
+		for i in range(n):
+			lbn.Church(i).expand(r)
+		return n, 0
+
+	return Benchmark("church_expand", setup, run, unit = "numerals")
+
+def bench_reduce(macro_file: str, line: str, limit = None) -> Benchmark:
+	"""
+	Reduce an expression from start to end,
+	including printing and saving the result.
+	"""
+	def setup(engine):
+		r = make_runner(macro_file, engine)
+		if limit is not None:
+			r.reduction_limit = limit
+		return r, r.parse(line)[0]
+
+	def run(state):
+		r, root = state
+		result = r.evaluate(root)
+		return result.reductions, result.reductions
+
+	return Benchmark(line, setup, run, unit = "reductions")
+
+def benchmarks(macro_file: str, quick = False) -> list[Benchmark]:
+	scale = 1 if quick else 5
+	return [
+		bench_parse(macro_file, scale),
+		bench_prepare(macro_file, scale),
+		bench_clone(macro_file, scale),
+		bench_print(macro_file, scale),
+		bench_church(macro_file, scale),
+		bench_reduce(macro_file, "Y FAC 2" if quick else "Y FAC 3"),
+		bench_reduce(macro_file, "Y FAC 3" if quick else "Y FAC 4"),
+		bench_reduce(macro_file, "MULT 30 30" if quick else "MULT 100 100"),
+		bench_reduce(macro_file, "D 100" if quick else "D 400"),
+		bench_reduce(macro_file, "M M", limit = 2000 if quick else 20000)
+	]
+
+
+def run_benchmark(b: Benchmark, *, engine = "tree", repeat = 3) -> dict:
+	"""
+	Run a benchmark, and return what we measured.
+	"""
+
+	times = []
+	for _ in range(repeat):
+		state = b.setup(engine)
+		start = time.perf_counter()
+		ops, reductions = b.run(state)
+		times.append(time.perf_counter() - start)
+		del state
+	t = min(times)
+
+	stats = lbn.stats
+	was_enabled = stats.enabled
+	state = b.setup(engine)
+	before = stats.totals.copy()
+	stats.enable()
+	tracemalloc.start()
+	try:
+		base = tracemalloc.get_traced_memory()[0]
+		b.run(state)
+		peak = tracemalloc.get_traced_memory()[1] - base
+	finally:
+		tracemalloc.stop()
+		if not was_enabled:
+			stats.disable()
+	nodes = (stats.totals - before).nodes_allocated
+
+	out = {
+		"time": round(t, 6),
+		"repeat": repeat,
+		"unit": b.unit,
+		"operations": ops,
+		"per_second": round(ops / t, 1) if t > 0 else None,
+		"peak_memory": peak,
+		"nodes_allocated": nodes
+	}
+	if reductions:
+		out["reductions"] = reductions
+		out["reductions_per_second"] = round(reductions / t, 1) if t > 0 else None
+	return out
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+	"""
+	Compare results against a baseline.
+	Returns a message for every benchmark that got slower
+	or used more memory by more than `threshold` (0.1 is 10%).
+	"""
+	out = []
+	if results["engine"] != baseline.get("engine"):
+		out.append(f"Engine changed from {baseline.get('engine')} to {results['engine']}")
+	if results["quick"] != baseline.get("quick"):
+		out.append("Only one of these runs used --quick")
+
+	for name, r in results["benchmarks"].items():
+		if name not in baseline.get("benchmarks", {}):
+			continue
+		b = baseline["benchmarks"][name]
+
+		if r["operations"] != b["operations"]:
+			out.append(f"{name}: did {r['operations']:,} {r['unit']}, baseline did {b['operations']:,}")
+			continue
+
+		for key, what in (("time", "slower"), ("peak_memory", "more memory")):
+			if (b[key] > 0) and (r[key] > b[key] * (1 + threshold)):
+				out.append(f"{name}: {(r[key] / b[key] - 1) * 100:.1f}% {what}")
+	return out
+
+def format_results(results: dict, baseline = None) -> str:
+	lines = [
+		f"{'benchmark':<16}{'time':>10}{'rate':>22}{'peak memory':>14}{'nodes':>12}{'vs baseline':>13}"
+	]
+	for name, r in results["benchmarks"].items():
+		rate = f"{r['per_second']:,.0f} {r['unit']}/s" if r["per_second"] is not None else "-"
+		change = ""
+		if (baseline is not None) and (name in baseline.get("benchmarks", {})):
+			b = baseline["benchmarks"][name]
+			if b["time"] > 0:
+				change = f"{(r['time'] / b['time'] - 1) * 100:+.1f}%"
+		lines.append(
+			f"{name:<16}{r['time']:>9.3f}s{rate:>22}"
+			f"{r['peak_memory'] / 1024:>11,.0f} KB{r['nodes_allocated']:>12,}{change:>13}"
+		)
+	return "\n".join(lines)
+
+
+usage = (
+	"Usage: lamb --bench [options] [benchmark ...]\n"
+	"\n"
+	"Options:\n"
+	"\t--quick\t\tUse smaller workloads\n"
+	"\t--engine NAME\tReduce with this engine (default: tree)\n"
+	"\t--macros FILE\tLoad macros from FILE (default: macros.lamb)\n"
+	"\t--repeat N\tTime each benchmark N times, keep the best (default: 3)\n"
+	"\t--out FILE\tSave results to FILE as JSON\n"
+	"\t--baseline FILE\tCompare with results saved by --out\n"
+	"\t--threshold P\tFlag benchmarks more than P percent worse (default: 10)\n"
+)
+
+def main(args: list[str]) -> int:
+	"""
+	Run benchmarks, and print what we measured.
+	`args` are the arguments after --bench.
+
+	Returns the exit code: 0 if nothing regressed,
+	1 if something did, and 2 if the arguments are wrong.
+	"""
+
+	quick = False
+	engine = "tree"
+	macro_file = default_macro_file
+	repeat = 3
+	out_file = None
+	baseline_file = None
+	threshold = 10.0
+	names = []
+
+	args = list(args)
+	try:
+		while args:
+			a = args.pop(0)
+			if a == "--quick":
+				quick = True
+			elif a == "--engine":
+				engine = args.pop(0)
+				if engine not in lamb_engine.runner.runner.engines:
+					raise ValueError()
+			elif a == "--macros":
+				macro_file = args.pop(0)
+			elif a == "--repeat":
+				repeat = int(args.pop(0))
+				if repeat < 1:
+					raise ValueError()
+			elif a == "--out":
+				out_file = args.pop(0)
+			elif a == "--baseline":
+				baseline_file = args.pop(0)
+			elif a == "--threshold":
+				threshold = float(args.pop(0))
+			elif a.startswith("--"):
+				raise ValueError()
+			else:
+				names.append(a)
+	except (IndexError, ValueError):
+		sys.stderr.write(usage)
+		return 2
+
+	if not os.path.exists(macro_file):
+		sys.stderr.write(f"Benchmarks need {macro_file}, give its path with --macros.\n")
+		return 2
+
+	todo = benchmarks(macro_file, quick)
+	unknown = set(names) - set(b.name for b in todo)
+	if unknown:
+		sys.stderr.write(f"Unknown benchmarks: {', '.join(sorted(unknown))}\n")
+		sys.stderr.write(f"Benchmarks are: {', '.join(b.name for b in todo)}\n")
+		return 2
+	if names:
+		todo = [b for b in todo if b.name in names]
+
+	baseline = None
+	if baseline_file is not None:
+		try:
+			with open(baseline_file, "r") as f:
+				baseline = json.load(f)
+		except (OSError, ValueError) as x:
+			sys.stderr.write(f"Can't read {baseline_file}: {x}\n")
+			return 2
+
+	results = {
+		"version": 1,
+		"python": platform.python_version(),
+		"engine": engine,
+		"quick": quick,
+		"time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+		"benchmarks": {}
+	}
+
+	# Everything the runner prints is thrown away.
+	with create_app_session(output = DummyOutput()):
+		for b in todo:
+			sys.stderr.write(f"Running {b.name}...\n")
+			results["benchmarks"][b.name] = run_benchmark(b, engine = engine, repeat = repeat)
+
+	print(format_results(results, baseline))
+
+	if out_file is not None:
+		with open(out_file, "w") as f:
+			json.dump(results, f, indent = "\t")
+			f.write("\n")
+
+	if baseline is None:
+		return 0
+
+	regressions = compare(results, baseline, threshold / 100)
+	if regressions:
+		print(f"\nRegressions (threshold {threshold:g}%):")
+		for r in regressions:
+			print(f"\t{r}")
+		return 1
+
+	print("\nNo regressions.")
+	return 0
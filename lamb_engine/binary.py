@@ -0,0 +1,342 @@
+from array import array
+import mmap
+import struct
+import sys
+
+import lamb_engine
+import lamb_engine.nodes as lbn
+import lamb_engine.nodes.debruijn as dbn
+
+
+# A compact binary format for terms and macro tables.
+#
+# A file holds any number of named terms in de Bruijn form
+# (see lbn.debruijn), stored as one flat array of nodes.
+# Every node is three unsigned 32-bit ints, a tag and two fields:
+#
+#	VAR		index	0
+#	LAM		body	name
+#	APP		fn		arg
+#	FREE	name	0
+#	MACRO	name	0
+#	CHURCH	value	0
+#
+# Tags are the ones in lbn.debruijn. Children are node indices,
+# and always come before their parent. Names and numerals are
+# indices into a table of strings. Identical subterms are stored once.
+#
+# Files look like this, with every int little-endian:
+#
+#	magic			8 bytes
+#	header			5 ints: version, entries, strings, nodes, string data length
+#	entries			(name, root node) for every term
+#	string offsets	strings + 1 ints
+#	nodes			(tag, a, b) for every node
+#	string data		utf-8
+#
+# Everything before the string data is made of 4-byte ints,
+# so a file can be memory-mapped and read in place.
+
+
+magic = b"LAMBBIN\0"
+version = 1
+header = struct.Struct("<8s5I")
+
+
+def ints(view: memoryview, offset: int, count: int):
+	"""
+	Read `count` ints from a buffer, without copying it if we can.
+	"""
+	m = view[offset:offset + 4 * count]
+	if sys.byteorder == "little":
+		return m.cast("I")
+	a = array("I", m.tobytes())
+	a.byteswap()
+	return a
+
+
+def dumps(table: dict) -> bytes:
+	"""
+	Encode named terms.
+	`table` maps names to prepared trees (like the values in
+	Runner.macro_table) or de Bruijn terms.
+	"""
+
+	strings = {}
+	def string(s: str) -> int:
+		i = strings.get(s)
+		if i is None:
+			i = len(strings)
+			strings[s] = i
+		return i
+
+	nodes = array("I")
+
+	# Node indices, by (tag, a, b).
+	index = {}
+
+	# Node indices of terms we've already encoded, by id.
+	# `keep` keeps those terms alive, so ids aren't reused.
+	done = {}
+	keep = []
+
+	entries = array("I")
+	for name, term in table.items():
+		if isinstance(term, lbn.Node):
+			if term.kind == lbn.Kind.ROOT:
+				term = term.left
+			try:
+				term = dbn.from_node(term)
+			except TypeError:
+				raise ValueError(f"Can't save {name}, it has a $ in it.")
+
+		stack = [(term, False)]
+		results = []
+		while stack:
+			t, visited = stack.pop()
+			if id(t) in done:
+				results.append(done[id(t)])
+				continue
+
+			k = t.kind
+			if k == dbn.LAM:
+				if not visited:
+					stack.append((t, True))
+					stack.append((t.body, False)) # type: ignore
+					continue
+				key = (k, results.pop(), string(t.name)) # type: ignore
+			elif k == dbn.APP:
+				if not visited:
+					stack.append((t, True))
+					stack.append((t.arg, False)) # type: ignore
+					stack.append((t.fn, False)) # type: ignore
+					continue
+				arg = results.pop()
+				key = (k, results.pop(), arg)
+			elif k == dbn.VAR:
+				key = (k, t.index, 0) # type: ignore
+			elif k == dbn.CHURCH:
+				key = (k, string(str(t.value)), 0) # type: ignore
+			elif k == dbn.REF:
+				stack.append((t.value(), False)) # type: ignore
+				continue
+			elif k == dbn.FOLD:
+				# Saved as the calls it stands for.
+				stack.append((t.unfold(), False)) # type: ignore
+				continue
+			else:
+				key = (k, string(t.name), 0) # type: ignore
+
+			i = index.get(key)
+			if i is None:
+				i = len(index)
+				index[key] = i
+				nodes.extend(key)
+			done[id(t)] = i
+			keep.append(t)
+			results.append(i)
+
+		entries.extend((string(name), results[0]))
+
+	data = [s.encode() for s in strings]
+	offsets = array("I", [0])
+	for d in data:
+		offsets.append(offsets[-1] + len(d))
+
+	if sys.byteorder != "little":
+		for a in (entries, offsets, nodes):
+			a.byteswap()
+
+	return b"".join([
+		header.pack(magic, version, len(table), len(data), len(index), offsets[-1]),
+		entries.tobytes(),
+		offsets.tobytes(),
+		nodes.tobytes()
+	] + data)
+
+def dump(table: dict, path: str) -> None:
+	"""
+	Save named terms to a file. See dumps().
+	"""
+	data = dumps(table)
+	with open(path, "wb") as f:
+		f.write(data)
+
+
+class Image:
+	"""
+	Named terms in the binary format.
+
+	`buffer` may be anything that supports the buffer protocol,
+	like bytes or an mmap. It isn't copied, and terms are only
+	decoded when they are asked for.
+	"""
+
+	def __init__(self, buffer, *, file = None):
+		if len(buffer) < header.size:
+			raise ValueError("This isn't a lamb binary file.")
+		m, v, entries, strings, nodes, data = header.unpack_from(buffer)
+		if m != magic:
+			raise ValueError("This isn't a lamb binary file.")
+		if v != version:
+			raise ValueError(f"Can't read version {v} of the binary format.")
+
+		offset = header.size
+		size = offset + 4 * (2 * entries + strings + 1 + 3 * nodes) + data
+		if len(buffer) < size:
+			raise ValueError("This file is truncated.")
+
+		self.buffer = buffer
+		self.file = file
+		self.view = memoryview(buffer)
+
+		self.entries = ints(self.view, offset, 2 * entries)
+		offset += 4 * 2 * entries
+		self.offsets = ints(self.view, offset, strings + 1)
+		offset += 4 * (strings + 1)
+		self.nodes = ints(self.view, offset, 3 * nodes)
+		offset += 4 * 3 * nodes
+		self.data = self.view[offset:offset + data]
+
+		# Decoded strings and terms, by index.
+		self.strings = {}
+		self.terms = {}
+
+		self.names = [self.string(self.entries[2 * i]) for i in range(entries)]
+		self.index = {name: i for i, name in enumerate(self.names)}
+
+	def __len__(self):
+		return len(self.names)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def close(self) -> None:
+		"""
+		Let go of the buffer, and close the file it came from.
+		Terms we've decoded are still usable.
+		"""
+		for v in (self.entries, self.offsets, self.nodes, self.data, self.view):
+			if isinstance(v, memoryview):
+				v.release()
+		if isinstance(self.buffer, mmap.mmap):
+			self.buffer.close()
+		if self.file is not None:
+			self.file.close()
+
+	def string(self, i: int) -> str:
+		s = self.strings.get(i)
+		if s is None:
+			if i + 1 >= len(self.offsets):
+				raise ValueError("Bad string index.")
+			s = bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode()
+			self.strings[i] = s
+		return s
+
+	def decode(self, root: int) -> dbn.Term:
+		"""
+		Make the term that starts at a node.
+		Nodes used by more than one term are only decoded once,
+		and are shared.
+		"""
+
+		nodes = self.nodes
+		terms = self.terms
+		if root * 3 >= len(nodes):
+			raise ValueError("Bad node index.")
+
+		stack = [root]
+		while stack:
+			i = stack[-1]
+			if i in terms:
+				stack.pop()
+				continue
+
+			k = nodes[3 * i]
+			a = nodes[3 * i + 1]
+			b = nodes[3 * i + 2]
+
+			if (k == dbn.LAM) or (k == dbn.APP):
+				# Children always come first,
+				# so bad files can't make us loop.
+				if (a >= i) or ((k == dbn.APP) and (b >= i)):
+					raise ValueError("Bad node index.")
+				if a not in terms:
+					stack.append(a)
+					continue
+				if k == dbn.LAM:
+					t = dbn.Lam(terms[a], self.string(b))
+				else:
+					if b not in terms:
+						stack.append(b)
+						continue
+					t = dbn.App(terms[a], terms[b])
+			elif k == dbn.VAR:
+				t = dbn.Var(a)
+			elif k == dbn.FREE:
+				t = dbn.Free(self.string(a))
+			elif k == dbn.MACRO:
+				t = dbn.Macro(self.string(a))
+			elif k == dbn.CHURCH:
+				t = dbn.Church(int(self.string(a)))
+			else:
+				raise ValueError(f"Bad node tag {k}.")
+
+			terms[i] = t
+			stack.pop()
+
+		return terms[root]
+
+	def term(self, name: str) -> dbn.Term:
+		"""
+		Return the de Bruijn term with the given name.
+		"""
+		return self.decode(self.entries[2 * self.index[name] + 1])
+
+	def node(self, name: str) -> lbn.Node:
+		"""
+		Return the term with the given name as a tree.
+		"""
+		return dbn.to_node(self.term(name))
+
+	def items(self):
+		"""
+		Iterate over (name, term), in the order they were saved.
+		"""
+		for i, name in enumerate(self.names):
+			yield name, self.decode(self.entries[2 * i + 1])
+
+def loads(data) -> Image:
+	"""
+	Read named terms from a buffer. See Image.
+	"""
+	return Image(data)
+
+def load(path: str) -> Image:
+	"""
+	Read named terms from a file, by memory-mapping it.
+	Close the image when you're done with it.
+	"""
+	f = open(path, "rb")
+	try:
+		buffer = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+	except ValueError:
+		# Empty files can't be mapped.
+		buffer = f.read()
+	try:
+		return Image(buffer, file = f)
+	except:
+		if isinstance(buffer, mmap.mmap):
+			buffer.close()
+		f.close()
+		raise
+
+def is_binary(path: str) -> bool:
+	"""
+	Return True if a file is in the binary format.
+	"""
+	with open(path, "rb") as f:
+		return f.read(len(magic)) == magic
@@ -1,3 +1,12 @@
 from .misc import *
 from .nodes import *
-from .functions import *
\ No newline at end of file
+from .functions import *
+
+from . import debruijn
+from . import delta
+from . import display
+from . import lazy
+from . import nbe
+from . import parallel
+from . import stats
+from . import strategies
\ No newline at end of file
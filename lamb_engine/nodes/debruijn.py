@@ -0,0 +1,968 @@
+"""
+An alternative term representation that uses de Bruijn indices.
+
+Terms here are immutable. Bound variables are numbered by how many
+binders lie between them and the binder they refer to, so there are
+no identifiers to keep unique and alpha-equivalent terms are equal.
+Every term caches its hash, so hashing and comparing them is cheap.
+
+Use `from_node` and `to_node` to convert to and from lbn.Node trees.
+Names are only kept as hints, and are used when converting back.
+"""
+
+import lamb_engine
+import lamb_engine.nodes as lbn
+
+
+# Term kind tags, like lbn.Kind.
+VAR		= 0
+LAM		= 1
+APP		= 2
+FREE	= 3
+MACRO	= 4
+CHURCH	= 5
+REF		= 6
+FOLD	= 7
+
+
+class Term:
+	"""
+	Generic class for a de Bruijn term.
+	All terms are subclasses of this.
+
+	Every term has the following cached attributes:
+		hash:	  the term's hash. Names don't affect it.
+		free:	  one more than the largest free index in this term,
+				  zero if the term is closed.
+		normal:	  True if this term has no redexes.
+		size:	  the number of terms in this one, counting
+				  shared subterms once for every place they appear.
+	"""
+
+	__slots__ = ("hash", "free", "normal", "size")
+	kind: int = None # type: ignore
+
+	def __hash__(self):
+		return self.hash
+
+	def __eq__(self, other):
+		if self is other:
+			return True
+		if not isinstance(other, Term):
+			return NotImplemented
+		return equal(self, other)
+
+	def __str__(self) -> str:
+		return lbn.print_node(to_node(self))
+
+class Var(Term):
+	__slots__ = ("index",)
+	kind = VAR
+
+	def __init__(self, index: int):
+		self.index = index
+		self.hash = hash((VAR, index))
+		self.free = index + 1
+		self.normal = True
+		self.size = 1
+
+	def __repr__(self):
+		return f"<var {self.index}>"
+
+class Lam(Term):
+	__slots__ = ("body", "name")
+	kind = LAM
+
+	def __init__(self, body: Term, name: str = "x"):
+		self.body = body
+
+		# The name this binder had in named form.
+		# Only used when converting back to nodes.
+		self.name = name
+
+		self.hash = hash((LAM, body.hash))
+		self.free = body.free - 1 if body.free > 0 else 0
+		self.normal = body.normal
+		self.size = body.size + 1
+
+	def __repr__(self):
+		return f"<lam {self.body!r}>"
+
+class App(Term):
+	__slots__ = ("fn", "arg")
+	kind = APP
+
+	def __init__(self, fn: Term, arg: Term):
+		self.fn = fn
+		self.arg = arg
+		self.hash = hash((APP, fn.hash, arg.hash))
+		self.free = fn.free if fn.free > arg.free else arg.free
+		self.normal = (
+			fn.normal and arg.normal and
+			(fn.kind != LAM) and
+			(fn.kind != MACRO) and
+			(fn.kind != CHURCH) and
+
+			# We can't know if a shared term in head position
+			# will become a function, so we assume it will.
+			(fn.kind != REF)
+		)
+		self.size = fn.size + arg.size + 1
+
+	def __repr__(self):
+		return f"<app {self.fn!r} {self.arg!r}>"
+
+class Free(Term):
+	__slots__ = ("name",)
+	kind = FREE
+
+	def __init__(self, name: str):
+		self.name = name
+		self.hash = hash((FREE, name))
+		self.free = 0
+		self.normal = True
+		self.size = 1
+
+	def __repr__(self):
+		return f"<free {self.name}>"
+
+class Macro(Term):
+	"""
+	An unexpanded macro reference.
+	It is expanded only when it ends up on the left of an application,
+	just like lbn.Macro.
+	"""
+
+	__slots__ = ("name",)
+	kind = MACRO
+
+	def __init__(self, name: str):
+		self.name = name
+		self.hash = hash((MACRO, name))
+		self.free = 0
+		self.normal = True
+		self.size = 1
+
+	def __repr__(self):
+		return f"<macro {self.name}>"
+
+class Church(Term):
+	__slots__ = ("value",)
+	kind = CHURCH
+
+	def __init__(self, value: int):
+		self.value = value
+		self.hash = hash((CHURCH, value))
+		self.free = 0
+		self.normal = True
+		self.size = 1
+
+	def __repr__(self):
+		return f"<church {self.value}>"
+
+class Fold(Term):
+	"""
+	`count` nested calls of the same function:
+	(fn (fn (... (fn arg)))). `count` is always at least 1.
+
+	This is how church numerals are expanded, like lbn.Fold.
+	It is unfolded one call at a time, when reduction reaches it,
+	so large numerals are never built all at once.
+	"""
+
+	__slots__ = ("fn", "arg", "count")
+	kind = FOLD
+
+	def __init__(self, fn: Term, arg: Term, count: int):
+		self.fn = fn
+		self.arg = arg
+		self.count = count
+		self.hash = hash((FOLD, fn.hash, arg.hash, count))
+		self.free = fn.free if fn.free > arg.free else arg.free
+
+		# Like an App, since this is one.
+		self.normal = (
+			fn.normal and arg.normal and
+			(fn.kind != LAM) and
+			(fn.kind != MACRO) and
+			(fn.kind != CHURCH) and
+			(fn.kind != REF)
+		)
+
+		# Every call we stand for is counted, like in lbn.Fold.
+		self.size = count * (fn.size + 1) + arg.size
+
+	def __repr__(self):
+		return f"<fold {self.count} {self.fn!r} {self.arg!r}>"
+
+	def unfold(self) -> App:
+		"""
+		Return the outermost call of this fold.
+		The rest of the fold is its argument.
+		"""
+		if self.count == 1:
+			return App(self.fn, self.arg)
+		return App(self.fn, Fold(self.fn, self.arg, self.count - 1))
+
+
+class Cell:
+	"""
+	A mutable box holding a term.
+	Shared by every Ref to it, so reducing the term
+	inside a cell reduces it for all of them.
+	"""
+
+	__slots__ = ("value",)
+
+	def __init__(self, value: Term):
+		self.value = value
+
+class Ref(Term):
+	"""
+	A reference to a shared term.
+	Stands for the term in `cell`, with its
+	free indices shifted up by `shift_by`.
+
+	Refs are compared by identity, since the term they hold changes.
+	`normal` and `free` are read from the cell every time.
+	"""
+
+	__slots__ = ("cell", "shift_by")
+	kind = REF
+
+	def __init__(self, cell: Cell, shift_by: int = 0):
+		self.cell = cell
+		self.shift_by = shift_by
+		self.hash = hash((REF, id(cell), shift_by))
+
+		# The shared term isn't counted.
+		self.size = 1
+
+	@property
+	def normal(self) -> bool: # type: ignore
+		return self.cell.value.normal
+
+	@property
+	def free(self) -> int: # type: ignore
+		f = self.cell.value.free
+		return f + self.shift_by if f > 0 else 0
+
+	def value(self) -> Term:
+		"""
+		Return an unshared copy of the term this refers to.
+		"""
+		return shift(self.cell.value, self.shift_by)
+
+	def __repr__(self):
+		return f"<ref {self.shift_by} {self.cell.value!r}>"
+
+
+def equal(a: Term, b: Term) -> bool:
+	"""
+	Structural equality, which is alpha-equivalence.
+	Pairs of shared subterms are only compared once.
+	"""
+	seen = set()
+	stack = [(a, b)]
+	while stack:
+		a, b = stack.pop()
+		if a is b:
+			continue
+		if (a.hash != b.hash) or (a.kind != b.kind):
+			return False
+
+		k = a.kind
+		if (k == LAM) or (k == APP) or (k == FOLD):
+			key = (id(a), id(b))
+			if key in seen:
+				continue
+			seen.add(key)
+
+		if k == VAR:
+			if a.index != b.index: # type: ignore
+				return False
+		elif k == LAM:
+			stack.append((a.body, b.body)) # type: ignore
+		elif (k == APP) or (k == FOLD):
+			if (k == FOLD) and (a.count != b.count): # type: ignore
+				return False
+			stack.append((a.arg, b.arg)) # type: ignore
+			stack.append((a.fn, b.fn)) # type: ignore
+		elif k == CHURCH:
+			if a.value != b.value: # type: ignore
+				return False
+		elif k == REF:
+			if (a.cell is not b.cell) or (a.shift_by != b.shift_by): # type: ignore
+				return False
+		else:
+			if a.name != b.name: # type: ignore
+				return False
+	return True
+
+
+class Interner:
+	"""
+	A hash-consing table.
+
+	Interning a term returns a term equal to it, made of subterms that
+	are shared with every other term interned in the same table:
+	identical subterms are always the same object.
+
+	Binder names are kept, so alpha-equivalent terms with different
+	names aren't merged and still print the way they did.
+	Refs are kept as they are.
+
+	Tables keep every term put in them alive until they are pruned.
+	"""
+
+	__slots__ = ("table", "interned")
+
+	def __init__(self):
+		# Keys are built from the ids of children,
+		# which must be interned already.
+		self.table = {}
+
+		# The ids of the terms in `table`.
+		self.interned = set()
+
+	def __len__(self):
+		return len(self.table)
+
+	def __contains__(self, term: Term):
+		return id(term) in self.interned
+
+	def add(self, term: Term, key) -> Term:
+		"""
+		Return the interned term with the given key.
+		If there isn't one, `term` becomes it.
+		"""
+		out = self.table.get(key)
+		if out is None:
+			self.table[key] = term
+			self.interned.add(id(term))
+			out = term
+		return out
+
+	def app(self, fn: Term, arg: Term, term: App = None) -> Term: # type: ignore
+		"""
+		Return the interned application of two interned terms.
+		If `term` is given and has these children, it may be reused.
+		"""
+		key = (APP, id(fn), id(arg))
+		out = self.table.get(key)
+		if out is None:
+			if (term is None) or (term.fn is not fn) or (term.arg is not arg):
+				term = App(fn, arg)
+			self.table[key] = term
+			self.interned.add(id(term))
+			out = term
+		return out
+
+	def lam(self, body: Term, name: str, term: Lam = None) -> Term: # type: ignore
+		"""
+		Return the interned function with an interned body.
+		If `term` is given and has this body, it may be reused.
+		"""
+		key = (LAM, id(body), name)
+		out = self.table.get(key)
+		if out is None:
+			if (term is None) or (term.body is not body):
+				term = Lam(body, name)
+			self.table[key] = term
+			self.interned.add(id(term))
+			out = term
+		return out
+
+	def prune(self, term: Term) -> None:
+		"""
+		Forget every interned term that isn't part of `term`,
+		which must be interned.
+		"""
+		table = {}
+		interned = set()
+		stack = [term]
+		while stack:
+			t = stack.pop()
+			if id(t) in interned:
+				continue
+			interned.add(id(t))
+
+			k = t.kind
+			if k == LAM:
+				table[(LAM, id(t.body), t.name)] = t # type: ignore
+				stack.append(t.body) # type: ignore
+			elif k == APP:
+				table[(APP, id(t.fn), id(t.arg))] = t # type: ignore
+				stack.append(t.arg) # type: ignore
+				stack.append(t.fn) # type: ignore
+			elif k == FOLD:
+				table[(FOLD, id(t.fn), id(t.arg), t.count)] = t # type: ignore
+				stack.append(t.arg) # type: ignore
+				stack.append(t.fn) # type: ignore
+			elif k == VAR:
+				table[(VAR, t.index)] = t # type: ignore
+			elif k == CHURCH:
+				table[(CHURCH, t.value)] = t # type: ignore
+			elif k == REF:
+				interned.discard(id(t))
+			else:
+				table[(k, t.name)] = t # type: ignore
+
+		self.table = table
+		self.interned = interned
+
+	def intern(self, term: Term) -> Term:
+		"""
+		Intern a term and all its subterms.
+		Subterms that are interned already aren't walked.
+		"""
+
+		interned = self.interned
+		if id(term) in interned:
+			return term
+
+		stack = [(term, False)]
+		results = []
+		while stack:
+			t, visited = stack.pop()
+			if id(t) in interned:
+				results.append(t)
+				continue
+
+			k = t.kind
+			if k == LAM:
+				if visited:
+					results.append(self.lam(results.pop(), t.name, t)) # type: ignore
+				else:
+					stack.append((t, True))
+					stack.append((t.body, False)) # type: ignore
+			elif k == APP:
+				if visited:
+					arg = results.pop()
+					results.append(self.app(results.pop(), arg, t)) # type: ignore
+				else:
+					stack.append((t, True))
+					stack.append((t.arg, False)) # type: ignore
+					stack.append((t.fn, False)) # type: ignore
+			elif k == FOLD:
+				if visited:
+					arg = results.pop()
+					fn = results.pop()
+					if (fn is not t.fn) or (arg is not t.arg): # type: ignore
+						t = Fold(fn, arg, t.count) # type: ignore
+					results.append(self.add(t, (FOLD, id(fn), id(arg), t.count))) # type: ignore
+				else:
+					stack.append((t, True))
+					stack.append((t.arg, False)) # type: ignore
+					stack.append((t.fn, False)) # type: ignore
+			elif k == VAR:
+				results.append(self.add(t, (VAR, t.index))) # type: ignore
+			elif k == CHURCH:
+				results.append(self.add(t, (CHURCH, t.value))) # type: ignore
+			elif k == REF:
+				results.append(t)
+			else:
+				results.append(self.add(t, (k, t.name))) # type: ignore
+		return results[0]
+
+
+def _map_vars(term: Term, base: int, fn, ref_fn = None) -> Term:
+	"""
+	Rebuild `term`, replacing every variable with index >= base + depth
+	(where depth is the number of binders above it inside `term`)
+	with fn(index, depth).
+
+	Subterms that don't have such variables are shared, not copied.
+
+	Refs with such variables are passed to ref_fn(ref, depth),
+	which may return a new term. If there is no ref_fn or it returns
+	None, the ref's term is rebuilt and put into a new cell. That cell
+	is shared by every use of the same ref at the same depth.
+	"""
+
+	stack = [(term, 0, False)]
+	results = []
+
+	# Maps (cell id, shift, depth) to rebuilt refs.
+	refs = {}
+
+	while stack:
+		t, depth, visited = stack.pop()
+
+		if t.free <= base + depth:
+			results.append(t)
+			continue
+
+		k = t.kind
+		if k == VAR:
+			results.append(fn(t.index, depth)) # type: ignore
+		elif k == REF:
+			key = (id(t.cell), t.shift_by, depth) # type: ignore
+			if visited:
+				r = results.pop()
+				if (r.kind == APP) or (r.kind == LAM):
+					r = Ref(Cell(r))
+				refs[key] = r
+				results.append(r)
+				continue
+
+			r = None if ref_fn is None else ref_fn(t, depth)
+			if r is not None:
+				results.append(r)
+			elif key in refs:
+				results.append(refs[key])
+			else:
+				stack.append((t, depth, True))
+				stack.append((t.value(), depth, False)) # type: ignore
+		elif k == LAM:
+			if visited:
+				results.append(Lam(results.pop(), t.name)) # type: ignore
+			else:
+				stack.append((t, depth, True))
+				stack.append((t.body, depth + 1, False)) # type: ignore
+		elif (k == APP) or (k == FOLD):
+			if visited:
+				arg = results.pop()
+				if k == APP:
+					results.append(App(results.pop(), arg))
+				else:
+					results.append(Fold(results.pop(), arg, t.count)) # type: ignore
+			else:
+				stack.append((t, depth, True))
+				stack.append((t.arg, depth, False)) # type: ignore
+				stack.append((t.fn, depth, False)) # type: ignore
+
+	return results[0]
+
+def shift(term: Term, d: int, cutoff: int = 0) -> Term:
+	"""
+	Add d to every free index in term that is at least `cutoff`.
+	"""
+	if d == 0:
+		return term
+
+	# A ref can stay shared if all its
+	# free indices get the same shift.
+	def shift_ref(r, depth):
+		if r.shift_by >= cutoff + depth:
+			return Ref(r.cell, r.shift_by + d)
+		return None
+
+	return _map_vars(
+		term, cutoff,
+		lambda i, depth: Var(i + d),
+		shift_ref
+	)
+
+def instantiate(body: Term, arg: Term) -> Term:
+	"""
+	Substitute `arg` for index 0 in `body`, and remove that binder.
+	This is the body of a beta reduction (λ.body) arg.
+
+	Variables are shifted as we go, so this is capture-free.
+	"""
+
+	def sub(i, depth):
+		if i == depth:
+			return shift(arg, depth)
+		return Var(i - 1)
+
+	return _map_vars(body, 0, sub)
+
+def church(value: int, *, unfold = False) -> Term:
+	"""
+	Make the expanded term for a church numeral.
+	Its calls are kept in a Fold, like lbn.Church.expand does,
+	unless `unfold` is True.
+	"""
+	if value == 0:
+		body = Var(0)
+	elif unfold:
+		body = Var(0)
+		for _ in range(value):
+			body = App(Var(1), body)
+	else:
+		body = Fold(Var(1), Var(0), value)
+	return Lam(Lam(body, "a"), "f")
+
+
+def from_node(node: lbn.Node, *, unfold = False) -> Term:
+	"""
+	Convert a prepared tree to a de Bruijn term.
+	History references must have an entry (see lbn.History).
+	Each result they refer to is converted once, and shared.
+
+	Folds are kept as Folds, unless `unfold` is True.
+	Then they are converted to the calls they stand for,
+	so the result is equal to the same term without folds.
+	"""
+
+	if not isinstance(node, lbn.Node):
+		raise TypeError(f"I don't know what to do with a {type(node)}")
+
+	K = lbn.Kind
+	UP = lbn.Direction.UP
+
+	# Maps bound variable identifiers to
+	# the depth of the binder that made them.
+	levels = {}
+	depth = 0
+	results = []
+
+	# Converted history entries, by id.
+	history = {}
+
+	for s, n in node:
+		k = n.kind
+		if k >= K.END:
+			if k == K.BOUND:
+				if n.identifier not in levels:
+					raise lbn.ReductionError(f"Bound variable \"{n.name}\" has no binder.")
+				results.append(Var(depth - 1 - levels[n.identifier]))
+			elif k == K.FREEVAR:
+				results.append(Free(n.name))
+			elif k == K.MACRO:
+				results.append(Macro(n.name))
+			elif k == K.CHURCH:
+				results.append(Church(n.value))
+			elif (k == K.HISTORY) and (n.entry is not None):
+				# History entries never have history references in them.
+				e = n.entry
+				if id(e) not in history:
+					history[id(e)] = from_node(e.left, unfold = unfold)
+				results.append(history[id(e)])
+			else:
+				raise TypeError(f"I can't convert a {type(n)}")
+
+		elif k == K.FUNC:
+			if s == UP:
+				levels[n.input.identifier] = depth
+				depth += 1
+			else:
+				depth -= 1
+				del levels[n.input.identifier]
+				results.append(Lam(results.pop(), n.input.name))
+
+		elif k == K.CALL:
+			if s == lbn.Direction.RIGHT:
+				arg = results.pop()
+				results.append(App(results.pop(), arg))
+
+		elif k == K.FOLD:
+			if s == lbn.Direction.RIGHT:
+				out = results.pop()
+				fn = results.pop()
+				if unfold:
+					for _ in range(n.count):
+						out = App(fn, out)
+				else:
+					out = Fold(fn, out, n.count)
+				results.append(out)
+
+	return results[0]
+
+def to_node(term: Term) -> lbn.Node:
+	"""
+	Convert a closed de Bruijn term back to a tree.
+	"""
+
+	# Bound variables of the binders we are inside of,
+	# innermost last.
+	binders = []
+	results = []
+	stack = [(term, False)]
+
+	while stack:
+		t, visited = stack.pop()
+		k = t.kind
+
+		if k == VAR:
+			if t.index >= len(binders): # type: ignore
+				raise ValueError("Can't convert a term with free indices.")
+			b = binders[-1 - t.index] # type: ignore
+			results.append(lbn.Bound(b.name, forced_id = b.identifier))
+		elif k == LAM:
+			if visited:
+				results.append(lbn.Func(binders.pop(), results.pop()))
+			else:
+				binders.append(lbn.Bound(t.name)) # type: ignore
+				stack.append((t, True))
+				stack.append((t.body, False)) # type: ignore
+		elif (k == APP) or (k == FOLD):
+			if visited:
+				arg = results.pop()
+				if k == APP:
+					results.append(lbn.Call(results.pop(), arg))
+				else:
+					results.append(lbn.Fold(results.pop(), arg, t.count)) # type: ignore
+			else:
+				stack.append((t, True))
+				stack.append((t.arg, False)) # type: ignore
+				stack.append((t.fn, False)) # type: ignore
+		elif k == FREE:
+			results.append(lbn.FreeVar(t.name)) # type: ignore
+		elif k == MACRO:
+			results.append(lbn.Macro(t.name)) # type: ignore
+		elif k == CHURCH:
+			results.append(lbn.Church(t.value)) # type: ignore
+		elif k == REF:
+			stack.append((t.value(), False)) # type: ignore
+
+	return results[0]
+
+
+class Reducer:
+	"""
+	Does leftmost-outermost reduction steps on a tree,
+	like lbn.Reducer, but works on a de Bruijn copy of it.
+
+	Every term knows whether it contains a redex, so finding
+	the next one only walks a single path down from the top.
+
+	`root` is a tree built from the current term when it is read.
+	The tree passed in is not modified.
+	If `term` is given, we reduce that instead of the tree in `root`,
+	and only use `root` for its runner.
+	"""
+
+	# True if this engine reduces one step at a time.
+	# Engines that don't provide normalize() instead.
+	stepwise = True
+
+	# True if `root` is built every time it is read.
+	builds_root = True
+
+	# If this is a number, every step saves what it changed,
+	# like it does in lbn.Reducer.
+	trace = None
+
+	def __init__(self, root: lbn.Root, *, term: Term = None): # type: ignore
+		if not isinstance(root, lbn.Root):
+			raise TypeError(f"I can't reduce a {type(root)}")
+
+		self.runner = root.runner
+		self.term = from_node(root.left) if term is None else term
+
+		# Converted macro bodies.
+		# The macro table can't change during a reduction.
+		self.macros = {}
+
+		# Delta rules, or None if they're disabled.
+		if (self.runner is not None) and self.runner.delta_rules:
+			self.delta = lbn.delta.matcher(self.runner)
+		else:
+			self.delta = None
+
+		# Hash-consing table, or None if it's disabled.
+		# It is pruned whenever it grows past `prune_at`.
+		if (self.runner is not None) and self.runner.hash_consing:
+			self.interner = Interner()
+			self.term = self.interner.intern(self.term)
+			self.prune_at = 2 * len(self.interner) + 4096
+		else:
+			self.interner = None
+
+	@property
+	def root(self) -> lbn.Root:
+		return lbn.Root(to_node(self.term), runner = self.runner)
+
+	def state(self) -> Term:
+		"""
+		Return the current term, for loop detection.
+		Alpha-equivalent terms give equal states.
+		"""
+		return self.term
+
+	def size(self): # -> int | None
+		"""
+		Return the number of nodes in the current term,
+		or None if this engine can't count them.
+		"""
+		return self.term.size
+
+	def expand_macro(self, name: str) -> Term:
+		if name not in self.macros:
+			if name in self.runner.macro_templates:
+				self.macros[name] = self.runner.macro_templates[name].term
+			elif name in self.runner.macro_table:
+				self.macros[name] = from_node(self.runner.macro_table[name].left)
+			else:
+				raise Exception(f"Macro {name} is not defined")
+		return self.macros[name]
+
+	def literal(self, term: Term): # -> int | None
+		"""
+		Return the value of a numeral, or None if `term` isn't one.
+		"""
+		return term.value if term.kind == CHURCH else None # type: ignore
+
+	def apply_delta(self, t: App, path: list): # -> Term | None
+		"""
+		Try to apply a delta rule to the macro call `t`.
+		If we can, the calls we replace are removed from `path`
+		and the result is returned.
+		"""
+		args = [self.literal(t.arg)]
+		i = len(path)
+		while (
+				(len(args) < lbn.delta.max_arity) and
+				(i > 0) and (path[i - 1][0].kind == APP) and path[i - 1][1]
+			):
+			i -= 1
+			args.append(self.literal(path[i][0].arg))
+
+		d = self.delta.contract(t.fn.name, args) # type: ignore
+		if d is None:
+			return None
+
+		used, out = d
+		del path[len(path) - used + 1:]
+		return out
+
+	def note(
+			self,
+			path: list,
+			before: Term,
+			calls: list,
+			out: Term,
+			r: lbn.ReductionType
+		) -> None:
+		"""
+		Save a step for write_step().
+
+		`path` is the way to the step, as in lbn.display.Context.
+		`before` is the redex, and `calls` are the terms (outermost last)
+		around it that a delta rule used, or [] if it didn't use any.
+		"""
+		for p in calls:
+			before = App(before, p.arg) # type: ignore
+
+		# Macros and numerals are shown on their own,
+		# they're the only thing that changed.
+		if (r == lbn.ReductionType.MACRO_EXPAND) or (r == lbn.ReductionType.AUTOCHURCH):
+			path.append(lbn.Direction.LEFT)
+			before = before.fn # type: ignore
+			out = out.fn # type: ignore
+
+		self.last = (lbn.display.Context(path), before, out)
+
+	def write_step(self, write, *, depth: int) -> None:
+		"""
+		Print what the last step changed, like lbn.display.Context does.
+		Only works if `trace` was set before that step.
+		"""
+		context, before, after = self.last
+
+		def writer(t):
+			return lambda: lbn.display.write_term(
+				t,
+				write,
+				depth = self.trace, # type: ignore
+				length = self.trace, # type: ignore
+				names = context.names,
+				binders = context.binders
+			)
+
+		context.write(write, writer(before), writer(after), depth = depth)
+
+	def step(self) -> lbn.ReductionType:
+		"""
+		Do a single reduction step.
+		Returns the type of reduction that was done.
+		"""
+
+		t = self.term
+		if t.normal:
+			return lbn.ReductionType.NOTHING
+
+		# Find the leftmost-outermost redex,
+		# remembering the path we took to get there.
+		# Path entries are (term, True if we went into its fn).
+		path = []
+		while True:
+			k = t.kind
+			if k == LAM:
+				path.append((t, True))
+				t = t.body # type: ignore
+			elif k == APP:
+				fk = t.fn.kind # type: ignore
+				if (fk == LAM) or (fk == MACRO) or (fk == CHURCH):
+					break
+				if not t.fn.normal: # type: ignore
+					path.append((t, True))
+					t = t.fn # type: ignore
+				else:
+					path.append((t, False))
+					t = t.arg # type: ignore
+			elif k == FOLD:
+				# Folds are unfolded one call at a time, as we reach them.
+				t = t.unfold() # type: ignore
+				if self.interner is not None:
+					t = self.interner.intern(t)
+			else:
+				raise Exception("Reached the bottom of a term with a redex.")
+
+		if self.trace is not None:
+			above = path[:]
+
+		# Contract it
+		fn = t.fn # type: ignore
+		fk = fn.kind
+		if fk == LAM:
+			r = lbn.ReductionType.FUNCTION_APPLY
+			out = instantiate(fn.body, t.arg) # type: ignore
+		elif (
+				(fk == MACRO) and (self.delta is not None) and
+				((out := self.apply_delta(t, path)) is not None) # type: ignore
+			):
+			r = lbn.ReductionType.DELTA
+		elif fk == MACRO:
+			r = lbn.ReductionType.MACRO_EXPAND
+			out = App(self.expand_macro(fn.name), t.arg) # type: ignore
+		else:
+			r = lbn.ReductionType.AUTOCHURCH
+			out = App(church(fn.value), t.arg) # type: ignore
+
+		if self.trace is not None:
+			self.note(
+				[
+					p.name if p.kind == LAM else ( # type: ignore
+						lbn.Direction.LEFT if went_left else lbn.Direction.RIGHT
+					)
+					for p, went_left in path
+				],
+				t,
+				[p for p, _ in reversed(above[len(path):])], # type: ignore
+				out,
+				r
+			)
+
+		# Rebuild the path above it.
+		interner = self.interner
+		if interner is None:
+			while path:
+				p, went_left = path.pop()
+				if p.kind == LAM:
+					out = Lam(out, p.name) # type: ignore
+				elif went_left:
+					out = App(out, p.arg) # type: ignore
+				else:
+					out = App(p.fn, out) # type: ignore
+		else:
+			# Everything off the path is interned already.
+			out = interner.intern(out)
+			while path:
+				p, went_left = path.pop()
+				if p.kind == LAM:
+					out = interner.lam(out, p.name) # type: ignore
+				elif went_left:
+					out = interner.app(out, p.arg) # type: ignore
+				else:
+					out = interner.app(p.fn, out) # type: ignore
+
+			if len(interner) > self.prune_at:
+				interner.prune(out)
+				self.prune_at = 2 * len(interner) + 4096
+
+		self.term = out
+		return r
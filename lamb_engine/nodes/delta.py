@@ -0,0 +1,276 @@
+import lamb_engine
+import lamb_engine.nodes as lbn
+import lamb_engine.nodes.debruijn as dbn
+
+
+# Delta rules: compute arithmetic on church numerals directly.
+#
+# Macros are recognized by their fully expanded bodies, not by their names.
+# Each rule has a list of definitions it matches. Bound variable names
+# in these don't matter, but they can't shadow each other.
+class Rule:
+	def __init__(
+			self,
+			name: str,
+			arity: int,
+			compute,
+			definitions: list[str]
+		):
+		self.name = name
+		self.arity = arity
+
+		# Takes `arity` ints, returns an int or a bool.
+		self.compute = compute
+		self.definitions = definitions
+
+	def __repr__(self):
+		return f"<rule {self.name}>"
+
+rules = [
+	Rule(
+		"successor", 1,
+		lambda n: n + 1,
+		[
+			"λnfa.(f (n f a))",
+			"λnfa.(n f (f a))"
+		]
+	),
+	Rule(
+		"predecessor", 1,
+		lambda n: max(n - 1, 0),
+		[
+			# D from macros.lamb
+			"λn.(n (λp.((λabi.(i a b)) (p (λcd.d)) ((λmfx.(f (m f x))) (p (λcd.d))))) ((λabi.(i a b)) (λfx.x) (λfx.x)) (λab.a))",
+			"λnfx.(n (λgh.(h (g f))) (λu.x) (λu.u))"
+		]
+	),
+	Rule(
+		"add", 2,
+		lambda m, n: m + n,
+		[
+			# ADD from macros.lamb
+			"λmn.(m (λkfa.(f (k f a))) n)",
+			"λmnfa.(m f (n f a))"
+		]
+	),
+	Rule(
+		"multiply", 2,
+		lambda m, n: m * n,
+		[
+			"λnmf.(n (m f))"
+		]
+	),
+	Rule(
+		"is-zero", 1,
+		lambda n: n == 0,
+		[
+			# Z from macros.lamb
+			"λn.(n (λa.(λbc.c)) (λbc.b))"
+		]
+	)
+]
+
+# The most arguments any rule takes.
+max_arity = max(r.arity for r in rules)
+
+true_definition = "λab.a"
+false_definition = "λab.b"
+
+
+class Matcher:
+	"""
+	Finds the delta rules that apply to the macros of a runner.
+	Macros are only checked when they are first asked about.
+
+	One of these is kept on the runner (see `matcher`),
+	and dropped whenever a macro changes.
+	"""
+
+	# Maps de Bruijn terms to rules.
+	# Built from `rules` the first time a matcher is made.
+	definitions = None
+
+	# The size of the largest term in `definitions`.
+	# No bigger macro can match, so we stop expanding there.
+	largest = 0
+
+	def __init__(self, runner):
+		self.runner = runner
+
+		# Macro name -> rule, or None if no rule matches.
+		self.matches = {}
+
+		# Macro name -> fully expanded body,
+		# or None if it is bigger than `largest` or can't be expanded.
+		self.expansions = {}
+
+		# The macros we return for boolean results.
+		# Found the first time we need them.
+		self.booleans = None
+
+		if Matcher.definitions is None:
+			d = {}
+			for r in rules:
+				for s in r.definitions:
+					d[self.parse(s)] = r
+			d[self.parse(true_definition)] = True
+			d[self.parse(false_definition)] = False
+			Matcher.definitions = d
+			Matcher.largest = max(t.size for t in d)
+
+	def parse(self, s: str) -> dbn.Term:
+		e, _ = self.runner.parse(s)
+		return dbn.from_node(e.left)
+
+	def body(self, name: str) -> dbn.Term:
+		"""
+		Return the body of a macro as a de Bruijn term.
+		"""
+		if name in self.runner.macro_templates:
+			return self.runner.macro_templates[name].term
+		return dbn.from_node(self.runner.macro_table[name].left)
+
+	def expand(self, name: str, seen: set): # -> dbn.Term | None
+		"""
+		Replace all macros and numerals in the body of a macro
+		with their definitions.
+
+		Every definition is a small closed term, so we give up
+		and return None as soon as the result is bigger than all of them,
+		or if it has a free variable, an unknown macro, or a cycle.
+		`seen` holds the macros we're already expanding.
+		"""
+
+		if name in self.expansions:
+			return self.expansions[name]
+
+		limit = Matcher.largest
+		size = 0
+		stack = [(self.body(name), False)]
+		results = []
+		while stack:
+			t, visited = stack.pop()
+			k = t.kind
+			if k == dbn.LAM:
+				if visited:
+					results.append(dbn.Lam(results.pop(), t.name)) # type: ignore
+					continue
+				size += 1
+				stack.append((t, True))
+				stack.append((t.body, False)) # type: ignore
+			elif k == dbn.APP:
+				if visited:
+					arg = results.pop()
+					results.append(dbn.App(results.pop(), arg))
+					continue
+				size += 1
+				stack.append((t, True))
+				stack.append((t.arg, False)) # type: ignore
+				stack.append((t.fn, False)) # type: ignore
+			elif k == dbn.VAR:
+				size += 1
+				results.append(t)
+			elif k == dbn.CHURCH:
+				# λf.λa.(f (f ... a)) has 2n + 3 terms.
+				size += 2 * t.value + 3 # type: ignore
+				if size > limit:
+					break
+				results.append(dbn.church(t.value, unfold = True)) # type: ignore
+			elif k == dbn.FOLD:
+				# Definitions don't have folds, so we compare the calls.
+				stack.append((t.unfold(), False)) # type: ignore
+			elif (
+					(k == dbn.MACRO) and
+					(t.name in self.runner.macro_table) and # type: ignore
+					(t.name not in seen) # type: ignore
+				):
+				e = self.expand(t.name, seen | {t.name}) # type: ignore
+				if e is None:
+					size = limit + 1
+					break
+				size += e.size
+				results.append(e)
+			else:
+				size = limit + 1
+				break
+
+			if size > limit:
+				break
+
+		e = results[0] if size <= limit else None
+		self.expansions[name] = e
+		return e
+
+	def match(self, name: str):
+		"""
+		Return the rule that matches the given macro,
+		True or False if it is a boolean, or None.
+		"""
+
+		if name not in self.matches:
+			if name not in self.runner.macro_table:
+				self.matches[name] = None
+			else:
+				t = self.expand(name, {name})
+				if t is None:
+					self.matches[name] = None
+				else:
+					self.matches[name] = Matcher.definitions.get(t) # type: ignore
+		return self.matches[name]
+
+	def rule(self, name: str):
+		"""
+		Return the rule that matches the given macro, or None.
+		"""
+		r = self.match(name)
+		return r if isinstance(r, Rule) else None
+
+	def boolean(self, value: bool) -> dbn.Term:
+		"""
+		Return a term for a boolean.
+		We use a macro if there is one, so results print like
+		they would without delta rules.
+		"""
+		if self.booleans is None:
+			self.booleans = {}
+			for name in self.runner.macro_table:
+				r = self.match(name)
+				if isinstance(r, bool) and (r not in self.booleans):
+					self.booleans[r] = name
+
+		if value in self.booleans:
+			return dbn.Macro(self.booleans[value])
+		return dbn.Lam(dbn.Lam(dbn.Var(1 if value else 0), "b"), "a")
+
+	def contract(self, name: str, args: list): # -> tuple[int, dbn.Term] | None
+		"""
+		Apply a delta rule to a macro, if we can.
+
+		`args` holds the arguments the macro is applied to, innermost first,
+		as ints for numerals and None for anything else.
+		It may be longer or shorter than the rule needs.
+
+		Returns the number of arguments we used and the result,
+		or None if no rule applies.
+		"""
+		rule = self.rule(name)
+		if (rule is None) or (len(args) < rule.arity):
+			return None
+
+		args = args[:rule.arity]
+		if None in args:
+			return None
+
+		v = rule.compute(*args)
+		if isinstance(v, bool):
+			return rule.arity, self.boolean(v)
+		return rule.arity, dbn.Church(v)
+
+
+def matcher(runner) -> Matcher:
+	"""
+	Return the delta rule matcher of a runner, making it if we need to.
+	"""
+	if runner.delta_matcher is None:
+		runner.delta_matcher = Matcher(runner)
+	return runner.delta_matcher
@@ -0,0 +1,490 @@
+"""
+Short, readable display of large expressions.
+
+Results are shown with every macro and church numeral in them
+written by name (T, 6) instead of expanded, and with parts that are
+too deep or too far along left out (…). Results are still converted
+to de Bruijn terms whole, so that takes time linear in their size,
+but only the parts that are shown are looked up.
+
+Macros are found with a MacroIndex, which keys every macro by its
+de Bruijn term (see lbn.debruijn). Alpha-equivalent terms are equal
+there, so finding the macro a term matches is one dict lookup,
+however many macros there are.
+
+Reduction steps are shown with a Context, which prints only
+what a step changed and the path to it.
+"""
+
+import lamb_engine
+import lamb_engine.nodes as lbn
+import lamb_engine.nodes.debruijn as dbn
+
+
+# Numerals larger than this are never unfolded,
+# so they can't be part of a macro we recognize.
+unfold_limit = 4096
+
+# What we print in place of parts we leave out.
+elided = "…"
+
+
+def numeral(term: dbn.Term): # -> int | None
+	"""
+	Return the value of an unfolded church numeral,
+	or None if `term` isn't one.
+	"""
+	if (term.kind != dbn.LAM) or (term.body.kind != dbn.LAM): # type: ignore
+		return None
+
+	n = 0
+	t = term.body.body # type: ignore
+	while (
+			((t.kind == dbn.APP) or (t.kind == dbn.FOLD)) and
+			(t.fn.kind == dbn.VAR) and (t.fn.index == 1) # type: ignore
+		):
+		n += t.count if t.kind == dbn.FOLD else 1 # type: ignore
+		t = t.arg # type: ignore
+	if (t.kind == dbn.VAR) and (t.index == 0): # type: ignore
+		return n
+	return None
+
+
+class MacroIndex:
+	"""
+	Every macro in a runner, by the term it stands for.
+
+	Macros are unfolded first: the macros they use and their numerals
+	are replaced by what they stand for, since that's what they look
+	like in a reduced expression. Recursive macros are left as they are.
+
+	If two macros stand for the same term, the first one wins.
+	Macros that are just a numeral aren't indexed,
+	numerals are always shown as numbers.
+
+	An index has to be made again whenever a macro changes.
+	"""
+
+	def __init__(self, runner):
+		# Unfolded macros, by name.
+		self.expanded = {}
+
+		# Macro names, by unfolded term.
+		self.names = {}
+
+		terms = {}
+		for name, template in runner.macro_templates.items():
+			try:
+				terms[name] = template.term
+			except TypeError:
+				# This macro has a $ in it.
+				pass
+
+		# Unfold every macro after the ones it uses.
+		# Macros we're in the middle of (the ones on `todo`)
+		# are recursive, and are left as references.
+		active = set()
+		for name in terms:
+			todo = [name]
+			while todo:
+				n = todo[-1]
+				if n in self.expanded:
+					todo.pop()
+					continue
+				active.add(n)
+				missing = [
+					m for m in macros(terms[n])
+					if (m in terms) and (m not in self.expanded) and (m not in active)
+				]
+				if missing:
+					todo.extend(missing)
+					continue
+				self.expanded[n] = self.unfold(terms[n])
+				active.discard(n)
+				todo.pop()
+
+		for name, term in terms.items():
+			if term.kind == dbn.CHURCH:
+				continue
+			self.names.setdefault(self.expanded[name], name)
+
+		# Unfolding never makes a term smaller,
+		# so terms larger than this can't be a macro.
+		self.largest = max((t.size for t in self.names), default = 0)
+
+	def unfold(self, term: dbn.Term, memo = None) -> dbn.Term:
+		"""
+		Replace the macros and numerals in `term` with what they stand for.
+		Subterms that don't have any are shared, not copied.
+
+		If `memo` is a dict, the functions and calls we unfold are kept
+		in it, so unfolding parts of the same term again is free.
+		"""
+
+		if memo is None:
+			memo = {}
+		numbers = {}
+		stack = [(term, False)]
+		results = []
+		while stack:
+			t, visited = stack.pop()
+			k = t.kind
+
+			if (not visited) and (id(t) in memo):
+				results.append(memo[id(t)][1])
+				continue
+
+			if k == dbn.LAM:
+				if visited:
+					body = results.pop()
+					results.append(t if body is t.body else dbn.Lam(body, t.name)) # type: ignore
+					memo[id(t)] = (t, results[-1])
+				else:
+					stack.append((t, True))
+					stack.append((t.body, False)) # type: ignore
+				continue
+
+			if k == dbn.APP:
+				if visited:
+					arg = results.pop()
+					fn = results.pop()
+					if (fn is t.fn) and (arg is t.arg): # type: ignore
+						results.append(t)
+					else:
+						results.append(dbn.App(fn, arg))
+					memo[id(t)] = (t, results[-1])
+				else:
+					stack.append((t, True))
+					stack.append((t.arg, False)) # type: ignore
+					stack.append((t.fn, False)) # type: ignore
+				continue
+
+			if k == dbn.REF:
+				stack.append((t.value(), False)) # type: ignore
+				continue
+
+			# Macros are indexed without folds, so we unfold
+			# the ones that are small enough to match one.
+			if k == dbn.FOLD:
+				if t.count <= unfold_limit: # type: ignore
+					stack.append((t.unfold(), False)) # type: ignore
+				else:
+					results.append(t)
+				continue
+
+			e = None
+			if k == dbn.MACRO:
+				e = self.expanded.get(t.name) # type: ignore
+			elif (k == dbn.CHURCH) and (t.value <= unfold_limit): # type: ignore
+				if t.value not in numbers: # type: ignore
+					numbers[t.value] = dbn.church(t.value, unfold = True) # type: ignore
+				e = numbers[t.value] # type: ignore
+
+			results.append(t if e is None else e)
+
+		return results[0]
+
+	def find(self, term: dbn.Term): # -> str | None
+		"""
+		Return the name of the macro an unfolded term stands for,
+		or None if there isn't one.
+		"""
+		if term.free != 0:
+			return None
+		return self.names.get(term)
+
+def macros(term: dbn.Term) -> set:
+	"""
+	The names of the macros a term uses.
+	Shared subterms are only looked at once.
+	"""
+	out = set()
+	seen = set()
+	stack = [term]
+	while stack:
+		t = stack.pop()
+		if id(t) in seen:
+			continue
+		seen.add(id(t))
+		k = t.kind
+		if k == dbn.MACRO:
+			out.add(t.name) # type: ignore
+		elif k == dbn.LAM:
+			stack.append(t.body) # type: ignore
+		elif (k == dbn.APP) or (k == dbn.FOLD):
+			stack.append(t.arg) # type: ignore
+			stack.append(t.fn) # type: ignore
+	return out
+
+
+def write_term(
+		term: dbn.Term,
+		write,
+		*,
+		depth: int,
+		length: int,
+		names = None,
+		binders = None,
+		name = None
+	) -> None:
+	"""
+	Print a de Bruijn term, a piece at a time, like write_node().
+
+	Parts of the term more than `depth` arguments or function bodies
+	deep are left out, and once we've written `length` characters,
+	everything that's left is too.
+
+	`binders` are the printed names of the binders around `term`,
+	innermost last, and `names` is the lbn.Names they were taken from.
+	If `name` is given, subterms it returns a string for are printed
+	as that string.
+	"""
+
+	if names is None:
+		names = lbn.Names()
+	if binders is None:
+		binders = []
+	if name is None:
+		name = lambda t: None
+
+	written = 0
+	def out(s):
+		nonlocal written
+		written += len(s)
+		write(s)
+
+	# Things left to do, last first. Each is a string to write,
+	# None to leave a binder, a list of binders to put back,
+	# or (term, depth, parent kind).
+	todo = [(term, 0, None)]
+	while todo:
+		t = todo.pop()
+		if t is None:
+			names.free(binders.pop())
+			continue
+		if isinstance(t, str):
+			out(t)
+			continue
+		if isinstance(t, list):
+			binders.extend(t)
+			continue
+
+		t, d, parent = t
+		if (d > depth) or (written >= length):
+			out(elided)
+			continue
+
+		text = name(t)
+		if text is not None:
+			out(text)
+			continue
+
+		k = t.kind
+		if k == dbn.VAR:
+			out(binders[-1 - t.index]) # type: ignore
+
+		elif k == dbn.LAM:
+			b = names.take(t.name) # type: ignore
+			binders.append(b)
+
+			if parent == dbn.APP:
+				out("(")
+				todo.append(")")
+			todo.append(None)
+
+			if parent != dbn.LAM:
+				out("λ")
+			out(b)
+
+			# λab.c is printed like λa.λb.c
+			body = t.body # type: ignore
+			inner = body
+			while inner.kind == dbn.REF:
+				inner = inner.cell.value # type: ignore
+			if (inner.kind == dbn.LAM) and (written < length) and (name(body) is None):
+				todo.append((body, d, dbn.LAM))
+			else:
+				out(".")
+				todo.append((body, d + 1, None))
+
+		elif k == dbn.APP:
+			# `t` is f a₁ a₂ ... aₙ, which we print as (((f a₁) a₂) ... aₙ).
+			# If there isn't room for every argument, the last ones are left out.
+			args = []
+			f = t
+			while (f.kind == dbn.APP) and ((f is t) or (name(f) is None)):
+				args.append(f.arg) # type: ignore
+				f = f.fn # type: ignore
+			args.reverse()
+
+			room = max(1, (length - written) // 4)
+			if len(args) > room:
+				del args[room:]
+				out("(")
+				todo.append(")")
+				todo.append(elided)
+				todo.append(" ")
+
+			out("(" * len(args))
+			for a in reversed(args):
+				todo.append(")")
+				todo.append((a, d + 1, dbn.APP))
+				todo.append(" ")
+			todo.append((f, d, dbn.APP))
+
+		# Folds are printed like the calls they stand for.
+		elif k == dbn.FOLD:
+			todo.append((t.unfold(), d, parent)) # type: ignore
+
+		# Shared terms (see lbn.lazy) can't see
+		# the innermost `shift_by` binders around them.
+		elif k == dbn.REF:
+			s = t.shift_by # type: ignore
+			if s != 0:
+				todo.append(binders[-s:])
+				del binders[-s:]
+			todo.append((t.cell.value, d, parent)) # type: ignore
+
+		elif k == dbn.FREE:
+			out(f"{t.name}'") # type: ignore
+		elif k == dbn.MACRO:
+			out(t.name) # type: ignore
+		elif k == dbn.CHURCH:
+			out(str(t.value)) # type: ignore
+
+def write_short(
+		node: lbn.Node,
+		write,
+		index: MacroIndex,
+		*,
+		depth: int,
+		length: int
+	) -> None:
+	"""
+	Print a node like write_node(), but shorter.
+
+	Macros and numerals are printed by name, parts of the
+	expression more than `depth` arguments or function bodies deep
+	are left out, and once we've written `length` characters,
+	everything that's left is too.
+	"""
+
+	if node.kind == lbn.Kind.ROOT:
+		node = node.left # type: ignore
+
+	# Macros and numerals are written as they are, so every
+	# one keeps its own name. Everything else is unfolded
+	# when we get to it, to see if it's a macro.
+	memo = {}
+	def name(t): # -> str | None
+		if (t.kind == dbn.MACRO) or (t.kind == dbn.CHURCH) or (t.free != 0):
+			return None
+		if t.size <= index.largest:
+			t = index.unfold(t, memo)
+			h = index.find(t)
+			if h is not None:
+				return h
+		n = numeral(t)
+		if n is not None:
+			return str(n)
+		return None
+
+	write_term(dbn.from_node(node), write, depth = depth, length = length, name = name)
+
+def format_short(
+		node: lbn.Node,
+		index: MacroIndex,
+		*,
+		depth: int,
+		length: int
+	) -> list[tuple[str, str]]:
+	"""
+	Print a node like write_short(), as formatted text.
+	"""
+	f = lbn.Formatter()
+	write_short(node, f.write, index, depth = depth, length = length)
+	return f.result()
+
+
+class Context:
+	"""
+	Where in an expression a reduction step happened,
+	for showing that step without the rest of the expression.
+
+	`path` says how to get there from the top: the name of every
+	function we go into, Direction.LEFT or RIGHT for every call,
+	and for every shared term we go into (see lbn.lazy),
+	how many binders around it that term can't see.
+
+	`names` and `binders` are what variables are called there,
+	as in write_term().
+	"""
+
+	def __init__(self, path: list):
+		self.names = lbn.Names()
+		self.binders = []
+
+		# What we print above the step, outermost first:
+		# printed binder names and call sides.
+		# Calls on the same side in a row are printed once.
+		self.levels = []
+
+		for p in path:
+			if isinstance(p, str):
+				b = self.names.take(p)
+				self.binders.append(b)
+				self.levels.append(b)
+			elif isinstance(p, lbn.Direction):
+				if (not self.levels) or (self.levels[-1] != p):
+					self.levels.append(p)
+			elif p != 0:
+				del self.binders[-p:]
+
+	def write(self, write, before, after, *, depth: int) -> None:
+		"""
+		Print the expression around the step, with everything that isn't
+		on the way to it left out, and [before → after] in its place.
+		`before` and `after` are called to print the two sides.
+
+		Only the innermost `depth` calls and functions are printed.
+		"""
+		LEFT = lbn.Direction.LEFT
+
+		levels = self.levels
+		if len(levels) > depth:
+			levels = levels[len(levels) - depth:]
+			write(elided)
+			write(" ")
+
+		close = []
+		prev = None
+		for i, l in enumerate(levels):
+			if isinstance(l, str):
+				if not isinstance(prev, str):
+					if prev is not None:
+						write("(")
+						close.append(")")
+					write("λ")
+				write(l)
+				if (i + 1 == len(levels)) or (not isinstance(levels[i + 1], str)):
+					write(".")
+			elif l == LEFT:
+				write("(")
+				close.append(")")
+				close.append(elided)
+				close.append(" ")
+			else:
+				write("(")
+				write(elided)
+				write(" ")
+				close.append(")")
+			prev = l
+
+		write("[")
+		before()
+		write(" → ")
+		after()
+		write("]")
+
+		for s in reversed(close):
+			write(s)
@@ -1,147 +1,425 @@
 import lamb_engine
 import lamb_engine.nodes as lbn
 
-def print_node(node: lbn.Node, *, export: bool = False) -> str:
+# Characters subscript() uses.
+subscript_digits = "₀₁₂₃"
+
+class Names:
+	"""
+	Picks printed names for bound variables.
+
+	A variable is printed with its own name unless a variable
+	we're inside of already uses it. Then we add the smallest
+	subscript that's free: a, a₀, a₁, ...
+
+	`next` keeps, for every base name, a subscript below which
+	every name is taken. So we never check a name twice,
+	and this takes linear time however deep binders are nested.
+	"""
+
+	def __init__(self):
+		self.used = set()
+		self.next = {}
+
+	def take(self, name: str) -> str:
+		if name in self.used:
+			i = self.next.get(name, 0)
+			while (o := name + lamb_engine.utils.subscript(i)) in self.used:
+				i += 1
+			self.next[name] = i + 1
+			name = o
+		self.used.add(name)
+		return name
+
+	def free(self, name: str) -> None:
+		self.used.remove(name)
+
+		# `name` might be any base name with a subscript,
+		# so lower every `next` it's under.
+		i = len(name)
+		while (i > 0) and (name[i - 1] in subscript_digits):
+			i -= 1
+			base = name[:i]
+			if base in self.next:
+				n = 0
+				for c in name[i:]:
+					n = 4 * n + subscript_digits.index(c)
+				if (
+						(n < self.next[base]) and
+						(lamb_engine.utils.subscript(n) == name[i:])
+					):
+					self.next[base] = n
+
+class StopWriting(Exception):
+	pass
+
+def write_node(
+		node: lbn.Node,
+		write,
+		*,
+		export: bool = False,
+		length = None,
+		names = None,
+		bound = None
+	) -> None:
+	"""
+	Print a node, a piece at a time.
+	`write` is called with every piece of text, in order,
+	so large trees can be printed straight to a file.
+
+	Every piece is "(", ")"s, "λ", ".", " ", or a name or value.
+
+	If `length` is given, we stop after that many characters,
+	and write lbn.display.elided and the ")"s we still owe instead.
+
+	If `node` is inside functions, `bound` must map the identifiers
+	of their inputs to printed names, taken from the Names `names`.
+	"""
+
 	if not isinstance(node, lbn.Node):
 		raise TypeError(f"I don't know how to print a {type(node)}")
 
-	out = ""
-
-	bound_subs = {}
+	K = lbn.Kind
+	UP = lbn.Direction.UP
+	LEFT = lbn.Direction.LEFT
+	RIGHT = lbn.Direction.RIGHT
+
+	if names is None:
+		names = Names()
+	bound_subs = {} if bound is None else bound
+
+	# Every node writes at least one piece when we first reach it,
+	# so this stops the walk after at most `length` nodes.
+	if length is not None:
+		limited = write
+		written = 0
+		parens = 0
+		last = "("
+		def write(s):
+			nonlocal written, parens, last
+			if written >= length:
+				raise StopWriting()
+			written += len(s)
+			if s[0] == "(":
+				parens += len(s)
+			elif s[0] == ")":
+				parens -= len(s)
+			last = s
+			limited(s)
+
+		outer = set(bound_subs)
+		try:
+			write_node(node, write, export = export, names = names, bound = bound_subs)
+		except StopWriting:
+			# Give back the names of the functions we stopped in.
+			for i in [i for i in bound_subs if i not in outer]:
+				names.free(bound_subs.pop(i))
+			if last[-1] not in "( .λ":
+				limited(" ")
+			limited(lbn.display.elided)
+			if parens > 0:
+				limited(")" * parens)
+		return
+
+	# The pieces of the function of each fold we're inside of.
+	# `out` also saves pieces there when there are any.
+	folds = []
+	def save(s):
+		write(s)
+		for f in folds:
+			f.append(s)
+	out = write
 
 	for s, n in node:
-		if isinstance(n, lbn.EndNode):
-			if isinstance(n, lbn.Bound):
-				out += bound_subs[n.identifier]
+		k = n.kind
+		if k >= K.END:
+			if k == K.BOUND:
+				out(bound_subs[n.identifier])
 			else:
-				out += n.print_value(export = export)
+				out(n.print_value(export = export))
 
-		elif isinstance(n, lbn.Func):
+		elif k == K.FUNC:
 			# This should never be true, but
 			# keep this here to silence type checker.
 			if not isinstance(n.input, lbn.Bound):
 				raise Exception("input is macro, something is wrong.")
 
-			if s == lbn.Direction.UP:
-				o = n.input.print_value(export = export)
-				if o in bound_subs.values():
-					i = -1
-					p = o
-					while o in bound_subs.values():
-						o = p + lamb_engine.utils.subscript(i := i + 1)
-					bound_subs[n.input.identifier] = o
-				else:
-					bound_subs[n.input.identifier] = n.input.print_value()
-
-				if isinstance(n.parent, lbn.Call):
-					out += "("
+			# The node we're printing doesn't need parentheses,
+			# whatever it's inside of.
+			parent_kind = None if (n.parent is None) or (n is node) else n.parent.kind
+
+			if s == UP:
+				o = names.take(n.input.print_value(export = export))
+				bound_subs[n.input.identifier] = o
+
+				if (parent_kind == K.CALL) or (parent_kind == K.FOLD):
+					out("(")
+
+				if parent_kind != K.FUNC:
+					out("λ")
+				out(o)
+				if n.left.kind != K.FUNC:
+					out(".")
+
+			elif s == LEFT:
+				if (parent_kind == K.CALL) or (parent_kind == K.FOLD):
+					out(")")
+				names.free(bound_subs.pop(n.input.identifier))
+
+		elif k == K.CALL:
+			if s == UP:
+				out("(")
+			elif s == LEFT:
+				out(" ")
+			elif s == RIGHT:
+				out(")")
+
+		# Folds are printed like the calls they stand for.
+		# We print the function once, and repeat its pieces.
+		elif k == K.FOLD:
+			if s == UP:
+				out("(")
+				folds.append([])
+				out = save
+			elif s == LEFT:
+				fn = folds.pop()
+				if not folds:
+					out = write
+				out(" ")
+				for _ in range(n.count - 1):
+					out("(")
+					for p in fn:
+						out(p)
+					out(" ")
+			elif s == RIGHT:
+				out(")" * n.count)
 
-				if isinstance(n.parent, lbn.Func):
-					out += bound_subs[n.input.identifier]
-				else:
-					out += "λ" + bound_subs[n.input.identifier]
-				if not isinstance(n.left, lbn.Func):
-					out += "."
-
-			elif s == lbn.Direction.LEFT:
-				if isinstance(n.parent, lbn.Call):
-					out += ")"
-				del bound_subs[n.input.identifier]
+def print_node(node: lbn.Node, *, export: bool = False) -> str:
+	out = []
+	write_node(node, out.append, export = export)
+	return "".join(out)
 
-		elif isinstance(n, lbn.Call):
-			if s == lbn.Direction.UP:
-				out += "("
-			elif s == lbn.Direction.LEFT:
-				out += " "
-			elif s == lbn.Direction.RIGHT:
-				out += ")"
+class Formatter:
+	"""
+	Turns pieces from write_node() into formatted text, with
+	the same classes lamb_engine.utils.lex_str() would give them.
+	"""
 
-	return out
+	def __init__(self):
+		self.out = []
+		self.text = []
+
+	def write(self, s: str) -> None:
+		c = s[0]
+		if (c == "(") or (c == ")"):
+			cls = "class:syn_paren"
+		elif (s == "λ") or (s == "."):
+			cls = "class:syn_lambda"
+		else:
+			self.text.append(s)
+			return
+		self.flush()
+		self.out.extend((cls, c) for c in s)
+
+	def flush(self) -> None:
+		if self.text:
+			self.out.append(("class:text", "".join(self.text)))
+			self.text.clear()
+
+	def result(self) -> list[tuple[str, str]]:
+		self.flush()
+		return self.out
+
+def format_node(node: lbn.Node) -> list[tuple[str, str]]:
+	"""
+	Print a node as formatted text.
+	"""
+	f = Formatter()
+	write_node(node, f.write)
+	return f.result()
 
 
 def clone(node: lbn.Node):
 	if not isinstance(node, lbn.Node):
 		raise TypeError(f"I don't know what to do with a {type(node)}")
 
+	K = lbn.Kind
+	UP = lbn.Direction.UP
+	LEFT = lbn.Direction.LEFT
+
+	# Maps the identifiers of bound variables in the source tree
+	# to the identifiers of their copies.
 	macro_map = {}
-	if isinstance(node, lbn.Func):
-		c = node.copy()
-		macro_map[node.input.identifier] = c.input.identifier # type: ignore
-	else:
-		c = node.copy()
 
-	out = c
+	def copy(n):
+		c = n.copy()
+		k = n.kind
+		if k == K.FUNC:
+			macro_map[n.input.identifier] = c.input.identifier
+		elif k == K.BOUND:
+			if c.identifier in macro_map:
+				c.identifier = macro_map[c.identifier]
+		return c
+
+	out = copy(node)
+	if node.kind >= K.END:
+		return out
+
 	out_ptr = out # Stays one step behind ptr, in the new tree.
 	ptr = node
-	from_side = lbn.Direction.UP
-
-
-	if isinstance(node, lbn.EndNode):
-		return out
+	from_side = UP
+	stop = node.parent
 
 	# We're not using a TreeWalker here because
 	# we need more control over our pointer when cloning.
+	#
+	# Nodes are copied before their children, so when we go up
+	# we add the size of the finished child to its parent.
 	while True:
-		if isinstance(ptr, lbn.EndNode):
+		if ptr.kind >= K.END:
 			from_side, ptr = ptr.go_up()
-			_, out_ptr = out_ptr.go_up()
-		elif isinstance(ptr, lbn.Func) or isinstance(ptr, lbn.Root):
-			if from_side == lbn.Direction.UP:
-				from_side, ptr = ptr.go_left()
-
-				if isinstance(ptr, lbn.Func):
-					c = ptr.copy()
-					macro_map[ptr.input.identifier] = c.input.identifier # type: ignore
-				elif isinstance(ptr, lbn.Bound):
-					c = ptr.copy()
-					if c.identifier in macro_map:
-						c.identifier = macro_map[c.identifier]
-				else:
-					c = ptr.copy()
-				out_ptr.set_side(ptr.parent_side, c)
+			out_ptr = out_ptr.parent
+
+		# Every non-end node has a left side,
+		# only calls and folds have a right side.
+		elif from_side == UP:
+			from_side, ptr = ptr.go_left()
+			out_ptr.left = copy(ptr)
+			out_ptr = out_ptr.left
+		elif (from_side == LEFT) and ((ptr.kind == K.CALL) or (ptr.kind == K.FOLD)):
+			from_side, ptr = ptr.go_right()
+			out_ptr.right = copy(ptr)
+			out_ptr = out_ptr.right
+		else:
+			from_side, ptr = ptr.go_up()
+			if out_ptr is not out:
+				# Copies of folds start with the size of their calls.
+				d = out_ptr.size - (out_ptr.count if out_ptr.kind == K.FOLD else 1)
+				if (out_ptr.parent.kind == K.FOLD) and (out_ptr.parent_side == LEFT):
+					d *= out_ptr.parent.count
+				out_ptr.parent.size += d
+			out_ptr = out_ptr.parent
+
+		if ptr is stop:
+			break
+	return out
 
-				_, out_ptr = out_ptr.go_left()
-			elif from_side == lbn.Direction.LEFT:
-				from_side, ptr = ptr.go_up()
-				_, out_ptr = out_ptr.go_up()
-		elif isinstance(ptr, lbn.Call):
-			if from_side == lbn.Direction.UP:
-				from_side, ptr = ptr.go_left()
-
-				if isinstance(ptr, lbn.Func):
-					c = ptr.copy()
-					macro_map[ptr.input.identifier] = c.input.identifier # type: ignore
-				elif isinstance(ptr, lbn.Bound):
-					c = ptr.copy()
-					if c.identifier in macro_map:
-						c.identifier = macro_map[c.identifier]
-				else:
-					c = ptr.copy()
-				out_ptr.set_side(ptr.parent_side, c)
-
-				_, out_ptr = out_ptr.go_left()
-			elif from_side == lbn.Direction.LEFT:
-				from_side, ptr = ptr.go_right()
-
-				if isinstance(ptr, lbn.Func):
-					c = ptr.copy()
-					macro_map[ptr.input.identifier] = c.input.identifier # type: ignore
-				elif isinstance(ptr, lbn.Bound):
-					c = ptr.copy()
-					if c.identifier in macro_map:
-						c.identifier = macro_map[c.identifier]
-				else:
-					c = ptr.copy()
-				out_ptr.set_side(ptr.parent_side, c)
 
-				_, out_ptr = out_ptr.go_right()
-			elif from_side == lbn.Direction.RIGHT:
-				from_side, ptr = ptr.go_up()
-				_, out_ptr = out_ptr.go_up()
+class Template:
+	"""
+	A tree compiled into a flat list of instructions,
+	which can be turned into a new copy of that tree
+	much faster than clone() can copy it.
 
-		if ptr is node.parent:
-			break
-	return out
+	Runners keep one of these for every macro.
+	The tree must not change after it is compiled.
+	"""
+
+	# Instructions, run in order on a stack of nodes.
+	LEAF = 0	# (LEAF, node): push a copy of an end node
+	VAR = 1		# (VAR, binder, name): push a bound variable
+	FUNC = 2	# (FUNC, binder, name): pop a body, push a function
+	CALL = 3	# (CALL,): pop an argument and a function, push a call
+	FOLD = 4	# (FOLD, count): like CALL, but push a fold
+
+	__slots__ = ("ops", "binders", "source", "_term")
+
+	def __init__(self, node: lbn.Node):
+		K = lbn.Kind
+		UP = lbn.Direction.UP
+
+		# The tree we compiled.
+		self.source = node
+
+		# de Bruijn form, made when it is first needed.
+		self._term = None
+
+		# Binders are numbered in the order we see them.
+		# Bound variables that aren't bound inside the tree
+		# keep their identifier.
+		binders = {}
+		ops = []
+
+		for s, n in node:
+			k = n.kind
+			if k >= K.END:
+				if (k == K.BOUND) and (n.identifier in binders):
+					ops.append((Template.VAR, binders[n.identifier], n.name))
+				else:
+					ops.append((Template.LEAF, n))
+			elif k == K.FUNC:
+				if s == UP:
+					binders[n.input.identifier] = len(binders)
+				else:
+					ops.append((Template.FUNC, binders[n.input.identifier], n.input.name))
+			elif k == K.CALL:
+				if s == lbn.Direction.RIGHT:
+					ops.append((Template.CALL,))
+			elif k == K.FOLD:
+				if s == lbn.Direction.RIGHT:
+					ops.append((Template.FOLD, n.count))
+			else:
+				raise TypeError(f"I can't compile a {type(n)}")
+
+		self.ops = ops
+		self.binders = len(binders)
+
+	@staticmethod
+	def from_ops(ops: list, binders: int):
+		"""
+		Make a template from instructions, like the ones in `ops`.
+		Its source is a new copy of the tree they make.
+		"""
+		t = Template.__new__(Template)
+		t.ops = ops
+		t.binders = binders
+		t._term = None
+		t.source = t.instantiate()
+		return t
+
+	def instantiate(self) -> lbn.Node:
+		"""
+		Make a new copy of the compiled tree,
+		with new identifiers for its bound variables.
+		"""
+
+		# Take a block of identifiers for our binders.
+		base = lbn.nodes.bound_counter
+		lbn.nodes.bound_counter += self.binders
+
+		LEAF = Template.LEAF
+		VAR = Template.VAR
+		FUNC = Template.FUNC
+		CALL = Template.CALL
+		Bound = lbn.Bound
+
+		stack = []
+		push = stack.append
+		pop = stack.pop
+		for op in self.ops:
+			o = op[0]
+			if o == LEAF:
+				push(op[1].copy())
+			elif o == VAR:
+				push(Bound(op[2], forced_id = base + op[1]))
+			elif o == FUNC:
+				push(lbn.Func(Bound(op[2], forced_id = base + op[1]), pop()))
+			elif o == CALL:
+				arg = pop()
+				push(lbn.Call(pop(), arg))
+			else:
+				arg = pop()
+				push(lbn.Fold(pop(), arg, op[1]))
+		return stack[0]
+
+	@property
+	def term(self):
+		"""
+		The compiled tree as a de Bruijn term.
+		"""
+		if self._term is None:
+			self._term = lbn.debruijn.from_node(self.source)
+		return self._term
 
 def prepare(root: lbn.Root, *, ban_macro_name = None) -> list:
 	"""
@@ -155,24 +433,27 @@ def prepare(root: lbn.Root, *, ban_macro_name = None) -> list:
 	if not isinstance(root, lbn.Root):
 		raise TypeError(f"I don't know what to do with a {type(root)}")
 
+	K = lbn.Kind
 	bound_variables = {}
 
 	warnings = []
 
 	it = iter(root)
 	for s, n in it:
-		if isinstance(n, lbn.History):
+		k = n.kind
+		if k == K.HISTORY:
 			if root.runner.history[0] == None:
 				raise lbn.ReductionError("There isn't any history to reference.")
 			else:
+				n.entry = root.runner.history[0]
 				warnings += [
 					("class:code", "$"),
 					("class:warn", " will be expanded to ")
-				] + lamb_engine.utils.lex_str(str(n.expand()[1]))
+				] + root.runner.format(n.entry)
 
 		# If this expression is part of a macro,
 		# make sure we don't reference it inside itself.
-		elif isinstance(n, lbn.Macro):
+		elif k == K.MACRO:
 			if (n.name == ban_macro_name) and (ban_macro_name is not None):
 				raise lbn.ReductionError("Macro cannot reference self")
 
@@ -200,7 +481,7 @@ def prepare(root: lbn.Root, *, ban_macro_name = None) -> list:
 
 		# Save bound variables when we enter a function's sub-tree,
 		# delete them when we exit it.
-		elif isinstance(n, lbn.Func):
+		elif k == K.FUNC:
 			if s == lbn.Direction.UP:
 				# Add this function's input to the table of bound variables.
 				# If it is already there, raise an error.
@@ -221,38 +502,311 @@ def prepare(root: lbn.Root, *, ban_macro_name = None) -> list:
 # Apply a function.
 # Returns the function's output.
 def call_func(fn: lbn.Func, arg: lbn.Node):
+	K = lbn.Kind
+	UP = lbn.Direction.UP
+	LEFT = lbn.Direction.LEFT
+	RIGHT = lbn.Direction.RIGHT
+	identifier = fn.input.identifier
+
+	# Sizes are fixed as we leave each node, once everything
+	# below it is done. That's much faster than updating
+	# every node above each substitution.
 	for s, n in fn:
-		if isinstance(n, lbn.Bound) and (s == lbn.Direction.UP):
-			if n == fn.input:
+		k = n.kind
+		if k == K.BOUND:
+			if n.identifier == identifier:
 				if n.parent is None:
 					raise Exception("Tried to substitute a None bound variable.")
-
 				n.parent.set_side(n.parent_side, clone(arg)) # type: ignore
+		elif k == K.CALL:
+			if s == RIGHT:
+				n.size = n.left.size + n.right.size + 1
+		elif k == K.FUNC:
+			if s == LEFT:
+				n.size = n.left.size + 1
+		elif k == K.FOLD:
+			if s == RIGHT:
+				n.size = n.count * (n.left.size + 1) + n.right.size # type: ignore
 	return fn.left
 
-# Do a single reduction step
-def reduce(root: lbn.Root) -> tuple[lbn.ReductionType, lbn.Root]:
-	if not isinstance(root, lbn.Root):
-		raise TypeError(f"I can't reduce a {type(root)}")
+class Reducer:
+	"""
+	Does leftmost-outermost reduction steps on a tree,
+	remembering where it stopped between calls to `step()`.
 
-	out = root
-	for s, n in out:
-		if isinstance(n, lbn.Call) and (s == lbn.Direction.UP):
-			if isinstance(n.left, lbn.Func):
-				n.parent.set_side(
-					n.parent_side, # type: ignore
-					call_func(n.left, n.right)
+	Everything to the left of (and above) the last reduction site
+	is already free of redexes, so we don't need to walk it again.
+	The only node a reduction can turn into a new redex is the
+	parent of the node we replaced, so we check that first and
+	then continue the walk from the replacement.
+
+	The tree must not be modified between steps by anything
+	other than this reducer.
+	"""
+
+	# True if this engine reduces one step at a time.
+	# Engines that don't provide normalize() instead.
+	stepwise = True
+
+	# True if `root` is built every time it is read.
+	# Ours is the tree we reduce.
+	builds_root = False
+
+	# If this is a number, every step saves what it changed,
+	# so write_step() can show it. Both sides of the change
+	# are cut off after this many characters.
+	trace = None
+
+	def __init__(self, root: lbn.Root):
+		if not isinstance(root, lbn.Root):
+			raise TypeError(f"I can't reduce a {type(root)}")
+
+		self.root = root
+
+		# The walk position, as in TreeWalker:
+		# the node we're at and the direction we came from.
+		self.ptr: lbn.Node = root
+		self.from_side = lbn.Direction.UP
+
+		# Delta rules, or None if they're disabled.
+		runner = root.runner
+		if (runner is not None) and runner.delta_rules:
+			self.delta = lbn.delta.matcher(runner)
+		else:
+			self.delta = None
+
+	def state(self):
+		"""
+		Return the current tree as a de Bruijn term, for loop detection.
+		Alpha-equivalent trees give equal states.
+		"""
+		return lbn.debruijn.from_node(self.root.left)
+
+	def size(self): # -> int | None
+		"""
+		Return the number of nodes in the current tree,
+		or None if this engine can't count them.
+		Folds count as the calls they stand for.
+		"""
+		return self.root.left.size
+
+	def replace(self, node: lbn.Node, out: lbn.Node) -> None:
+		"""
+		Replace `node` with `out`,
+		and continue from the first place a new redex could be.
+		"""
+		K = lbn.Kind
+		parent = node.parent
+		side = node.parent_side
+		parent.replace_side(side, out) # type: ignore
+
+		# Replacing the left side of a call may
+		# have turned that call into a redex.
+		if (
+				(parent.kind == K.CALL) and
+				(side == lbn.Direction.LEFT) and
+				(
+					(out.kind == K.FUNC) or
+					(out.kind >= K.EXPANDABLE)
 				)
+			):
+			self.ptr = parent # type: ignore
+		else:
+			self.ptr = out
+		self.from_side = lbn.Direction.UP
+
+	def note(self, node: lbn.Node) -> None:
+		"""
+		Save `node`, which the step we're about to do replaces,
+		and the path to it, for write_step().
+		"""
+		K = lbn.Kind
+
+		path = []
+		funcs = []
+		n = node
+		while n.parent.kind != K.ROOT: # type: ignore
+			p = n.parent
+			if p.kind == K.FUNC: # type: ignore
+				path.append(p.input.print_value()) # type: ignore
+				funcs.append(p)
+			else:
+				path.append(n.parent_side)
+			n = p
+		path.reverse()
+		funcs.reverse()
+
+		context = lbn.display.Context(path)
+		bound = {f.input.identifier: b for f, b in zip(funcs, context.binders)}
+
+		# The tree is changed in place, so we print this now.
+		before = []
+		write_node(node, before.append, length = self.trace, names = context.names, bound = bound)
+		self.last = (context, bound, before, node.parent, node.parent_side)
+
+	def write_step(self, write, *, depth: int) -> None:
+		"""
+		Print what the last step changed, like lbn.display.Context does.
+		Only works if `trace` was set before that step.
+		"""
+		context, bound, before, parent, side = self.last
+
+		def write_before():
+			for s in before:
+				write(s)
+
+		def write_after():
+			write_node(
+				parent.get_side(side),
+				write,
+				length = self.trace,
+				names = context.names,
+				bound = bound
+			)
 
-				return lbn.ReductionType.FUNCTION_APPLY, out
+		context.write(write, write_before, write_after, depth = depth)
+
+	def apply_delta(self, call: lbn.Call) -> bool:
+		"""
+		Try to apply a delta rule to the macro on the left of `call`.
+		Returns True if we did.
+		"""
+		K = lbn.Kind
+		LEFT = lbn.Direction.LEFT
+
+		# Collect the arguments of the macro, and the calls they're in.
+		calls = [call]
+		args = []
+		while True:
+			n = calls[-1]
+			args.append(n.right.value if n.right.kind == K.CHURCH else None) # type: ignore
+			p = n.parent
+			if (
+					len(args) == lbn.delta.max_arity or
+					(p.kind != K.CALL) or (n.parent_side != LEFT) # type: ignore
+				):
+				break
+			calls.append(p) # type: ignore
+
+		d = self.delta.contract(call.left.name, args) # type: ignore
+		if d is None:
+			return False
+
+		used, out = d
+		if self.trace is not None:
+			self.note(calls[used - 1])
+		self.replace(calls[used - 1], lbn.debruijn.to_node(out))
+		return True
+
+	def step(self) -> lbn.ReductionType:
+		"""
+		Do a single reduction step.
+		Returns the type of reduction that was done.
+		"""
+
+		K = lbn.Kind
+		UP = lbn.Direction.UP
+		LEFT = lbn.Direction.LEFT
+
+		root = self.root
+		from_side = self.from_side
+		ptr = self.ptr
+
+		while True:
+			k = ptr.kind
+
+			# Unfold numerals as we reach them.
+			if (k == K.FOLD) and (from_side == UP):
+				ptr = ptr.unfold() # type: ignore
+				k = K.CALL
+
+			if (k == K.CALL) and (from_side == UP):
+				left_kind = ptr.left.kind
+				if left_kind == K.FUNC:
+					if self.trace is not None:
+						self.note(ptr)
+					self.replace(ptr, call_func(ptr.left, ptr.right))
+					return lbn.ReductionType.FUNCTION_APPLY
+
+				elif left_kind >= K.EXPANDABLE:
+					if (
+							(left_kind == K.MACRO) and
+							(self.delta is not None) and
+							self.apply_delta(ptr) # type: ignore
+						):
+						return lbn.ReductionType.DELTA
+
+					if self.trace is not None:
+						self.note(ptr.left)
+					r, e = ptr.left.expand(root.runner)
+					ptr.replace_side(LEFT, e)
+					self.ptr = ptr
+					self.from_side = UP
+					return r
+
+			# $ is only copied if what it stands for can be reduced.
+			elif (k == K.HISTORY) and (from_side == UP) and ptr.reducible(root.runner): # type: ignore
+				if self.trace is not None:
+					self.note(ptr)
+				r, e = ptr.expand(root.runner)
+				self.replace(ptr, e)
+				return r
+
+			# Move to the next node in the outline.
+			if k >= K.END:
+				from_side, ptr = ptr.go_up()
+			elif k == K.CALL:
+				if from_side == UP:
+					from_side, ptr = ptr.go_left()
+				elif from_side == LEFT:
+					from_side, ptr = ptr.go_right()
+				else:
+					from_side, ptr = ptr.go_up()
+			elif k == K.FUNC:
+				if from_side == UP:
+					from_side, ptr = ptr.go_left()
+				else:
+					from_side, ptr = ptr.go_up()
+			elif k == K.ROOT:
+				if from_side == UP:
+					from_side, ptr = ptr.go_left()
+				else:
+					break
+			else:
+				raise TypeError(f"I don't know how to iterate a {type(ptr)}")
 
-			elif isinstance(n.left, lbn.ExpandableEndNode):
-				r, n.left = n.left.expand()
-				return r, out
-	return lbn.ReductionType.NOTHING, out
+		# We walked off the end of the tree.
+		# Stay here, so later calls return immediately.
+		self.ptr = root
+		self.from_side = lbn.Direction.LEFT
+		return lbn.ReductionType.NOTHING
+
+def is_normal(node: lbn.Node) -> bool:
+	"""
+	Return True if a Reducer would find nothing to reduce in a tree:
+	no call or fold has a function or an expandable node on its left.
+	"""
+	K = lbn.Kind
+	UP = lbn.Direction.UP
+	for s, n in node:
+		k = n.kind
+		if (s == UP) and ((k == K.CALL) or (k == K.FOLD)):
+			left_kind = n.left.kind
+			if (left_kind == K.FUNC) or (left_kind >= K.EXPANDABLE):
+				return False
+	return True
+
+# Do a single reduction step
+def reduce(root: lbn.Root, *, strategy = "normal") -> tuple[lbn.ReductionType, lbn.Root]:
+	"""
+	Do a single reduction step, searching from the root.
+	`strategy` must be a key in lbn.strategies.reducers.
+	Use a Reducer to do many steps on the same tree.
+	"""
+	return lbn.strategies.reducers[strategy](root).step(), root
 
 
-def expand(root: lbn.Root, *, force_all = False) -> tuple[int, lbn.Root]:
+def expand(root: lbn.Root, *, force_all = False, only = None) -> tuple[int, lbn.Root]:
 	"""
 	Expands expandable nodes in the given tree.
 
@@ -261,6 +815,9 @@ def expand(root: lbn.Root, *, force_all = False) -> tuple[int, lbn.Root]:
 
 	If force_all is True, this expands ALL
 	ExpandableEndnodes.
+
+	If `only` is given, this expands the
+	ExpandableEndnodes only(node) is true for instead.
 	"""
 
 	if not isinstance(root, lbn.Root):
@@ -272,13 +829,17 @@ def expand(root: lbn.Root, *, force_all = False) -> tuple[int, lbn.Root]:
 	it = iter(root)
 	for s, n in it:
 		if (
-				isinstance(n, lbn.ExpandableEndNode) and
-				(force_all or n.always_expand)
+				(n.kind >= lbn.Kind.EXPANDABLE) and
+				(
+					(force_all or n.always_expand)
+					if only is None else only(n)
+				)
 			):
 
-			n.parent.set_side(
+			e = n.expand(root.runner)[1]
+			n.parent.replace_side(
 				n.parent_side, # type: ignore
-				n.expand()[1]
+				e
 			)
 			it.ptr = n.parent.get_side(
 				n.parent_side # type: ignore
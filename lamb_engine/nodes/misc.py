@@ -24,6 +24,10 @@ class ReductionType(enum.Enum):
 	# This is the only type of "formal" reduction step.
 	FUNCTION_APPLY	= enum.auto()
 
+	# We computed arithmetic on church numerals directly,
+	# with a delta rule.
+	DELTA			= enum.auto()
+
 # Pretty, short names for each reduction type.
 # These should all have the same length.
 reduction_text = {
@@ -32,6 +36,7 @@ reduction_text = {
 	ReductionType.HIST_EXPAND:		"H",
 	ReductionType.AUTOCHURCH:		"C",
 	ReductionType.FUNCTION_APPLY:	"F",
+	ReductionType.DELTA:			"D",
 }
 
 class ReductionError(Exception):
@@ -42,3 +47,29 @@ class ReductionError(Exception):
 	"""
 	def __init__(self, msg: str):
 		self.msg = msg
+
+
+class Kind:
+	"""
+	Integer node type tags.
+	Every node class sets `kind` to one of these,
+	and the walkers dispatch on it instead of using isinstance.
+
+	These are plain ints (not an enum) so that comparing them is cheap.
+	Order matters: every kind at or after END is an EndNode,
+	and every kind at or after EXPANDABLE is an ExpandableEndNode.
+	Calls and folds both have a left and a right side.
+	"""
+	ROOT		= 0
+	FUNC		= 1
+	CALL		= 2
+	FOLD		= 3
+
+	END			= 4
+	BOUND		= 4
+	FREEVAR		= 5
+
+	EXPANDABLE	= 6
+	MACRO		= 6
+	CHURCH		= 7
+	HISTORY		= 8
@@ -0,0 +1,407 @@
+import sys
+import threading
+
+import lamb_engine
+import lamb_engine.nodes as lbn
+import lamb_engine.nodes.debruijn as dbn
+
+
+# Semantic values.
+#
+# A term is evaluated into one of these. Functions become closures,
+# and anything that can't be applied any further becomes a Neutral.
+# Arguments are always passed as Thunks, so they are evaluated
+# only if they are needed, and at most once.
+
+class Thunk:
+	"""
+	A delayed evaluation of `term` in `env`.
+	"""
+
+	__slots__ = ("term", "env", "value")
+
+	def __init__(self, term, env, value = None):
+		self.term = term
+		self.env = env
+		self.value = value
+
+class VLam:
+	"""
+	A function: the body of a λ and the environment it was made in.
+	"""
+
+	__slots__ = ("body", "env", "name")
+
+	def __init__(self, body, env, name: str):
+		self.body = body
+		self.env = env
+		self.name = name
+
+class Neutral:
+	"""
+	An application that can't be reduced, because its head is
+	a free variable or a variable bound by a binder we're reading back.
+
+	`head` is a dbn.Free, or an int (the level of the binder).
+	`args` is a tuple of Thunks.
+	"""
+
+	__slots__ = ("head", "args")
+
+	def __init__(self, head, args = ()):
+		self.head = head
+		self.args = args
+
+class VMacro:
+	"""
+	A macro or church numeral that hasn't been applied to anything.
+	`term` is the dbn.Macro or dbn.Church it came from.
+	These are expanded when they are applied, and read back as they are
+	if they aren't, just like the other engines do.
+	"""
+
+	__slots__ = ("term",)
+
+	def __init__(self, term):
+		self.term = term
+
+class VDelta:
+	"""
+	A macro with a delta rule, applied to fewer arguments than the rule needs.
+	`term` is the dbn.Macro, `args` is a tuple of Thunks.
+	If the arguments don't turn out to be numerals,
+	the macro is expanded and applied to them as usual.
+	"""
+
+	__slots__ = ("term", "args")
+
+	def __init__(self, term, args = ()):
+		self.term = term
+		self.args = args
+
+
+class Stop(Exception):
+	"""
+	Raised inside evaluation to stop it.
+	"""
+	pass
+
+
+class Reducer(dbn.Reducer):
+	"""
+	Finds the β-normal form with normalization by evaluation.
+
+	Instead of rewriting the term one redex at a time, we evaluate it into
+	Python closures and read the result back into a term. This doesn't
+	give us a trace, so this engine can't reduce step-by-step.
+
+	Counted reductions are function applications and expansions of
+	macros and numerals. Since arguments are shared, there are usually
+	far fewer of these than with the other engines.
+	"""
+
+	stepwise = False
+
+	# Evaluation is recursive. We run it in a thread with a big stack
+	# and raise the recursion limit, so deep terms don't crash.
+	# Evaluation nests at most a few calls per reduction, so with a
+	# reduction limit we allow `frames_per_reduction` calls for each.
+	stack_size = 512 * 1024 * 1024
+	recursion_limit = 1_000_000
+	frames_per_reduction = 4
+
+	def __init__(self, root: lbn.Root):
+		super().__init__(root)
+
+		# Evaluated macro bodies.
+		# These are closed, so we can share them.
+		self.macro_values = {}
+
+		# Reduction counters.
+		# `applications` only counts function applications.
+		self.reductions = 0
+		self.applications = 0
+		self.limit = None
+
+		# Set from the main thread to stop evaluation.
+		self.interrupted = False
+
+		# If normalize() stopped because we used too much memory,
+		# how much we were using, in bytes. None otherwise.
+		self.memory_used = None
+
+	def count(self):
+		if (
+				self.interrupted or
+				((self.limit is not None) and (self.reductions >= self.limit))
+			):
+			raise Stop()
+		self.reductions += 1
+
+	def force(self, thunk: Thunk):
+		if thunk.value is None:
+			thunk.value = self.eval(thunk.term, thunk.env)
+
+			# We don't need these anymore.
+			thunk.term = None
+			thunk.env = None
+		return thunk.value
+
+	def eval(self, term: dbn.Term, env):
+		"""
+		Evaluate a term to a value.
+		`env` holds thunks for the binders we're inside of,
+		as a linked list of (thunk, rest) pairs, innermost first.
+
+		Applying a function is a tail call, so we loop instead of
+		recursing. Otherwise terms like (M M) would run out of stack
+		long before they reach the reduction limit.
+		"""
+
+		while True:
+			k = term.kind
+			if k == dbn.VAR:
+				for _ in range(term.index): # type: ignore
+					env = env[1]
+				return self.force(env[0])
+
+			elif k == dbn.LAM:
+				return VLam(term.body, env, term.name) # type: ignore
+
+			elif k == dbn.APP:
+				fn = self.eval(term.fn, env) # type: ignore
+				arg = term.arg # type: ignore
+
+				# Don't make new thunks for variables.
+				if arg.kind == dbn.VAR:
+					e = env
+					for _ in range(arg.index):
+						e = e[1]
+					thunk = e[0]
+				else:
+					thunk = Thunk(arg, env)
+
+				# Macros are unfolded here too, so applying them doesn't recurse.
+				while isinstance(fn, VMacro) and not self.has_rule(fn.term):
+					self.count()
+					fn = self.unfold(fn.term)
+
+				if not isinstance(fn, VLam):
+					return self.apply(fn, thunk)
+				self.count()
+				self.applications += 1
+				term = fn.body
+				env = (thunk, fn.env)
+
+			elif k == dbn.FOLD:
+				# This is a call, with the rest of the fold as its argument.
+				term = term.unfold() # type: ignore
+
+			elif k == dbn.FREE:
+				return Neutral(term)
+
+			elif (k == dbn.MACRO) or (k == dbn.CHURCH):
+				return VMacro(term)
+
+			else:
+				raise TypeError(f"I can't evaluate a {type(term)}")
+
+	def apply(self, fn, arg: Thunk):
+		if isinstance(fn, VLam):
+			self.count()
+			self.applications += 1
+			return self.eval(fn.body, (arg, fn.env))
+
+		elif isinstance(fn, Neutral):
+			return Neutral(fn.head, fn.args + (arg,))
+
+		elif isinstance(fn, VMacro):
+			if self.has_rule(fn.term):
+				return self.apply_delta(VDelta(fn.term, (arg,)))
+
+			self.count()
+			return self.apply(self.unfold(fn.term), arg)
+
+		elif isinstance(fn, VDelta):
+			return self.apply_delta(VDelta(fn.term, fn.args + (arg,)))
+
+		else:
+			raise TypeError(f"I can't apply a {type(fn)}")
+
+	def has_rule(self, term: dbn.Term) -> bool:
+		"""
+		Return True if `term` is a macro with a delta rule.
+		"""
+		return (
+			(term.kind == dbn.MACRO) and
+			(self.delta is not None) and
+			(self.delta.rule(term.name) is not None) # type: ignore
+		)
+
+	def unfold(self, term: dbn.Term):
+		"""
+		Return the value of a macro or church numeral.
+		"""
+		if term.kind == dbn.MACRO:
+			return self.expand(term) # type: ignore
+		return self.eval(dbn.church(term.value), None) # type: ignore
+
+	def expand(self, macro: dbn.Macro):
+		"""
+		Return the value of a macro's body.
+		"""
+		if macro.name not in self.macro_values:
+			self.macro_values[macro.name] = self.eval(
+				self.expand_macro(macro.name),
+				None
+			)
+		return self.macro_values[macro.name]
+
+	def literal(self, thunk: Thunk): # -> int | None
+		"""
+		Return the value of a thunk if it holds a numeral, or None.
+		Thunks aren't forced, so we never evaluate anything
+		that normal order wouldn't.
+		"""
+		if thunk.value is None:
+			t = thunk.term
+		elif isinstance(thunk.value, VMacro):
+			t = thunk.value.term
+		else:
+			return None
+		return t.value if t.kind == dbn.CHURCH else None # type: ignore
+
+	def apply_delta(self, fn: VDelta):
+		"""
+		Apply a delta rule if `fn` has all the arguments it needs.
+		If it doesn't, wait for more.
+		"""
+		rule = self.delta.rule(fn.term.name) # type: ignore
+		if len(fn.args) < rule.arity: # type: ignore
+			return fn
+		return self.contract_delta(fn)
+
+	def contract_delta(self, fn: VDelta):
+		"""
+		Apply the delta rule of `fn`, or expand its macro
+		and apply that if its arguments aren't all numerals.
+		"""
+		d = self.delta.contract( # type: ignore
+			fn.term.name,
+			[self.literal(a) for a in fn.args]
+		)
+		self.count()
+		if d is not None:
+			return self.eval(d[1], None)
+
+		out = self.expand(fn.term)
+		for a in fn.args:
+			out = self.apply(out, a)
+		return out
+
+	def read_back(self, value, level: int) -> dbn.Term:
+		"""
+		Turn a value back into a term.
+		`level` is the number of binders we're inside of.
+		"""
+
+		if isinstance(value, VLam):
+			return dbn.Lam(
+				self.read_back(
+					self.eval(
+						value.body,
+						(Thunk(None, None, Neutral(level)), value.env)
+					),
+					level + 1
+				),
+				value.name
+			)
+
+		elif isinstance(value, Neutral):
+			if isinstance(value.head, int):
+				out = dbn.Var(level - 1 - value.head)
+			else:
+				out = value.head
+			for a in value.args:
+				out = dbn.App(out, self.read_back(self.force(a), level))
+			return out
+
+		elif isinstance(value, VMacro):
+			return value.term
+
+		elif isinstance(value, VDelta):
+			return self.read_back(self.contract_delta(value), level)
+
+		else:
+			raise TypeError(f"I can't read back a {type(value)}")
+
+	def normalize(self, limit = None, *, memory_limit = None) -> tuple[int, bool]:
+		"""
+		Find the normal form of our term.
+		Gives up after `limit` reductions, if limit isn't None,
+		or once we use more than `memory_limit` bytes, if that isn't None.
+
+		Returns the number of reductions done, and
+		True if we found the normal form.
+
+		If we're interrupted with Ctrl-C, we stop evaluation and
+		re-raise the KeyboardInterrupt.
+		"""
+
+		self.limit = limit
+		out = []
+
+		def run():
+			try:
+				out.append(self.read_back(self.eval(self.term, None), 0))
+			except Stop:
+				pass
+			except RecursionError:
+				out.append(lbn.ReductionError(
+					f"Evaluation nested too deeply after {self.reductions:,} reductions."
+				))
+			except BaseException as e:
+				out.append(e)
+
+		old_stack = threading.stack_size()
+		old_limit = sys.getrecursionlimit()
+		threading.stack_size(self.stack_size)
+		depth = self.recursion_limit
+		if limit is not None:
+			depth = max(depth, limit * self.frames_per_reduction)
+		sys.setrecursionlimit(max(old_limit, depth))
+		try:
+			t = threading.Thread(target = run, daemon = True)
+			t.start()
+		finally:
+			threading.stack_size(old_stack)
+
+		try:
+			# Wait with a timeout, so Ctrl-C can get through.
+			while t.is_alive():
+				try:
+					t.join(0.1)
+					if memory_limit is not None:
+						m = lamb_engine.utils.memory_usage()
+						if m > memory_limit:
+							self.memory_used = m
+							self.interrupted = True
+							t.join()
+				except KeyboardInterrupt:
+					self.interrupted = True
+					t.join()
+					raise
+		finally:
+			sys.setrecursionlimit(old_limit)
+
+		if len(out) == 0:
+			return self.reductions, False
+		if isinstance(out[0], BaseException):
+			raise out[0]
+
+		self.term = out[0]
+		return self.reductions, True
+
+	def size(self): # -> int | None
+		# There's no term to count until evaluation is done.
+		return None
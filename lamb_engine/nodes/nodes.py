@@ -12,6 +12,8 @@ class TreeWalker:
 	out_side is the direction we came to the node from.
 	"""
 
+	__slots__ = ("expr", "ptr", "first_step", "from_side")
+
 	def __init__(self, expr):
 		self.expr = expr
 		self.ptr = expr
@@ -31,28 +33,29 @@ class TreeWalker:
 			self.first_step = False
 			return self.from_side, self.ptr
 
-		if isinstance(self.ptr, Root):
-			if self.from_side == lbn.Direction.UP:
-				self.from_side, self.ptr = self.ptr.go_left()
-		elif isinstance(self.ptr, EndNode):
+		k = self.ptr.kind
+		if k >= lbn.Kind.END:
 			self.from_side, self.ptr = self.ptr.go_up()
-		elif isinstance(self.ptr, Func):
+		elif (k == lbn.Kind.CALL) or (k == lbn.Kind.FOLD):
 			if self.from_side == lbn.Direction.UP:
 				self.from_side, self.ptr = self.ptr.go_left()
 			elif self.from_side == lbn.Direction.LEFT:
+				self.from_side, self.ptr = self.ptr.go_right()
+			elif self.from_side == lbn.Direction.RIGHT:
 				self.from_side, self.ptr = self.ptr.go_up()
-		elif isinstance(self.ptr, Call):
+		elif k == lbn.Kind.FUNC:
 			if self.from_side == lbn.Direction.UP:
 				self.from_side, self.ptr = self.ptr.go_left()
 			elif self.from_side == lbn.Direction.LEFT:
-				self.from_side, self.ptr = self.ptr.go_right()
-			elif self.from_side == lbn.Direction.RIGHT:
 				self.from_side, self.ptr = self.ptr.go_up()
+		elif k == lbn.Kind.ROOT:
+			if self.from_side == lbn.Direction.UP:
+				self.from_side, self.ptr = self.ptr.go_left()
 		else:
 			raise TypeError(f"I don't know how to iterate a {type(self.ptr)}")
 
 		# Stop conditions
-		if isinstance(self.expr, Root):
+		if self.expr.kind == lbn.Kind.ROOT:
 			if self.ptr is self.expr:
 				raise StopIteration
 		else:
@@ -65,8 +68,19 @@ class Node:
 	"""
 	Generic class for an element of an expression tree.
 	All nodes are subclasses of this.
+
+	Nodes use __slots__, since large trees have millions of them.
+	Every concrete subclass sets `kind` to a value in lbn.Kind.
+
+	`size` is the number of nodes in this node's subtree,
+	counting every call a fold stands for (see Fold).
+	Setting a side only updates the size of this node,
+	use replace_side() to update the nodes above it too.
 	"""
 
+	__slots__ = ("parent", "parent_side", "_left", "_right", "size")
+	kind: int = None # type: ignore
+
 	def __init__(self):
 		# The node this one is connected to.
 		# None if this is the top objects.
@@ -80,9 +94,7 @@ class Node:
 		self._left = None
 		self._right = None
 
-		# The runner this node is attached to.
-		# Set by Node.set_runner()
-		self.runner: lamb_engine.runner.Runner = None # type: ignore
+		self.size = 1
 
 	def __iter__(self):
 		return TreeWalker(self)
@@ -108,8 +120,11 @@ class Node:
 
 	@left.setter
 	def left(self, node):
+		if self._left is not None:
+			self.size -= self._left.size
 		if node is not None:
 			node._set_parent(self, lbn.Direction.LEFT)
+			self.size += node.size
 		self._left = node
 
 	@property
@@ -118,8 +133,11 @@ class Node:
 
 	@right.setter
 	def right(self, node):
+		if self._right is not None:
+			self.size -= self._right.size
 		if node is not None:
 			node._set_parent(self, lbn.Direction.RIGHT)
+			self.size += node.size
 		self._right = node
 
 
@@ -136,6 +154,24 @@ class Node:
 		else:
 			raise TypeError("Can only set left or right side.")
 
+	def replace_side(self, side: lbn.Direction, node) -> None:
+		"""
+		Set a side, like set_side(), and update
+		the size of every node above this one.
+		"""
+		old_size = self.size
+		self.set_side(side, node)
+
+		# The function of a fold is counted once for every call.
+		delta = self.size - old_size
+		n = self
+		while (delta != 0) and (n.parent is not None):
+			p = n.parent
+			if (p.kind == lbn.Kind.FOLD) and (n.parent_side == lbn.Direction.LEFT):
+				delta *= p.count
+			p.size += delta
+			n = p
+
 	def get_side(self, side: lbn.Direction):
 		if side == lbn.Direction.LEFT:
 			return self.left
@@ -197,26 +233,31 @@ class Node:
 		"""
 		return lbn.print_node(self, export = True)
 
-	def set_runner(self, runner):
-		for s, n in self:
-			if s == lbn.Direction.UP:
-				n.runner = runner # type: ignore
-		return self
-
 class EndNode(Node):
+	__slots__ = ()
+
 	def print_value(self, *, export: bool = False) -> str:
 		raise NotImplementedError("EndNodes MUST provide a `print_value` method!")
 
 class ExpandableEndNode(EndNode):
+	__slots__ = ()
 	always_expand = False
-	def expand(self) -> tuple[lbn.ReductionType, Node]:
+
+	def expand(self, runner) -> tuple[lbn.ReductionType, Node]:
+		"""
+		Return the expression this node stands for.
+		`runner` is the runner of the tree this node is in,
+		nodes don't keep a reference to it.
+		"""
 		raise NotImplementedError("ExpandableEndNodes MUST provide an `expand` method!")
 
 class FreeVar(EndNode):
-	def __init__(self, name: str, *, runner = None):
+	__slots__ = ("name",)
+	kind = lbn.Kind.FREEVAR
+
+	def __init__(self, name: str):
 		super().__init__()
 		self.name = name
-		self.runner = runner # type: ignore
 
 	def __repr__(self):
 		return f"<freevar {self.name}>"
@@ -231,16 +272,16 @@ class FreeVar(EndNode):
 		return FreeVar(self.name)
 
 class Macro(ExpandableEndNode):
+	__slots__ = ("name",)
+	kind = lbn.Kind.MACRO
+
 	@staticmethod
 	def from_parse(results):
 		return Macro(results[0])
 
-	def __init__(self, name: str, *, runner = None) -> None:
+	def __init__(self, name: str) -> None:
 		super().__init__()
 		self.name = name
-		self.left = None
-		self.right = None
-		self.runner = runner # type: ignore
 
 	def __repr__(self):
 		return f"<macro {self.name}>"
@@ -248,34 +289,39 @@ class Macro(ExpandableEndNode):
 	def print_value(self, *, export: bool = False) -> str:
 		return self.name
 
-	def expand(self) -> tuple[lbn.ReductionType, Node]:
-		if self.name in self.runner.macro_table:
+	def expand(self, runner) -> tuple[lbn.ReductionType, Node]:
+		if self.name in runner.macro_templates:
+			return (
+				lbn.ReductionType.MACRO_EXPAND,
+				runner.macro_templates[self.name].instantiate()
+			)
+		elif self.name in runner.macro_table:
 			# The element in the macro table will be a Root node,
 			# so we clone its left element.
 			return (
 				lbn.ReductionType.MACRO_EXPAND,
-				lbn.clone(self.runner.macro_table[self.name].left)
+				lbn.clone(runner.macro_table[self.name].left)
 			)
 		else:
 			raise Exception(f"Macro {self.name} is not defined")
 
 	def to_freevar(self):
-		return FreeVar(self.name, runner = self.runner)
+		return FreeVar(self.name)
 
 	def copy(self):
-		return Macro(self.name, runner = self.runner)
+		return Macro(self.name)
 
 class Church(ExpandableEndNode):
+	__slots__ = ("value",)
+	kind = lbn.Kind.CHURCH
+
 	@staticmethod
 	def from_parse(results):
 		return Church(int(results[0]))
 
-	def __init__(self, value: int, *, runner = None) -> None:
+	def __init__(self, value: int) -> None:
 		super().__init__()
 		self.value = value
-		self.left = None
-		self.right = None
-		self.runner = runner # type: ignore
 
 	def __repr__(self):
 		return f"<church {self.value}>"
@@ -283,34 +329,46 @@ class Church(ExpandableEndNode):
 	def print_value(self, *, export: bool = False) -> str:
 		return str(self.value)
 
-	def expand(self) -> tuple[lbn.ReductionType, Node]:
+	def expand(self, runner) -> tuple[lbn.ReductionType, Node]:
 		f = Bound("f")
 		a = Bound("a")
-		chain = a
 
-		for i in range(self.value):
-			chain = Call(lbn.clone(f), lbn.clone(chain))
+		# The chain of calls is only built as it is needed,
+		# so big numbers don't take up lots of memory.
+		if self.value == 0:
+			chain = lbn.clone(a)
+		else:
+			chain = Fold(lbn.clone(f), lbn.clone(a), self.value)
 
 		return (
 			lbn.ReductionType.AUTOCHURCH,
-			Func(f, Func(a, chain)).set_runner(self.runner)
+			Func(f, Func(a, chain))
 		)
 
 	def copy(self):
-		return Church(self.value, runner = self.runner)
+		return Church(self.value)
 
 class History(ExpandableEndNode):
-	always_expand = True
+	"""
+	A reference to an earlier result, written as $.
+
+	prepare() sets `entry` to the result it stands for (a Root in
+	runner.history), which every copy of this node shares. It is only
+	copied when this node is expanded, and that only happens if the
+	reduction needs it: when it's called, like a macro, or when
+	the result it stands for can be reduced (see reducible()).
+	"""
+
+	__slots__ = ("entry",)
+	kind = lbn.Kind.HISTORY
 
 	@staticmethod
 	def from_parse(results):
 		return History()
 
-	def __init__(self, *, runner = None) -> None:
+	def __init__(self, entry = None) -> None:
 		super().__init__()
-		self.left = None
-		self.right = None
-		self.runner = runner # type: ignore
+		self.entry = entry
 
 	def __repr__(self):
 		return f"<$>"
@@ -318,25 +376,42 @@ class History(ExpandableEndNode):
 	def print_value(self, *, export: bool = False) -> str:
 		return "$"
 
-	def expand(self) -> tuple[lbn.ReductionType, Node]:
+	def reducible(self, runner) -> bool:
+		"""
+		Return True if the result we stand for has redexes,
+		like results of reductions that stopped early.
+		"""
+		entry = self.entry
+		if entry is None:
+			entry = runner.history[0]
+		return not runner.history.is_normal(entry)
+
+	def expand(self, runner) -> tuple[lbn.ReductionType, Node]:
+		entry = self.entry
+		if entry is None:
+			entry = runner.history[0]
+
 		# We shouldn't ever get here, prepare()
 		# catches empty history.
-		if self.runner.history[0] == None:
+		if entry is None:
 			raise Exception(f"Tried to expand empty history.")
 		# .left is VERY important!
-		# self.runner.history will contain Root nodes,
+		# runner.history will contain Root nodes,
 		# and we don't want those *inside* our tree.
-		return lbn.ReductionType.HIST_EXPAND, lbn.clone(self.runner.history[0].left)
+		return lbn.ReductionType.HIST_EXPAND, lbn.clone(entry.left)
 
 	def copy(self):
-		return History(runner = self.runner)
+		return History(self.entry)
 
 bound_counter = 0
 class Bound(EndNode):
-	def __init__(self, name: str, *, forced_id = None, runner = None, macro_name = None):
+	__slots__ = ("name", "macro_name", "identifier")
+	kind = lbn.Kind.BOUND
+
+	def __init__(self, name: str, *, forced_id = None, macro_name = None):
+		super().__init__()
 		self.name = name
 		global bound_counter
-		self.runner = runner # type: ignore
 
 		# The name of the macro this bound came from.
 		# Always equal to self.name, unless the macro
@@ -352,8 +427,7 @@ class Bound(EndNode):
 	def copy(self):
 		return Bound(
 			self.name,
-			forced_id = self.identifier,
-			runner = self.runner
+			forced_id = self.identifier
 		)
 
 	def __eq__(self, other):
@@ -368,49 +442,50 @@ class Bound(EndNode):
 		return self.name
 
 class Func(Node):
+	__slots__ = ("input",)
+	kind = lbn.Kind.FUNC
+
 	@staticmethod
 	def from_parse(result):
-		if len(result[0]) == 1:
-			return Func(
-				result[0][0],
-				result[1]
-			)
-		else:
-			return Func(
-				result[0].pop(0),
-				Func.from_parse(result)
-			)
-
-	def __init__(self, input, output: Node, *, runner = None) -> None:
+		# λab.x is λa.λb.x.
+		# This is a loop, since functions may have many arguments.
+		out = result[1]
+		for i in reversed(result[0]):
+			out = Func(i, out)
+		return out
+
+	def __init__(self, input, output: Node) -> None:
 		super().__init__()
 		self.input = input
 		self.left: Node = output
-		self.right: None = None
-		self.runner = runner # type: ignore
 
 	def __repr__(self):
 		return f"<func {self.input!r} {self.left!r}>"
 
 	def copy(self):
 		return Func(
-			Bound(
-				self.input.name,
-				runner = self.runner
-			),
-			None, # type: ignore
-			runner = self.runner
+			Bound(self.input.name),
+			None # type: ignore
 		)
 
 class Root(Node):
 	"""
 	Root node.
 	Used at the top of an expression.
+
+	This is the only node that knows which runner it belongs to.
 	"""
 
+	__slots__ = ("runner",)
+	kind = lbn.Kind.ROOT
+
 	def __init__(self, left: Node, *, runner = None) -> None:
 		super().__init__()
 		self.left: Node = left
-		self.runner = runner # type: ignore
+
+		# The runner this tree is attached to.
+		# Set by Root.set_runner()
+		self.runner: lamb_engine.runner.Runner = runner # type: ignore
 
 	def __repr__(self):
 		return f"<Root {self.left!r}>"
@@ -418,35 +493,91 @@ class Root(Node):
 	def copy(self):
 		return Root(None, runner = self.runner) # type: ignore
 
+	def set_runner(self, runner):
+		self.runner = runner
+		return self
+
 class Call(Node):
+	__slots__ = ()
+	kind = lbn.Kind.CALL
+
 	@staticmethod
 	def from_parse(results):
-		if len(results) == 2:
-			return Call(
-				results[0],
-				results[1]
-			)
-		else:
-			this = Call(
-				results[0],
-				results[1]
-			)
+		# a b c is (a b) c.
+		# This is a loop, since calls may have many arguments.
+		out = Call(results[0], results[1])
+		for r in results[2:]:
+			out = Call(out, r)
+		return out
+
+	def __init__(self, fn: Node, arg: Node) -> None:
+		super().__init__()
+		self.left: Node = fn
+		self.right: Node = arg
 
-			return Call.from_parse(
-				[Call(
-					results[0],
-					results[1]
-				)] + results[2:]
-			)
+	def __repr__(self):
+		return f"<call {self.left!r} {self.right!r}>"
+
+	def copy(self):
+		return Call(None, None) # type: ignore
+
+class Fold(Node):
+	"""
+	`count` nested calls of the same function:
+	(fn (fn (... (fn arg)))), where fn is on the left and arg on the right.
+	`count` is always at least 1.
 
-	def __init__(self, fn: Node, arg: Node, *, runner = None) -> None:
+	This is how church numerals are expanded.
+	It is unfolded one call at a time, when reduction reaches it.
+
+	Our size counts every call we stand for, so unfolding
+	doesn't change the size of anything above us.
+	"""
+
+	__slots__ = ("count",)
+	kind = lbn.Kind.FOLD
+
+	def __init__(self, fn: Node, arg: Node, count: int) -> None:
 		super().__init__()
+		self.count = count
+		self.size = count
 		self.left: Node = fn
 		self.right: Node = arg
-		self.runner = runner # type: ignore
 
 	def __repr__(self):
-		return f"<call {self.left!r} {self.right!r}>"
+		return f"<fold {self.count} {self.left!r} {self.right!r}>"
+
+	@property
+	def left(self):
+		return self._left
+
+	@left.setter
+	def left(self, node):
+		if self._left is not None:
+			self.size -= self.count * self._left.size
+		if node is not None:
+			node._set_parent(self, lbn.Direction.LEFT)
+			self.size += self.count * node.size
+		self._left = node
 
 	def copy(self):
-		return Call(None, None, runner = self.runner) # type: ignore
\ No newline at end of file
+		return Fold(None, None, self.count) # type: ignore
+
+	def unfold(self) -> Call:
+		"""
+		Replace this node with its outermost call, and return that call.
+		The rest of the fold is the right side of the new call.
+		"""
+		parent = self.parent
+		side = self.parent_side
+		parent.set_side(side, None)
+
+		if self.count == 1:
+			out = Call(self.left, self.right)
+		else:
+			self.count -= 1
+			self.size -= self.left.size + 1
+			out = Call(lbn.clone(self.left), self)
+
+		parent.set_side(side, out)
+		return out
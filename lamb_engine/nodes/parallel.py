@@ -0,0 +1,456 @@
+import atexit
+import multiprocessing
+import os
+import signal
+
+import lamb_engine
+import lamb_engine.nodes as lbn
+import lamb_engine.nodes.debruijn as dbn
+
+
+# Number of worker processes.
+# If None, we start one for every CPU.
+# With fewer than two, everything is reduced in this process.
+processes = None
+
+# Every part gets this many reductions in this process first.
+# Only parts that aren't normal by then are sent to a worker,
+# since sending small jobs takes longer than doing them.
+local_steps = 500
+
+# Workers take reductions from the shared budget this many at a time,
+# so they don't have to lock it for every one.
+budget_chunk = 64
+
+# The budget we give workers when there's no reduction limit.
+# We still need one, since emptying it is how we stop them.
+unlimited_budget = 2 ** 62
+
+
+def encode(term: dbn.Term) -> list:
+	"""
+	Flatten a term into a list of tuples in postfix order.
+	This is how terms are sent to and from workers,
+	since pickling a deep term directly would overflow the stack.
+	"""
+
+	out = []
+	stack = [(term, False)]
+	while stack:
+		t, visited = stack.pop()
+		k = t.kind
+		if k == dbn.LAM:
+			if visited:
+				out.append((k, t.name)) # type: ignore
+			else:
+				stack.append((t, True))
+				stack.append((t.body, False)) # type: ignore
+		elif (k == dbn.APP) or (k == dbn.FOLD):
+			if visited:
+				out.append((k,) if k == dbn.APP else (k, t.count)) # type: ignore
+			else:
+				stack.append((t, True))
+				stack.append((t.arg, False)) # type: ignore
+				stack.append((t.fn, False)) # type: ignore
+		elif k == dbn.VAR:
+			out.append((k, t.index)) # type: ignore
+		elif k == dbn.CHURCH:
+			out.append((k, t.value)) # type: ignore
+		elif (k == dbn.FREE) or (k == dbn.MACRO):
+			out.append((k, t.name)) # type: ignore
+		else:
+			raise TypeError(f"I can't encode a {type(t)}")
+	return out
+
+def decode(ops: list) -> dbn.Term:
+	"""
+	Rebuild a term made by encode().
+	"""
+
+	stack = []
+	for op in ops:
+		k = op[0]
+		if k == dbn.APP:
+			arg = stack.pop()
+			stack.append(dbn.App(stack.pop(), arg))
+		elif k == dbn.FOLD:
+			arg = stack.pop()
+			stack.append(dbn.Fold(stack.pop(), arg, op[1]))
+		elif k == dbn.LAM:
+			stack.append(dbn.Lam(stack.pop(), op[1]))
+		elif k == dbn.VAR:
+			stack.append(dbn.Var(op[1]))
+		elif k == dbn.CHURCH:
+			stack.append(dbn.Church(op[1]))
+		elif k == dbn.FREE:
+			stack.append(dbn.Free(op[1]))
+		elif k == dbn.MACRO:
+			stack.append(dbn.Macro(op[1]))
+		else:
+			raise TypeError(f"I can't decode a {k}")
+	return stack[0]
+
+
+# The runner in a worker process, and the reductions
+# all workers have left, shared between them.
+# Set by start_worker().
+worker_runner = None
+worker_budget = None
+
+def start_worker(budget, runner_class, macros, delta_rules, hash_consing):
+	"""
+	Set up a worker process.
+	`budget` is the multiprocessing.Value workers take reductions from.
+	`macros` holds (name, encoded body) pairs.
+	"""
+
+	# Ctrl-C goes to every process. Only the main one should handle it,
+	# it stops the workers itself.
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+	global worker_runner, worker_budget
+	worker_budget = budget
+	r = runner_class(None, None)
+	r.delta_rules = delta_rules
+	r.hash_consing = hash_consing
+	for name, body in macros:
+		r.macro_table[name] = lbn.Root(dbn.to_node(decode(body)), runner = r)
+		r.macro_templates[name] = lbn.Template(r.macro_table[name].left)
+	worker_runner = r
+
+def take_budget(n: int) -> int:
+	"""
+	Take up to `n` reductions from the shared budget.
+	Returns the number we got, which is 0 once it has run out.
+	"""
+	with worker_budget.get_lock(): # type: ignore
+		n = min(n, worker_budget.value) # type: ignore
+		worker_budget.value -= n # type: ignore
+	return n
+
+def normalize_part(ops: list): # -> tuple[list, int, int, bool]
+	"""
+	Find the normal form of an encoded term in a worker.
+	Every reduction is taken from the shared budget,
+	and we give up once there are none left.
+
+	Returns the encoded result, the number of reductions,
+	the number of function applications, and True if
+	we found the normal form.
+	"""
+
+	r = dbn.Reducer(lbn.Root(None, runner = worker_runner), term = decode(ops)) # type: ignore
+	k = 0
+	applications = 0
+
+	# Reductions we took from the budget but haven't done yet.
+	left = 0
+	try:
+		while True:
+			if left == 0:
+				left = take_budget(budget_chunk)
+				if left == 0:
+					return encode(r.term), k, applications, False
+
+			red_type = r.step()
+			if red_type == lbn.ReductionType.NOTHING:
+				return encode(r.term), k, applications, True
+			k += 1
+			left -= 1
+			if red_type == lbn.ReductionType.FUNCTION_APPLY:
+				applications += 1
+	finally:
+		if left > 0:
+			take_budget(-left)
+
+
+# Workers are kept between reductions,
+# and restarted when the macros they need change.
+# `pool_budget` is the budget the workers share.
+pool = None
+pool_key = None
+pool_budget = None
+
+def get_pool(reducer): # -> multiprocessing.pool.Pool | None
+	"""
+	Return a pool of workers that knows the macros of `reducer`,
+	or None if we shouldn't use one.
+	"""
+	global pool, pool_key, pool_budget
+
+	n = processes if processes is not None else os.cpu_count()
+	if (n is None) or (n < 2):
+		return None
+
+	# The runner bumps macro_version whenever a macro changes,
+	# so we don't have to compare the macros themselves.
+	runner = reducer.runner
+	key = (
+		runner,
+		runner.macro_version,
+		runner.delta_rules,
+		runner.hash_consing
+	)
+
+	if (pool is None) or (pool_key != key):
+		stop_pool()
+		pool_budget = multiprocessing.Value("q", 0)
+		pool = multiprocessing.Pool(
+			n,
+			initializer = start_worker,
+			initargs = (
+				pool_budget,
+				type(runner),
+				[(name, encode(reducer.expand_macro(name))) for name in runner.macro_table],
+				runner.delta_rules,
+				runner.hash_consing
+			)
+		)
+		pool_key = key
+	return pool
+
+def stop_pool() -> None:
+	"""
+	Stop all workers, even if they're busy.
+	"""
+	global pool, pool_key, pool_budget
+	if pool is not None:
+		pool.terminate()
+		pool.join()
+	pool = None
+	pool_key = None
+	pool_budget = None
+
+atexit.register(stop_pool)
+
+
+class Stop(Exception):
+	"""
+	Raised to stop reduction early.
+	"""
+	pass
+
+def spine(term: dbn.Term) -> tuple[list, dbn.Term, list]:
+	"""
+	Split a term into the names of the functions around it,
+	the head of its body, and the arguments the head is applied to.
+	"""
+	names = []
+	while term.kind == dbn.LAM:
+		names.append(term.name) # type: ignore
+		term = term.body # type: ignore
+
+	args = []
+	while term.kind == dbn.APP:
+		args.append(term.arg) # type: ignore
+		term = term.fn # type: ignore
+	args.reverse()
+	return names, term, args
+
+def unspine(names: list, head: dbn.Term, args: list) -> dbn.Term:
+	"""
+	The inverse of spine().
+	"""
+	out = head
+	for a in args:
+		out = dbn.App(out, a)
+	for name in reversed(names):
+		out = dbn.Lam(out, name)
+	return out
+
+
+class Reducer(dbn.Reducer):
+	"""
+	Finds the β-normal form, reducing independent parts
+	of the term in worker processes.
+
+	We reduce the head of the term here until it is a variable.
+	After that, its arguments can't affect each other, so each one
+	is sent to a worker that finds its normal form with a dbn.Reducer.
+	If only one argument still has redexes, we reduce its head here
+	instead, to find more work we can split up.
+
+	This does the same reductions as the debruijn engine, so it gives
+	the same normal form and the same reduction count.
+	Workers share what is left of the reduction limit,
+	so together they never do more reductions than it allows.
+	"""
+
+	stepwise = False
+
+	# Check memory use after this many reductions in this process.
+	memory_interval = 1024
+
+	def __init__(self, root: lbn.Root):
+		super().__init__(root)
+
+		# Reduction counters, like nbe.Reducer.
+		self.reductions = 0
+		self.applications = 0
+		self.limit = None
+		self.memory_limit = None
+
+		# If normalize() stopped because we used too much memory,
+		# how much we were using, in bytes. None otherwise.
+		self.memory_used = None
+
+	def size(self): # -> int | None
+		# Parts of our term are in other processes while we reduce.
+		return None
+
+	def check_memory(self) -> None:
+		if self.memory_limit is not None:
+			m = lamb_engine.utils.memory_usage()
+			if m > self.memory_limit: # type: ignore
+				self.memory_used = m
+				raise Stop()
+
+	def reduce_here(self, term: dbn.Term, *, head_only = False, steps = None) -> dbn.Term:
+		"""
+		Reduce a term in this process.
+		If `head_only` is True, we stop once its head is a variable.
+		If `steps` isn't None, we stop after that many reductions.
+		"""
+		self.term = term
+		while (steps is None) or (steps > 0):
+			if head_only:
+				_, head, _ = spine(self.term)
+				if (head.kind == dbn.VAR) or (head.kind == dbn.FREE):
+					break
+
+			if (self.limit is not None) and (self.reductions >= self.limit):
+				raise Stop()
+
+			red_type = self.step()
+			if red_type == lbn.ReductionType.NOTHING:
+				break
+
+			self.reductions += 1
+			if steps is not None:
+				steps -= 1
+			if red_type == lbn.ReductionType.FUNCTION_APPLY:
+				self.applications += 1
+			if self.reductions % self.memory_interval == 0:
+				self.check_memory()
+		return self.term
+
+	def wait(self, job):
+		"""
+		Wait for a worker to finish a job, and return its result.
+		"""
+		while True:
+			try:
+				return job.get(0.1)
+			except multiprocessing.TimeoutError:
+				self.check_memory()
+
+	def reduce_parts(self, args: list, todo: list) -> None:
+		"""
+		Find the normal forms of the arguments in `args`
+		with the indices in `todo`, in place.
+		"""
+		p = get_pool(self)
+		if p is None:
+			for i in todo:
+				args[i] = self.reduce_here(args[i])
+			return
+
+		for i in todo:
+			args[i] = self.reduce_here(args[i], steps = local_steps)
+		big = [i for i in todo if not args[i].normal]
+
+		# A single part may still have parts of its own.
+		if len(big) == 1:
+			args[big[0]] = self.solve(args[big[0]])
+			return
+		elif len(big) == 0:
+			return
+
+		if self.limit is None:
+			pool_budget.value = unlimited_budget # type: ignore
+		else:
+			pool_budget.value = self.limit - self.reductions # type: ignore
+
+		jobs = [
+			(i, p.apply_async(normalize_part, (encode(args[i]),)))
+			for i in big
+		]
+
+		finished = True
+		try:
+			for i, job in jobs:
+				ops, k, applications, done = self.wait(job)
+				args[i] = decode(ops)
+				self.reductions += k
+				self.applications += applications
+				finished = finished and done
+		except Stop:
+			# Workers give up once the budget is empty,
+			# so we can keep them for the next reduction.
+			pool_budget.value = 0 # type: ignore
+			for _, job in jobs:
+				job.wait()
+			raise
+
+		if not finished:
+			raise Stop()
+
+	def solve(self, term: dbn.Term) -> dbn.Term:
+		"""
+		Find the normal form of a term.
+		"""
+
+		# The terms we went into, to rebuild them as we come back out.
+		# Entries are (names, head, args, index of the arg we went into).
+		frames = []
+		while True:
+			term = self.reduce_here(term, head_only = True)
+			names, head, args = spine(term)
+			todo = [i for i, a in enumerate(args) if not a.normal]
+
+			if len(todo) == 1:
+				frames.append((names, head, args, todo[0]))
+				term = args[todo[0]]
+				continue
+
+			if len(todo) != 0:
+				self.reduce_parts(args, todo)
+			term = unspine(names, head, args)
+			break
+
+		while frames:
+			names, head, args, i = frames.pop()
+			args[i] = term
+			term = unspine(names, head, args)
+		return term
+
+	def normalize(self, limit = None, *, memory_limit = None) -> tuple[int, bool]:
+		"""
+		Find the normal form of our term.
+		Gives up after `limit` reductions, if limit isn't None,
+		or once we use more than `memory_limit` bytes, if that isn't None.
+
+		Returns the number of reductions done, and
+		True if we found the normal form.
+		If we stop early, our term is left as it was.
+		"""
+
+		self.limit = limit
+		self.memory_limit = memory_limit
+		start = self.term
+
+		try:
+			out = self.solve(start)
+		except Stop:
+			self.term = start
+			return self.reductions, False
+		except BaseException:
+			# Workers may still be busy, and we can't wait for them.
+			self.term = start
+			stop_pool()
+			raise
+
+		if self.interner is not None:
+			out = self.interner.intern(out)
+		self.term = out
+		return self.reductions, True
@@ -0,0 +1,208 @@
+import time
+
+import lamb_engine
+import lamb_engine.nodes as lbn
+import lamb_engine.nodes.debruijn as dbn
+
+
+# Opt-in counters for the hot paths of reduction.
+#
+# Nothing here is counted unless enable() has been called.
+# enable() replaces the functions we measure with wrappers that count,
+# and disable() puts the originals back, so we cost nothing while off.
+# Counters are shared by every runner in this process.
+
+
+class Stats:
+	"""
+	What happened while instrumentation was on.
+	"""
+
+	# Places we time, in seconds.
+	timers = ("reduce", "call_func", "expand", "print_node")
+
+	def __init__(self):
+		# Tree nodes and de Bruijn terms made.
+		self.nodes_allocated = 0
+
+		self.clone_calls = 0
+		self.nodes_copied = 0
+
+		# Moves from one node to the next, while reducing or walking trees.
+		self.walker_steps = 0
+
+		# Macro expansions, by macro name.
+		self.macro_expansions = {}
+
+		self.time = {t: 0.0 for t in self.timers}
+
+	def copy(self):
+		out = Stats()
+		out.nodes_allocated = self.nodes_allocated
+		out.clone_calls = self.clone_calls
+		out.nodes_copied = self.nodes_copied
+		out.walker_steps = self.walker_steps
+		out.macro_expansions = dict(self.macro_expansions)
+		out.time = dict(self.time)
+		return out
+
+	def __sub__(self, other):
+		"""
+		What happened since `other` was copied from us.
+		"""
+		out = Stats()
+		out.nodes_allocated = self.nodes_allocated - other.nodes_allocated
+		out.clone_calls = self.clone_calls - other.clone_calls
+		out.nodes_copied = self.nodes_copied - other.nodes_copied
+		out.walker_steps = self.walker_steps - other.walker_steps
+		out.macro_expansions = {
+			name: n - other.macro_expansions.get(name, 0)
+			for name, n in self.macro_expansions.items()
+			if n != other.macro_expansions.get(name, 0)
+		}
+		out.time = {t: self.time[t] - other.time[t] for t in self.timers}
+		return out
+
+	def to_dict(self) -> dict:
+		"""
+		Return these stats as a dict of plain values, for JSON.
+		"""
+		return {
+			"nodes_allocated": self.nodes_allocated,
+			"clone_calls": self.clone_calls,
+			"nodes_copied": self.nodes_copied,
+			"walker_steps": self.walker_steps,
+			"macro_expansions": dict(self.macro_expansions),
+			"time": {t: round(v, 6) for t, v in self.time.items()}
+		}
+
+
+# Everything counted since the last reset().
+totals = Stats()
+
+# True while we're counting.
+enabled = False
+
+def reset() -> None:
+	global totals
+	totals = Stats()
+
+
+# The functions we replace, as (owner, name, original).
+# Filled by enable(), emptied by disable().
+patched = []
+
+def patch(owner, name: str, make_wrapper) -> None:
+	"""
+	Replace an attribute of a class or module with a wrapper.
+	make_wrapper gets the original and returns the wrapper.
+	"""
+	original = owner.__dict__[name]
+	setattr(owner, name, make_wrapper(original))
+	patched.append((owner, name, original))
+
+def timed(timer: str):
+	"""
+	Make a wrapper that adds the time a function takes to a timer.
+	Calls inside a call we're already timing aren't timed again.
+	"""
+	depth = [0]
+	def make_wrapper(f):
+		def wrapper(*args, **kwargs):
+			if depth[0]:
+				return f(*args, **kwargs)
+			depth[0] += 1
+			start = time.perf_counter()
+			try:
+				return f(*args, **kwargs)
+			finally:
+				totals.time[timer] += time.perf_counter() - start
+				depth[0] -= 1
+		return wrapper
+	return make_wrapper
+
+def count_macro(name: str) -> None:
+	m = totals.macro_expansions
+	m[name] = m.get(name, 0) + 1
+
+
+def enable() -> None:
+	"""
+	Start counting.
+	"""
+	global enabled
+	if enabled:
+		return
+	enabled = True
+
+	# Every node calls Node.__init__, terms don't call Term.__init__.
+	def count_init(f):
+		def wrapper(self, *args, **kwargs):
+			totals.nodes_allocated += 1
+			f(self, *args, **kwargs)
+		return wrapper
+	patch(lbn.Node, "__init__", count_init)
+	for cls in dbn.Term.__subclasses__():
+		if "__init__" in cls.__dict__:
+			patch(cls, "__init__", count_init)
+
+	# clone() and friends are called through both of these.
+	def count_clone(f):
+		def wrapper(node):
+			out = f(node)
+			totals.clone_calls += 1
+			totals.nodes_copied += out.size
+			return out
+		return wrapper
+	# Everything that prints trees goes through write_node().
+	print_timer = timed("print_node")
+	for owner in (lbn, lbn.functions):
+		patch(owner, "clone", count_clone)
+		patch(owner, "call_func", timed("call_func"))
+		patch(owner, "write_node", print_timer)
+
+	# Reducers and TreeWalker both move through trees with these.
+	def count_move(f):
+		def wrapper(self):
+			totals.walker_steps += 1
+			return f(self)
+		return wrapper
+	for name in ("go_left", "go_right", "go_up"):
+		patch(lbn.Node, name, count_move)
+
+	# Macro expansions in trees, and in engines that use de Bruijn terms.
+	expand_timer = timed("expand")
+	def count_macro_expand(f):
+		def wrapper(self, runner):
+			count_macro(self.name)
+			return f(self, runner)
+		return expand_timer(wrapper)
+	patch(lbn.Macro, "expand", count_macro_expand)
+	patch(lbn.Church, "expand", expand_timer)
+	patch(lbn.History, "expand", expand_timer)
+
+	def count_expand_macro(f):
+		def wrapper(self, name):
+			count_macro(name)
+			return f(self, name)
+		return expand_timer(wrapper)
+	patch(dbn.Reducer, "expand_macro", count_expand_macro)
+
+def disable() -> None:
+	"""
+	Stop counting, and put back everything we replaced.
+	"""
+	global enabled
+	while patched:
+		owner, name, original = patched.pop()
+		setattr(owner, name, original)
+	enabled = False
+
+
+def add_reduce_time(seconds: float) -> None:
+	"""
+	Count time spent reducing.
+	Runners call this, since reduction loops are in the runner.
+	"""
+	if enabled:
+		totals.time["reduce"] += seconds
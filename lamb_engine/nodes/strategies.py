@@ -0,0 +1,201 @@
+import lamb_engine
+import lamb_engine.nodes as lbn
+
+
+# Reduction strategies other than normal order.
+#
+# Each of these is a tree Reducer with its own walk,
+# so it only ever visits the places its next redex can be.
+# Folds are unfolded as they are reached, like in lbn.Reducer.
+
+class Applicative(lbn.Reducer):
+	"""
+	Reduces leftmost-innermost redexes first, so arguments
+	are normalized before they are substituted.
+
+	A call is only checked when we come back up from its right side,
+	once both of its sides are normal. Everything we've walked past
+	stays normal, so after a reduction we only need to walk the result.
+	"""
+
+	# If False, we don't reduce inside functions.
+	enter_functions = True
+
+	def replace(self, node: lbn.Node, out: lbn.Node) -> None:
+		super().replace(node, out)
+		self.ptr = out
+		self.from_side = lbn.Direction.UP
+
+	def step(self) -> lbn.ReductionType:
+		K = lbn.Kind
+		UP = lbn.Direction.UP
+		LEFT = lbn.Direction.LEFT
+		RIGHT = lbn.Direction.RIGHT
+		enter_functions = self.enter_functions
+
+		root = self.root
+		from_side = self.from_side
+		ptr = self.ptr
+
+		while True:
+			k = ptr.kind
+
+			if (k == K.FOLD) and (from_side == UP):
+				ptr = ptr.unfold() # type: ignore
+				k = K.CALL
+
+			if (k == K.CALL) and (from_side == RIGHT):
+				left_kind = ptr.left.kind
+				if left_kind == K.FUNC:
+					if self.trace is not None:
+						self.note(ptr)
+					self.replace(ptr, lbn.call_func(ptr.left, ptr.right))
+					return lbn.ReductionType.FUNCTION_APPLY
+
+				elif left_kind >= K.EXPANDABLE:
+					if (
+							(left_kind == K.MACRO) and
+							(self.delta is not None) and
+							self.apply_delta(ptr) # type: ignore
+						):
+						return lbn.ReductionType.DELTA
+
+					if self.trace is not None:
+						self.note(ptr.left)
+
+					# Macro bodies may have redexes of their own,
+					# so we walk the expansion before we apply it.
+					r, e = ptr.left.expand(root.runner)
+					ptr.replace_side(LEFT, e)
+					self.ptr = ptr.left
+					self.from_side = UP
+					return r
+
+			# Like in lbn.Reducer, $ is copied if it can be reduced.
+			elif (k == K.HISTORY) and (from_side == UP) and ptr.reducible(root.runner): # type: ignore
+				if self.trace is not None:
+					self.note(ptr)
+				r, e = ptr.expand(root.runner)
+				self.replace(ptr, e)
+				return r
+
+			# Move to the next node in the outline.
+			if k >= K.END:
+				from_side, ptr = ptr.go_up()
+			elif k == K.CALL:
+				if from_side == UP:
+					from_side, ptr = ptr.go_left()
+				elif from_side == LEFT:
+					from_side, ptr = ptr.go_right()
+				else:
+					from_side, ptr = ptr.go_up()
+			elif k == K.FUNC:
+				if (from_side == UP) and enter_functions:
+					from_side, ptr = ptr.go_left()
+				else:
+					from_side, ptr = ptr.go_up()
+			elif k == K.ROOT:
+				if from_side == UP:
+					from_side, ptr = ptr.go_left()
+				else:
+					break
+			else:
+				raise TypeError(f"I don't know how to iterate a {type(ptr)}")
+
+		self.ptr = root
+		self.from_side = LEFT
+		return lbn.ReductionType.NOTHING
+
+class CallByValue(Applicative):
+	"""
+	Like Applicative, but functions are values:
+	we never reduce inside them, so we stop at weak normal form.
+	"""
+
+	enter_functions = False
+
+class Head(lbn.Reducer):
+	"""
+	Reduces the head redex until there isn't one,
+	which gives the head normal form.
+
+	The head redex is always on the left spine of the tree,
+	so we only walk down that. Arguments are never reduced.
+	"""
+
+	# If False, we stop at a function instead of reducing its body.
+	enter_functions = True
+
+	def step(self) -> lbn.ReductionType:
+		K = lbn.Kind
+		enter_functions = self.enter_functions
+
+		root = self.root
+		ptr = self.ptr
+
+		while True:
+			k = ptr.kind
+
+			if k == K.FOLD:
+				ptr = ptr.unfold() # type: ignore
+				k = K.CALL
+
+			if k == K.CALL:
+				left_kind = ptr.left.kind
+				if left_kind == K.FUNC:
+					if self.trace is not None:
+						self.note(ptr)
+					self.replace(ptr, lbn.call_func(ptr.left, ptr.right))
+					return lbn.ReductionType.FUNCTION_APPLY
+
+				elif left_kind >= K.EXPANDABLE:
+					if (
+							(left_kind == K.MACRO) and
+							(self.delta is not None) and
+							self.apply_delta(ptr) # type: ignore
+						):
+						return lbn.ReductionType.DELTA
+
+					if self.trace is not None:
+						self.note(ptr.left)
+					r, e = ptr.left.expand(root.runner)
+					ptr.replace_side(lbn.Direction.LEFT, e)
+					self.ptr = ptr
+					return r
+
+			elif (k == K.ROOT) or ((k == K.FUNC) and enter_functions):
+				pass
+
+			elif (k == K.HISTORY) and ptr.reducible(root.runner): # type: ignore
+				if self.trace is not None:
+					self.note(ptr)
+				r, e = ptr.expand(root.runner)
+				self.replace(ptr, e)
+				self.ptr = e
+				return r
+
+			# The head is a variable, or a function we don't enter.
+			# Stay here, so later calls return immediately.
+			else:
+				self.ptr = ptr
+				return lbn.ReductionType.NOTHING
+
+			ptr = ptr.left
+
+class WeakHead(Head):
+	"""
+	Like Head, but stops as soon as the expression is a function,
+	which gives the weak head normal form.
+	"""
+
+	enter_functions = False
+
+
+# Tree reducers for every strategy, by name.
+reducers = {
+	"normal": lbn.Reducer,
+	"applicative": Applicative,
+	"cbv": CallByValue,
+	"head": Head,
+	"whnf": WeakHead
+}
@@ -1,9 +1,18 @@
 import pyparsing as pp
+import re
 
 # Packrat gives a significant speed boost.
 pp.ParserElement.enablePackrat()
 
-class LambdaParser:
+class ReferenceParser:
+	"""
+	The pyparsing grammar for lamb.
+
+	This is slow on long lines, so we use LambdaParser instead.
+	It's kept as a reference, LambdaParser must always give
+	the same results and error locations.
+	"""
+
 	def make_parser(self):
 		self.lp = pp.Suppress("(")
 		self.rp = pp.Suppress(")")
@@ -98,4 +107,351 @@ class LambdaParser:
 		)[0]
 
 	def run_tests(self, lines: list[str]):
-		return self.pp_all.run_tests(lines)
\ No newline at end of file
+		return self.pp_all.run_tests(lines)
+
+
+# Tokens used by LambdaParser.
+# These must match the ones in ReferenceParser.
+ws_re = re.compile(r"[ \t\n\r]*")
+church_re = re.compile(r"[0-9]+")
+macro_re = re.compile(r"[A-Za-z_]+")
+bound_re = re.compile(r"[a-z][₀₁₂₃₄₅₆₈₉]*")
+arg_re = re.compile(r"[!-~]+")
+
+# The parse tree LambdaParser builds before calling actions.
+# Every node is a tuple, with its kind first:
+#
+# ("church", text)
+# ("bound", text)
+# ("macro", text)
+# ("history",)
+# ("$",), for a $ that isn't in parentheses.
+#	This one isn't an expression, so it can't be a function body.
+# ("call", [node, node, ...])
+# ("func", [bound text, ...], node)
+# ("macro_def", name, node)
+# ("command", name, [arg, ...])
+DOLLAR = ("$",)
+
+# Kinds of frames on LambdaParser's stack.
+PAREN = 0
+LAMBDA = 1
+BOTTOM = 2
+
+class LambdaParser:
+	"""
+	A hand-written parser for the same grammar as ReferenceParser.
+
+	It reads a line left to right, without recursion, so it takes
+	linear time and can parse lines of any length or depth.
+	It calls the same actions in the same order as ReferenceParser,
+	and raises a pp.ParseException at the same location on errors.
+
+	Every part of an expression (the body of a function, or what's in
+	parentheses) is a sequence of atoms: numerals, names, $,
+	functions and parenthesized expressions. A sequence takes as many
+	atoms as it can. When it stops, we remember where the next atom
+	failed, since that's where pyparsing reports most errors.
+	"""
+
+	def __init__(
+			self,
+			*,
+			action_command,
+			action_macro_def,
+			action_church,
+			action_func,
+			action_bound,
+			action_macro,
+			action_call,
+			action_history
+		):
+
+		self.action_command = action_command
+		self.action_macro_def = action_macro_def
+		self.action_church = action_church
+		self.action_func = action_func
+		self.action_bound = action_bound
+		self.action_macro = action_macro
+		self.action_call = action_call
+		self.action_history = action_history
+
+	def reference(self) -> ReferenceParser:
+		"""
+		Make a ReferenceParser with the same actions.
+		"""
+		return ReferenceParser(
+			action_command = self.action_command,
+			action_macro_def = self.action_macro_def,
+			action_church = self.action_church,
+			action_func = self.action_func,
+			action_bound = self.action_bound,
+			action_macro = self.action_macro,
+			action_call = self.action_call,
+			action_history = self.action_history
+		)
+
+	@staticmethod
+	def sequence(line: str, start: int):
+		"""
+		Read a sequence of atoms that starts at `start`.
+
+		Returns (atoms, first_end, end, fail):
+		the atoms we read, where the first and last ones end,
+		and where the atom after them failed.
+		"""
+
+		n = len(line)
+
+		# Frames are [kind, params or "(" location, atoms, first_end, end].
+		# Every "(" and every function body gets one.
+		stack = [[BOTTOM, None, [], start, start]]
+		pos = start
+
+		while True:
+			q = ws_re.match(line, pos).end()
+			c = line[q] if q < n else ""
+
+			# Read one atom at q.
+			# If it can't be read, `fail` is where it failed.
+			atom = None
+			fail = None
+			if c == "(":
+				stack.append([PAREN, q, [], q + 1, q + 1])
+				pos = q + 1
+				continue
+			elif c == "λ" or c == "\\":
+				p = ws_re.match(line, q + 1).end()
+				b = bound_re.match(line, p)
+				if b is None:
+					fail = p
+				else:
+					params = []
+					while b is not None:
+						params.append(b.group())
+						p = ws_re.match(line, b.end()).end()
+						b = bound_re.match(line, p)
+					if line[p:p + 1] == ".":
+						stack.append([LAMBDA, params, [], p + 1, p + 1])
+						pos = p + 1
+						continue
+					fail = p
+			elif c == "$":
+				atom = DOLLAR
+				end = q + 1
+			else:
+				m = church_re.match(line, q)
+				if m is not None:
+					atom = ("church", m.group())
+				else:
+					b = bound_re.match(line, q)
+					m = macro_re.match(line, q)
+					if (b is not None) and ((m is None) or (b.end() >= m.end())):
+						m = b
+						atom = ("bound", b.group())
+					elif m is not None:
+						atom = ("macro", m.group())
+					else:
+						fail = q
+				if m is not None:
+					end = m.end()
+
+			# Add atoms to frames and close frames
+			# until there's a frame that wants more atoms.
+			while True:
+				frame = stack[-1]
+
+				if fail is None:
+					if not frame[2]:
+						frame[3] = end
+					frame[2].append(atom)
+					frame[4] = end
+					pos = end
+					break
+
+				if frame[0] == BOTTOM:
+					return frame[2], frame[3], frame[4], fail
+
+				stack.pop()
+				kind, extra, atoms, _, end = frame
+
+				if kind == PAREN:
+					r = ws_re.match(line, end).end()
+					closed = line[r:r + 1] == ")"
+					if len(atoms) == 0:
+						pass
+					elif len(atoms) == 1:
+						if closed:
+							atom = atoms[0]
+							if atom is DOLLAR:
+								atom = ("history",)
+							end = r + 1
+							fail = None
+					elif closed:
+						atom = ("call", atoms)
+						end = r + 1
+						fail = None
+					else:
+						fail = r
+
+				else:
+					# A function ends with the sequence it's in,
+					# so that sequence stops where this one did.
+					if len(atoms) == 0 or atoms == [DOLLAR]:
+						pass
+					else:
+						if len(atoms) == 1:
+							body = atoms[0]
+						else:
+							body = ("call", atoms)
+						frame = stack[-1]
+						if not frame[2]:
+							frame[3] = end
+						frame[2].append(("func", extra, body))
+						frame[4] = end
+
+	def recognize(self, line: str):
+		"""
+		Find the parse tree of a whole line.
+		Like pyparsing's Or, we take the longest alternative,
+		and the first one if there's a tie.
+		"""
+
+		q = ws_re.match(line).end()
+		c = line[q:q + 1]
+
+		best = None
+		fails = []
+		def match(end, tree):
+			nonlocal best
+			if (best is None) or (end > best[0]):
+				best = (end, tree)
+
+		# An expression, or a call.
+		atoms, first_end, end, fail = self.sequence(line, 0)
+		if len(atoms) == 0:
+			fails.append(fail)
+		elif atoms[0] is DOLLAR:
+			fails.append(q)
+		else:
+			match(first_end, atoms[0])
+
+		# A macro definition.
+		m = macro_re.match(line, q)
+		if m is None:
+			fails.append(q)
+		else:
+			p = ws_re.match(line, m.end()).end()
+			if line[p:p + 1] != "=":
+				fails.append(p)
+			else:
+				body, _, body_end, body_fail = self.sequence(line, p + 1)
+				if len(body) == 0:
+					fails.append(body_fail)
+				elif len(body) == 1:
+					match(body_end, ("macro_def", m.group(), body[0]))
+				else:
+					match(body_end, ("macro_def", m.group(), ("call", body)))
+
+		# A command.
+		if c != ":":
+			fails.append(q)
+		else:
+			p = ws_re.match(line, q + 1).end()
+			m = macro_re.match(line, p)
+			if m is None:
+				fails.append(p)
+			else:
+				args = []
+				p = m.end()
+				a = arg_re.match(line, ws_re.match(line, p).end())
+				while a is not None:
+					args.append(a.group())
+					p = a.end()
+					a = arg_re.match(line, ws_re.match(line, p).end())
+				match(p, ("command", m.group(), args))
+
+		if len(atoms) >= 2:
+			match(end, ("call", atoms))
+		else:
+			fails.append(fail)
+
+		if c == "$":
+			match(q + 1, DOLLAR)
+		else:
+			fails.append(q)
+
+		if best is None:
+			raise pp.ParseException(line, max(fails), "Invalid syntax")
+
+		end = ws_re.match(line, best[0]).end()
+		if end != len(line):
+			raise pp.ParseException(line, end, "Expected end of text")
+
+		return best[1]
+
+	def build(self, tree):
+		"""
+		Call actions on a parse tree, children first.
+		"""
+
+		kind = tree[0]
+		if kind == "command":
+			return self.action_command([tree[1]] + tree[2])
+		if kind == "macro_def":
+			name = self.action_macro([tree[1]])
+			return self.action_macro_def([name, self.build(tree[2])])
+
+		# Nodes we've made, in order.
+		out = []
+
+		# Trees we still need to visit.
+		# The flag is True if we've already visited its children.
+		todo = [(tree, False)]
+		while todo:
+			tree, done = todo.pop()
+			kind = tree[0]
+
+			if kind == "call":
+				if done:
+					n = len(tree[1])
+					args = out[-n:]
+					del out[-n:]
+					out.append(self.action_call(args))
+				else:
+					todo.append((tree, True))
+					for t in reversed(tree[1]):
+						todo.append((t, False))
+
+			elif kind == "func":
+				if done:
+					body = out.pop()
+					n = len(tree[1])
+					params = out[-n:]
+					del out[-n:]
+					out.append(self.action_func([params, body]))
+				else:
+					for p in tree[1]:
+						out.append(self.action_bound([p]))
+					todo.append((tree, True))
+					todo.append((tree[2], False))
+
+			elif kind == "church":
+				out.append(self.action_church([tree[1]]))
+			elif kind == "bound":
+				out.append(self.action_bound([tree[1]]))
+			elif kind == "macro":
+				out.append(self.action_macro([tree[1]]))
+			else:
+				out.append(self.action_history(["$"]))
+
+		return out[0]
+
+	def parse_line(self, line: str):
+		# pyparsing expands tabs, so we do too.
+		# Otherwise error locations would be different.
+		line = line.expandtabs()
+		return self.build(self.recognize(line))
+
+	def run_tests(self, lines: list[str]):
+		return self.reference().run_tests(lines)
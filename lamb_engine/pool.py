@@ -0,0 +1,172 @@
+from prompt_toolkit.application.current import create_app_session
+from prompt_toolkit.output import create_output
+import multiprocessing
+import os
+import signal
+
+import lamb_engine
+
+
+class Job:
+	"""
+	An expression to evaluate in a RunnerPool.
+
+	`reduction_limit` and `timeout` (in seconds) replace the
+	pool's settings for this job if they aren't None.
+	"""
+
+	def __init__(
+			self,
+			line: str,
+			*,
+			reduction_limit = None,
+			timeout = None
+		):
+		self.line = line
+		self.reduction_limit = reduction_limit
+		self.timeout = timeout
+
+	def __repr__(self):
+		return f"<Job {self.line!r}>"
+
+
+# The runner in a worker process.
+# Set by start_worker().
+worker_runner = None
+
+# Keeps the output of a worker open.
+worker_session = None
+
+def start_worker(setup: list[str]) -> None:
+	"""
+	Set up a worker process, and run `setup` with its runner.
+	"""
+
+	# Ctrl-C goes to every process. Only the main one should handle it,
+	# it stops the workers itself.
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+	# Worker processes can't start workers of their own.
+	lamb_engine.nodes.parallel.processes = 1
+
+	# Results are returned, so the rest of what the runner prints
+	# isn't useful. It would be repeated by every worker.
+	global worker_runner, worker_session
+	worker_session = create_app_session(
+		output = create_output(stdout = open(os.devnull, "w"))
+	)
+	worker_session.__enter__()
+
+	r = lamb_engine.Runner(None, None)
+	r.interactive = False
+	for l in setup:
+		lamb_engine.batch.evaluate_line(r, l)
+	worker_runner = r
+
+def run_job(job: tuple) -> dict:
+	"""
+	Evaluate one job in a worker.
+	`job` is (index, line, reduction limit, timeout).
+	"""
+	index, line, reduction_limit, timeout = job
+	r = worker_runner
+
+	# Jobs don't share history, since we don't know
+	# which jobs ran in this worker before this one.
+	r.history.clear() # type: ignore
+
+	old_limit = r.reduction_limit # type: ignore
+	if reduction_limit is not None:
+		r.reduction_limit = reduction_limit # type: ignore
+	try:
+		info = lamb_engine.batch.evaluate_line(
+			r, line, # type: ignore
+			timeout = timeout,
+			expressions_only = True
+		)
+	finally:
+		r.reduction_limit = old_limit # type: ignore
+
+	return {"index": index, **info} # type: ignore
+
+
+class RunnerPool:
+	"""
+	Evaluates many independent expressions in worker processes.
+
+	Every worker has its own Runner, which runs the lines in `setup`
+	(macro definitions and commands, like `:load`) once, when it starts.
+	Use this as a context manager, or call close() when you're done.
+
+	`reduction_limit` and `timeout` (in seconds) are the defaults for
+	every job. If `reduction_limit` is None, the runner's own limit is used.
+	Timeouts need signal.setitimer, so they're ignored on Windows.
+	"""
+
+	def __init__(
+			self,
+			processes = None,
+			*,
+			setup: list[str] = [],
+			reduction_limit = None,
+			timeout = None
+		):
+		self.reduction_limit = reduction_limit
+		self.timeout = timeout
+		self.pool = multiprocessing.Pool(
+			processes,
+			initializer = start_worker,
+			initargs = (list(setup),)
+		)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def close(self) -> None:
+		"""
+		Stop all workers, even if they're busy.
+		"""
+		if self.pool is not None:
+			self.pool.terminate()
+			self.pool.join()
+		self.pool = None
+
+	def make_job(self, index: int, job) -> tuple:
+		if not isinstance(job, Job):
+			job = Job(job)
+		return (
+			index,
+			job.line,
+			job.reduction_limit if job.reduction_limit is not None else self.reduction_limit,
+			job.timeout if job.timeout is not None else self.timeout
+		)
+
+	def run(
+			self,
+			jobs,
+			*,
+			ordered = True,
+			chunksize = 1
+		):
+		"""
+		Evaluate an iterable of jobs, which are strings or Jobs.
+
+		Yields a dict for each job, like batch.evaluate_line(),
+		with the index of the job in `jobs` under "index".
+		If `ordered` is True, these come in the same order as `jobs`.
+		Otherwise, they come as soon as they're done.
+
+		Jobs are sent to workers `chunksize` at a time.
+		Larger chunks are faster for many small jobs.
+		"""
+		if self.pool is None:
+			raise ValueError("This pool is closed.")
+
+		jobs = (self.make_job(i, j) for i, j in enumerate(jobs))
+		if ordered:
+			yield from self.pool.imap(run_job, jobs, chunksize)
+		else:
+			yield from self.pool.imap_unordered(run_job, jobs, chunksize)
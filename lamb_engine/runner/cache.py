@@ -0,0 +1,184 @@
+from importlib.metadata import version as package_version
+from importlib.metadata import PackageNotFoundError
+import hashlib
+import json
+import os
+
+import lamb_engine
+import lamb_engine.nodes as lbn
+
+
+# Compiled macro libraries.
+#
+# When :load reads a file, it saves the macros that file defines
+# next to it, in `<file>.cache`, as compiled templates (see lbn.Template).
+# When the same file is loaded again, we read those instead of
+# parsing and preparing every line.
+#
+# A cache is only used if it was made from a file with the same
+# contents, by the same version of lamb, with the same cache version.
+#
+# How a macro is prepared depends on which macros were defined
+# when it was loaded, since unknown names become free variables.
+# So we also save which of the names a file uses were defined before
+# it was loaded, and only use the cache if that hasn't changed.
+
+
+# Change this whenever the format of cache files changes.
+# Changes to templates and prepare() come with a new
+# version of lamb, so engine_version() covers those.
+version = 2
+
+def engine_version(): # -> str | None
+	"""
+	The version of lamb we're running, or None if we don't know it.
+	That happens when we're run from a copy of the repository,
+	where the code can change without the version changing,
+	so we don't use caches then.
+	"""
+	try:
+		return package_version("lamb_engine")
+	except PackageNotFoundError:
+		return None
+
+def path(target: str) -> str:
+	return target + ".cache"
+
+def file_hash(text: str) -> str:
+	return hashlib.sha256(text.encode()).hexdigest()
+
+
+def encode(template: lbn.Template): # -> list | None
+	"""
+	Turn a template's instructions into plain values.
+	Returns None if it has something we can't save, like $.
+	"""
+	K = lbn.Kind
+	LEAF = lbn.Template.LEAF
+
+	out = []
+	for op in template.ops:
+		if op[0] != LEAF:
+			out.append(list(op))
+			continue
+
+		n = op[1]
+		if n.kind == K.MACRO:
+			out.append([LEAF, "macro", n.name])
+		elif n.kind == K.FREEVAR:
+			out.append([LEAF, "free", n.name])
+		elif n.kind == K.CHURCH:
+			out.append([LEAF, "church", n.value])
+		else:
+			return None
+	return out
+
+def decode(ops: list) -> lbn.Template:
+	"""
+	Make a template from instructions made by encode().
+	"""
+	LEAF = lbn.Template.LEAF
+	leaves = {
+		"macro": lbn.Macro,
+		"free": lbn.FreeVar,
+		"church": lbn.Church
+	}
+
+	out = []
+	binders = 0
+	for op in ops:
+		if op[0] == LEAF:
+			out.append((LEAF, leaves[op[1]](op[2])))
+		else:
+			out.append(tuple(op))
+			if op[0] == lbn.Template.FUNC:
+				binders += 1
+	return lbn.Template.from_ops(out, binders)
+
+def names(ops: list) -> set:
+	"""
+	Every macro and free variable name in encoded instructions.
+	"""
+	return set(
+		op[2] for op in ops
+		if (op[0] == lbn.Template.LEAF) and (op[1] != "church")
+	)
+
+
+def save(
+		target: str,
+		text: str,
+		macros: list,
+		defined_before: set
+	) -> None:
+	"""
+	Save a cache for the file `target`.
+
+	`text` is the contents of that file,
+	`macros` is a list of (name, template) it defined, in order,
+	and `defined_before` is the set of macros defined before it was loaded.
+
+	If we can't write the cache, we don't.
+	It will be made again next time.
+	"""
+
+	engine = engine_version()
+	if engine is None:
+		return
+
+	encoded = []
+	used = set()
+	for name, template in macros:
+		ops = encode(template)
+		if ops is None:
+			return
+		encoded.append([name, ops])
+		used |= names(ops)
+
+	out = {
+		"version": version,
+		"engine": engine,
+		"hash": file_hash(text),
+		"names": sorted(used),
+		"defined": sorted(used & defined_before),
+		"macros": encoded
+	}
+
+	try:
+		tmp = path(target) + ".tmp"
+		with open(tmp, "w") as f:
+			json.dump(out, f, separators = (",", ":"))
+		os.replace(tmp, path(target))
+	except OSError:
+		pass
+
+def load(target: str, text: str, defined_before: set): # -> list | None
+	"""
+	Read the cache for the file `target`, if it's up to date.
+	`text` is the contents of that file.
+
+	Returns a list of (name, template), like the one given to save(),
+	or None if there's no cache we can use.
+	"""
+
+	engine = engine_version()
+	if engine is None:
+		return None
+
+	try:
+		with open(path(target), "r") as f:
+			c = json.load(f)
+
+		if (
+				(c["version"] != version) or
+				(c["engine"] != engine) or
+				(c["hash"] != file_hash(text)) or
+				(sorted(set(c["names"]) & defined_before) != c["defined"])
+			):
+			return None
+
+		return [(name, decode(ops)) for name, ops in c["macros"]]
+
+	# Caches we can't read are made again.
+	except (OSError, ValueError, LookupError, TypeError):
+		return None
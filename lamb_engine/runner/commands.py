@@ -8,6 +8,7 @@ import os.path
 from pyparsing import exceptions as ppx
 
 import lamb_engine
+from lamb_engine.runner import cache
 
 commands = {}
 help_texts = {}
@@ -18,7 +19,8 @@ def lamb_command(
 		help_text: str
 	):
 	"""
-	A decorator that allows us to easily make commands
+	A decorator that allows us to easily make commands.
+	Commands return False if they fail, after printing why.
 	"""
 
 	def inner(func):
@@ -32,7 +34,7 @@ def lamb_command(
 	command_name = "step",
 	help_text = "Toggle step-by-step reduction"
 )
-def cmd_step(command, runner) -> None:
+def cmd_step(command, runner): # -> bool | None
 	if len(command.args) > 1:
 		printf(
 			HTML(
@@ -40,7 +42,7 @@ def cmd_step(command, runner) -> None:
 			),
 			style = lamb_engine.utils.style
 		)
-		return
+		return False
 
 	target = not runner.step_reduction
 	if len(command.args) == 1:
@@ -55,7 +57,7 @@ def cmd_step(command, runner) -> None:
 				),
 				style = lamb_engine.utils.style
 			)
-			return
+			return False
 
 
 	if target:
@@ -79,7 +81,7 @@ def cmd_step(command, runner) -> None:
 	command_name = "expand",
 	help_text = "Toggle full expansion"
 )
-def cmd_expand(command, runner) -> None:
+def cmd_expand(command, runner): # -> bool | None
 	if len(command.args) > 1:
 		printf(
 			HTML(
@@ -87,7 +89,7 @@ def cmd_expand(command, runner) -> None:
 			),
 			style = lamb_engine.utils.style
 		)
-		return
+		return False
 
 	target = not runner.full_expansion
 	if len(command.args) == 1:
@@ -102,7 +104,7 @@ def cmd_expand(command, runner) -> None:
 				),
 				style = lamb_engine.utils.style
 			)
-			return
+			return False
 
 
 	if target:
@@ -122,20 +124,288 @@ def cmd_expand(command, runner) -> None:
 		)
 		runner.full_expansion = False
 
+@lamb_command(
+	command_name = "delta",
+	help_text = "Toggle direct arithmetic on numerals"
+)
+def cmd_delta(command, runner): # -> bool | None
+	if len(command.args) > 1:
+		printf(
+			HTML(
+				f"<err>Command <code>:{command.name}</code> takes no more than one argument.</err>"
+			),
+			style = lamb_engine.utils.style
+		)
+		return False
+
+	target = not runner.delta_rules
+	if len(command.args) == 1:
+		if command.args[0].lower() in ("y", "yes"):
+			target = True
+		elif command.args[0].lower() in ("n", "no"):
+			target = False
+		else:
+			printf(
+				HTML(
+					f"<err>Usage: <code>:delta [yes|no]</code></err>"
+				),
+				style = lamb_engine.utils.style
+			)
+			return False
+
+
+	if target:
+		printf(
+			HTML(
+				f"<warn>Enabled delta rules.</warn>"
+			),
+			style = lamb_engine.utils.style
+		)
+		runner.delta_rules = True
+	else:
+		printf(
+			HTML(
+				f"<warn>Disabled delta rules.</warn>"
+			),
+			style = lamb_engine.utils.style
+		)
+		runner.delta_rules = False
+
+
+@lamb_command(
+	command_name = "loops",
+	help_text = "Toggle loop detection"
+)
+def cmd_loops(command, runner): # -> bool | None
+	if len(command.args) > 1:
+		printf(
+			HTML(
+				f"<err>Command <code>:{command.name}</code> takes no more than one argument.</err>"
+			),
+			style = lamb_engine.utils.style
+		)
+		return False
+
+	target = not runner.loop_detection
+	if len(command.args) == 1:
+		if command.args[0].lower() in ("y", "yes"):
+			target = True
+		elif command.args[0].lower() in ("n", "no"):
+			target = False
+		else:
+			printf(
+				HTML(
+					f"<err>Usage: <code>:loops [yes|no]</code></err>"
+				),
+				style = lamb_engine.utils.style
+			)
+			return False
+
+
+	if target:
+		printf(
+			HTML(
+				f"<warn>Enabled loop detection.</warn>"
+			),
+			style = lamb_engine.utils.style
+		)
+		if not lamb_engine.runner.runner.engines[runner.engine].stepwise:
+			printf(
+				HTML(
+					f"<warn>The <code>{runner.engine}</code> engine can't detect loops, so it will ignore this.</warn>"
+				),
+				style = lamb_engine.utils.style
+			)
+		runner.loop_detection = True
+	else:
+		printf(
+			HTML(
+				f"<warn>Disabled loop detection.</warn>"
+			),
+			style = lamb_engine.utils.style
+		)
+		runner.loop_detection = False
+
+
+@lamb_command(
+	command_name = "intern",
+	help_text = "Toggle sharing of repeated subterms"
+)
+def cmd_intern(command, runner): # -> bool | None
+	if len(command.args) > 1:
+		printf(
+			HTML(
+				f"<err>Command <code>:{command.name}</code> takes no more than one argument.</err>"
+			),
+			style = lamb_engine.utils.style
+		)
+		return False
+
+	target = not runner.hash_consing
+	if len(command.args) == 1:
+		if command.args[0].lower() in ("y", "yes"):
+			target = True
+		elif command.args[0].lower() in ("n", "no"):
+			target = False
+		else:
+			printf(
+				HTML(
+					f"<err>Usage: <code>:intern [yes|no]</code></err>"
+				),
+				style = lamb_engine.utils.style
+			)
+			return False
+
+
+	if target:
+		printf(
+			HTML(
+				f"<warn>Enabled subterm sharing.</warn>"
+			),
+			style = lamb_engine.utils.style
+		)
+		runner.hash_consing = True
+	else:
+		printf(
+			HTML(
+				f"<warn>Disabled subterm sharing.</warn>"
+			),
+			style = lamb_engine.utils.style
+		)
+		runner.hash_consing = False
+
+
+@lamb_command(
+	command_name = "short",
+	help_text = "Toggle short display of results"
+)
+def cmd_short(command, runner): # -> bool | None
+	if len(command.args) > 1:
+		printf(
+			HTML(
+				f"<err>Command <code>:{command.name}</code> takes no more than one argument.</err>"
+			),
+			style = lamb_engine.utils.style
+		)
+		return False
+
+	target = not runner.short_display
+	if len(command.args) == 1:
+		if command.args[0].lower() in ("y", "yes"):
+			target = True
+		elif command.args[0].lower() in ("n", "no"):
+			target = False
+		else:
+			printf(
+				HTML(
+					f"<err>Usage: <code>:short [yes|no]</code></err>"
+				),
+				style = lamb_engine.utils.style
+			)
+			return False
+
+
+	if target:
+		printf(
+			HTML(
+				f"<warn>Enabled short display.</warn>"
+			),
+			style = lamb_engine.utils.style
+		)
+		runner.short_display = True
+	else:
+		printf(
+			HTML(
+				f"<warn>Disabled short display.</warn>"
+			),
+			style = lamb_engine.utils.style
+		)
+		runner.short_display = False
 
 @lamb_command(
 	command_name = "save",
 	help_text = "Save macros to a file"
 )
-def cmd_save(command, runner) -> None:
+def cmd_save(command, runner): # -> bool | None
+	args = list(command.args)
+	binary = "--binary" in args
+	if binary:
+		args.remove("--binary")
+
+	if len(args) != 1:
+		printf(
+			HTML(
+				f"<err>Command <code>:{command.name}</code> takes exactly one file name.</err>"
+			),
+			style = lamb_engine.utils.style
+		)
+		return False
+
+	target = args[0]
+	if os.path.exists(target):
+		confirm = prompt(
+			message = FormattedText([
+				("class:warn", "File exists. Overwrite? "),
+				("class:text", "[yes/no]: ")
+			]),
+			style = lamb_engine.utils.style
+		).lower()
+
+		if confirm != "yes":
+			printf(
+				HTML(
+					"<err>Cancelled.</err>"
+				),
+				style = lamb_engine.utils.style
+			)
+			return False
+
+	if binary:
+		try:
+			lamb_engine.binary.dump(runner.macro_table, target)
+		except ValueError as e:
+			printf(
+				FormattedText([
+					("class:err", str(e))
+				]),
+				style = lamb_engine.utils.style
+			)
+			return False
+	else:
+		with open(target, "w") as f:
+			f.write("\n".join(
+				[f"{n} = {e.export()}" for n, e in runner.macro_table.items()]
+			))
+
+	printf(
+		HTML(
+			f"Wrote {len(runner.macro_table)} macros to <code>{target}</code>"
+		),
+		style = lamb_engine.utils.style
+	)
+
+@lamb_command(
+	command_name = "out",
+	help_text = "Save the last result to a file"
+)
+def cmd_out(command, runner): # -> bool | None
 	if len(command.args) != 1:
 		printf(
 			HTML(
-				f"<err>Command <code>:{command.name}</code> takes exactly one argument.</err>"
+				f"<err>Command <code>:{command.name}</code> takes exactly one file name.</err>"
 			),
 			style = lamb_engine.utils.style
 		)
-		return
+		return False
+
+	if runner.history[0] is None:
+		printf(
+			HTML(
+				"<err>There's no result to save yet.</err>"
+			),
+			style = lamb_engine.utils.style
+		)
+		return False
 
 	target = command.args[0]
 	if os.path.exists(target):
@@ -154,16 +424,17 @@ def cmd_save(command, runner) -> None:
 				),
 				style = lamb_engine.utils.style
 			)
-			return
+			return False
 
+	# Results can be huge, so we print them
+	# straight to the file instead of making a string.
 	with open(target, "w") as f:
-		f.write("\n".join(
-			[f"{n} = {e.export()}" for n, e in runner.macro_table.items()]
-		))
+		lamb_engine.nodes.write_node(runner.history[0], f.write, export = True)
+		f.write("\n")
 
 	printf(
 		HTML(
-			f"Wrote {len(runner.macro_table)} macros to <code>{target}</code>"
+			f"Wrote the last result to <code>{target}</code>"
 		),
 		style = lamb_engine.utils.style
 	)
@@ -173,17 +444,22 @@ def cmd_save(command, runner) -> None:
 	command_name = "load",
 	help_text = "Load macros from a file"
 )
-def cmd_load(command, runner):
-	if len(command.args) != 1:
+def cmd_load(command, runner): # -> bool | None
+	args = list(command.args)
+	quiet = "--quiet" in args
+	if quiet:
+		args.remove("--quiet")
+
+	if len(args) != 1:
 		printf(
 			HTML(
-				f"<err>Command <code>:{command.name}</code> takes exactly one argument.</err>"
+				f"<err>Command <code>:{command.name}</code> takes exactly one file name.</err>"
 			),
 			style = lamb_engine.utils.style
 		)
-		return
+		return False
 
-	target = command.args[0]
+	target = args[0]
 	if not os.path.exists(target):
 		printf(
 			HTML(
@@ -191,51 +467,140 @@ def cmd_load(command, runner):
 			),
 			style = lamb_engine.utils.style
 		)
-		return
-
-	with open(target, "r") as f:
-		lines = [x.strip() for x in f.readlines()]
-
-	for i in range(len(lines)):
-		l = lines[i].strip()
-
-		# Skip comments and empty lines
-		if l.startswith("#"):
-			continue
-		if l == "":
-			continue
+		return False
 
+	# Files written by :save --binary.
+	# These are already prepared, but names that aren't
+	# macros here become free variables, like prepare() does.
+	if lamb_engine.binary.is_binary(target):
 		try:
-			x = runner.parse(l)[0]
-		except ppx.ParseException as e:
+			image = lamb_engine.binary.load(target)
+		except ValueError as e:
 			printf(
 				FormattedText([
-					("class:warn", f"Syntax error on line {i+1:02}: "),
-					("class:code", l[:e.loc]),
-					("class:err", l[e.loc]),
-					("class:code", l[e.loc+1:])
+					("class:err", f"Can't load {target}: {e}")
 				]),
 				style = lamb_engine.utils.style
 			)
-			return
+			return False
+
+		with image:
+			for name, term in image.items():
+				x = lamb_engine.runner.runner.MacroDef(
+					name,
+					lamb_engine.nodes.Root(
+						lamb_engine.nodes.debruijn.to_node(term),
+						runner = runner
+					)
+				)
+
+				it = iter(x.expr)
+				for _, n in it:
+					if (n.kind == lamb_engine.nodes.Kind.MACRO) and (n.name not in runner.macro_table):
+						n.parent.set_side(n.parent_side, n.to_freevar())
+						it.ptr = n.parent.get_side(n.parent_side)
 
-		if not isinstance(x, lamb_engine.runner.runner.MacroDef):
+				runner.save_macro(x, silent = True)
+
+				if not quiet:
+					printf(
+						FormattedText([
+							("class:ok", f"Loaded {x.label}: ")
+						] + lamb_engine.utils.lex_str(str(x.expr))),
+						style = lamb_engine.utils.style
+					)
+
+		if quiet:
 			printf(
-				FormattedText([
-					("class:warn", f"Skipping line {i+1:02}: "),
-					("class:code", l),
-					("class:warn", f" is not a macro definition.")
-				]),
+				HTML(
+					f"<ok>Loaded {len(image)} macros from</ok> <code>{target}</code>"
+				),
 				style = lamb_engine.utils.style
 			)
-			return
+		return
+
+	with open(target, "r") as f:
+		text = f.read()
+
+	# Macros we've loaded, as (name, template).
+	# If this file hasn't changed since it was last loaded,
+	# they're in its cache.
+	defined_before = set(runner.macro_table)
+	loaded = cache.load(target, text, defined_before)
+
+	if loaded is not None:
+		for name, template in loaded:
+			x = lamb_engine.runner.runner.MacroDef(
+				name,
+				lamb_engine.nodes.Root(template.source, runner = runner)
+			)
+			runner.save_macro(x, silent = True, template = template)
+
+			if not quiet:
+				printf(
+					FormattedText([
+						("class:ok", f"Loaded {x.label}: ")
+					] + lamb_engine.utils.lex_str(str(x.expr))),
+					style = lamb_engine.utils.style
+				)
+
+	else:
+		loaded = []
+		lines = [x.strip() for x in text.splitlines()]
+
+		for i in range(len(lines)):
+			l = lines[i].strip()
 
-		runner.save_macro(x, silent = True)
+			# Skip comments and empty lines
+			if l.startswith("#"):
+				continue
+			if l == "":
+				continue
 
+			try:
+				x = runner.parse(l)[0]
+			except ppx.ParseException as e:
+				printf(
+					FormattedText([
+						("class:warn", f"Syntax error on line {i+1:02}: "),
+						("class:code", l[:e.loc]),
+						("class:err", l[e.loc]),
+						("class:code", l[e.loc+1:])
+					]),
+					style = lamb_engine.utils.style
+				)
+				return False
+
+			if not isinstance(x, lamb_engine.runner.runner.MacroDef):
+				printf(
+					FormattedText([
+						("class:warn", f"Skipping line {i+1:02}: "),
+						("class:code", l),
+						("class:warn", f" is not a macro definition.")
+					]),
+					style = lamb_engine.utils.style
+				)
+				return False
+
+			runner.save_macro(x, silent = True)
+			loaded.append((x.label, runner.macro_templates[x.label]))
+
+			if not quiet:
+				printf(
+					FormattedText([
+						("class:ok", f"Loaded {x.label}: ")
+					] + lamb_engine.utils.lex_str(str(x.expr))),
+					style = lamb_engine.utils.style
+				)
+
+		# Only files that loaded without errors are cached.
+		cache.save(target, text, loaded, defined_before)
+
+	if quiet:
 		printf(
-			FormattedText([
-				("class:ok", f"Loaded {x.label}: ")
-			] + lamb_engine.utils.lex_str(str(x.expr))),
+			HTML(
+				f"<ok>Loaded {len(loaded)} macros from</ok> <code>{target}</code>"
+			),
 			style = lamb_engine.utils.style
 		)
 
@@ -243,7 +608,7 @@ def cmd_load(command, runner):
 @lamb_command(
 	help_text = "Delete a macro"
 )
-def mdel(command, runner) -> None:
+def mdel(command, runner): # -> bool | None
 	if len(command.args) != 1:
 		printf(
 			HTML(
@@ -251,7 +616,7 @@ def mdel(command, runner) -> None:
 			),
 			style = lamb_engine.utils.style
 		)
-		return
+		return False
 
 	target = command.args[0]
 	if target not in runner.macro_table:
@@ -261,14 +626,17 @@ def mdel(command, runner) -> None:
 			),
 			style = lamb_engine.utils.style
 		)
-		return
+		return False
 
+	runner.history.freeze_macros(runner.macro_templates, {target})
 	del runner.macro_table[target]
+	del runner.macro_templates[target]
+	runner.macros_changed()
 
 @lamb_command(
 	help_text = "Delete all macros"
 )
-def delmac(command, runner) -> None:
+def delmac(command, runner): # -> bool | None
 	confirm = prompt(
 		message = FormattedText([
 			("class:warn", "Are you sure? "),
@@ -284,9 +652,12 @@ def delmac(command, runner) -> None:
 			),
 			style = lamb_engine.utils.style
 		)
-		return
+		return False
 
+	runner.history.freeze_macros(runner.macro_templates)
 	runner.macro_table = {}
+	runner.macro_templates = {}
+	runner.macros_changed()
 
 
 @lamb_command(
@@ -320,7 +691,7 @@ def clear(command, runner) -> None:
 @lamb_command(
 	help_text = "Get or set reduction limit"
 )
-def rlimit(command, runner) -> None:
+def rlimit(command, runner): # -> bool | None
 	if len(command.args) == 0:
 		if runner.reduction_limit is None:
 			printf(
@@ -345,7 +716,7 @@ def rlimit(command, runner) -> None:
 			),
 			style = lamb_engine.utils.style
 		)
-		return
+		return False
 
 	t = command.args[0]
 	if t.lower() == "none":
@@ -367,7 +738,7 @@ def rlimit(command, runner) -> None:
 			),
 			style = lamb_engine.utils.style
 		)
-		return
+		return False
 
 	if 50 > t:
 		printf(
@@ -376,7 +747,7 @@ def rlimit(command, runner) -> None:
 			),
 			style = lamb_engine.utils.style
 		)
-		return
+		return False
 
 	runner.reduction_limit = t
 	printf(
@@ -387,6 +758,335 @@ def rlimit(command, runner) -> None:
 	)
 
 
+@lamb_command(
+	help_text = "Get or set expression size limit, in nodes"
+)
+def sizelimit(command, runner): # -> bool | None
+	if len(command.args) == 0:
+		if runner.size_limit is None:
+			printf(
+				HTML(
+					"<ok>No size limit is set</ok>"
+				),
+				style = lamb_engine.utils.style
+			)
+		else:
+			printf(
+				HTML(
+					f"<ok>Size limit is {runner.size_limit:,} nodes</ok>"
+				),
+				style = lamb_engine.utils.style
+			)
+		return
+
+	elif len(command.args) != 1:
+		printf(
+			HTML(
+				f"<err>Command <code>:{command.name}</code> takes exactly one argument.</err>"
+			),
+			style = lamb_engine.utils.style
+		)
+		return False
+
+	t = command.args[0]
+	if t.lower() == "none":
+		runner.size_limit = None
+		printf(
+			HTML(
+				f"<ok>Removed size limit</ok>"
+			),
+			style = lamb_engine.utils.style
+		)
+		return
+
+	try:
+		t = int(t)
+	except ValueError:
+		printf(
+			HTML(
+				"<err>Size limit must be a positive integer or \"none\".</err>"
+			),
+			style = lamb_engine.utils.style
+		)
+		return False
+
+	if 50 > t:
+		printf(
+			HTML(
+				"<err>Size limit must be at least 50 nodes.</err>"
+			),
+			style = lamb_engine.utils.style
+		)
+		return False
+
+	runner.size_limit = t
+	printf(
+		HTML(
+			f"<ok>Set size limit to {t:,} nodes</ok>"
+		),
+		style = lamb_engine.utils.style
+	)
+
+
+@lamb_command(
+	help_text = "Get or set memory limit, in megabytes"
+)
+def memlimit(command, runner): # -> bool | None
+	if len(command.args) == 0:
+		if runner.memory_limit is None:
+			printf(
+				HTML(
+					"<ok>No memory limit is set</ok>"
+				),
+				style = lamb_engine.utils.style
+			)
+		else:
+			printf(
+				HTML(
+					f"<ok>Memory limit is {runner.memory_limit:,} MB</ok>"
+				),
+				style = lamb_engine.utils.style
+			)
+		return
+
+	elif len(command.args) != 1:
+		printf(
+			HTML(
+				f"<err>Command <code>:{command.name}</code> takes exactly one argument.</err>"
+			),
+			style = lamb_engine.utils.style
+		)
+		return False
+
+	t = command.args[0]
+	if t.lower() == "none":
+		runner.memory_limit = None
+		printf(
+			HTML(
+				f"<ok>Removed memory limit</ok>"
+			),
+			style = lamb_engine.utils.style
+		)
+		return
+
+	try:
+		t = int(t)
+	except ValueError:
+		printf(
+			HTML(
+				"<err>Memory limit must be a positive integer or \"none\".</err>"
+			),
+			style = lamb_engine.utils.style
+		)
+		return False
+
+	if 1 > t:
+		printf(
+			HTML(
+				"<err>Memory limit must be at least 1 MB.</err>"
+			),
+			style = lamb_engine.utils.style
+		)
+		return False
+
+	runner.memory_limit = t
+	printf(
+		HTML(
+			f"<ok>Set memory limit to {t:,} MB</ok>"
+		),
+		style = lamb_engine.utils.style
+	)
+
+
+
+@lamb_command(
+	help_text = "Get or set reduction engine"
+)
+def engine(command, runner): # -> bool | None
+	engines = lamb_engine.runner.runner.engines
+
+	if len(command.args) == 0:
+		printf(
+			HTML(
+				f"<ok>Using the <code>{runner.engine}</code> engine.</ok> " +
+				"<muted>Available: " +
+				", ".join(engines.keys()) +
+				"</muted>"
+			),
+			style = lamb_engine.utils.style
+		)
+		return
+
+	elif len(command.args) != 1:
+		printf(
+			HTML(
+				f"<err>Command <code>:{command.name}</code> takes no more than one argument.</err>"
+			),
+			style = lamb_engine.utils.style
+		)
+		return False
+
+	t = command.args[0].lower()
+	if t not in engines:
+		printf(
+			HTML(
+				"<err>Engine must be one of " +
+				", ".join(engines.keys()) +
+				".</err>"
+			),
+			style = lamb_engine.utils.style
+		)
+		return False
+
+	runner.engine = t
+	printf(
+		HTML(
+			f"<ok>Using the <code>{t}</code> engine.</ok>"
+		),
+		style = lamb_engine.utils.style
+	)
+
+
+@lamb_command(
+	help_text = "Get or set reduction strategy"
+)
+def strategy(command, runner): # -> bool | None
+	strategies = lamb_engine.runner.runner.strategies
+
+	if len(command.args) == 0:
+		printf(
+			HTML(
+				f"<ok>Using the <code>{runner.strategy}</code> strategy.</ok>\n" +
+				"\n".join([
+					f"\t<code>{name}</code> \t <text>{text}</text> \t " +
+					f"<muted>{runner.strategy_reductions[name]:,} reductions so far</muted>"
+					for name, (text, _) in strategies.items()
+				])
+			),
+			style = lamb_engine.utils.style
+		)
+		return
+
+	elif len(command.args) != 1:
+		printf(
+			HTML(
+				f"<err>Command <code>:{command.name}</code> takes no more than one argument.</err>"
+			),
+			style = lamb_engine.utils.style
+		)
+		return False
+
+	t = command.args[0].lower()
+	if t not in strategies:
+		printf(
+			HTML(
+				"<err>Strategy must be one of " +
+				", ".join(strategies.keys()) +
+				".</err>"
+			),
+			style = lamb_engine.utils.style
+		)
+		return False
+
+	runner.strategy = t
+	printf(
+		HTML(
+			f"<ok>Using the <code>{t}</code> strategy.</ok>"
+		),
+		style = lamb_engine.utils.style
+	)
+
+
+def stats_html(s) -> str:
+	"""
+	Format a lamb_engine.nodes.stats.Stats for printing.
+	"""
+	macros = sorted(s.macro_expansions.items(), key = lambda x: -x[1])
+	return (
+		f"\t<ok>Nodes allocated:</ok> <text>{s.nodes_allocated:,}</text>\n"
+		f"\t<ok>clone() calls:</ok> <text>{s.clone_calls:,}</text> "
+		f"<muted>({s.nodes_copied:,} nodes copied)</muted>\n"
+		f"\t<ok>Tree walk steps:</ok> <text>{s.walker_steps:,}</text>\n" +
+		"".join(
+			f"\t<ok>Time in {name}:</ok> <text>{t:.03f} seconds</text>\n"
+			for name, t in s.time.items()
+		) +
+		f"\t<ok>Macro expansions:</ok> " + (
+			"<text>" + ", ".join(f"{name} {n:,}" for name, n in macros[:10]) + "</text>"
+			if macros else "<text>none</text>"
+		) +
+		(f" <muted>and {len(macros) - 10} more</muted>" if len(macros) > 10 else "")
+	)
+
+@lamb_command(
+	help_text = "Show or toggle performance counters"
+)
+def stats(command, runner): # -> bool | None
+	stats = lamb_engine.nodes.stats
+
+	if len(command.args) == 0:
+		if (not stats.enabled) and (runner.last_stats is None):
+			printf(
+				HTML(
+					"<warn>Counters are off. Turn them on with <code>:stats yes</code>.</warn>"
+				),
+				style = lamb_engine.utils.style
+			)
+			return
+
+		text = ""
+		if runner.last_stats is not None:
+			text += "<ok>Last evaluation:</ok>\n" + stats_html(runner.last_stats) + "\n\n"
+		text += "<ok>Since counters were reset:</ok>\n" + stats_html(stats.totals)
+		if not stats.enabled:
+			text += "\n\n<muted>Counters are off.</muted>"
+		printf(HTML(text), style = lamb_engine.utils.style)
+		return
+
+	elif len(command.args) != 1:
+		printf(
+			HTML(
+				f"<err>Command <code>:{command.name}</code> takes no more than one argument.</err>"
+			),
+			style = lamb_engine.utils.style
+		)
+		return False
+
+	t = command.args[0].lower()
+	if t in ("y", "yes"):
+		stats.enable()
+		printf(
+			HTML(
+				f"<warn>Enabled performance counters. Reduction will be slower.</warn>"
+			),
+			style = lamb_engine.utils.style
+		)
+	elif t in ("n", "no"):
+		stats.disable()
+		printf(
+			HTML(
+				f"<warn>Disabled performance counters.</warn>"
+			),
+			style = lamb_engine.utils.style
+		)
+	elif t == "reset":
+		stats.reset()
+		runner.last_stats = None
+		printf(
+			HTML(
+				f"<warn>Reset performance counters.</warn>"
+			),
+			style = lamb_engine.utils.style
+		)
+	else:
+		printf(
+			HTML(
+				f"<err>Usage: <code>:stats [yes|no|reset]</code></err>"
+			),
+			style = lamb_engine.utils.style
+		)
+		return False
+
 
 @lamb_command(
 	help_text = "Print this help"
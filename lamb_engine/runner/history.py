@@ -0,0 +1,200 @@
+import collections
+
+import lamb_engine
+import lamb_engine.nodes as lbn
+
+
+class Pending:
+	"""
+	A result kept as the de Bruijn term its engine stopped at.
+	Building a tree from it can take far longer than the reduction
+	did (see lbn.lazy), so ResultHistory only does that when it's used.
+	"""
+
+	__slots__ = ("term", "runner")
+
+	def __init__(self, term: lbn.debruijn.Term, runner):
+		self.term = term
+		self.runner = runner
+
+	def build(self) -> lbn.Root:
+		return lbn.Root(lbn.debruijn.to_node(self.term), runner = self.runner)
+
+def size(entry) -> int:
+	"""
+	The number of nodes in a result, built or not.
+	"""
+	if isinstance(entry, Pending):
+		return entry.term.size
+	return entry.left.size
+
+
+class ResultHistory:
+	"""
+	The last few results, newest first. $ stands for the newest one.
+
+	Results are kept as they were found, without expanding their macros.
+	They're shared by every $ that refers to them (see lbn.History),
+	so they must not be changed, except by freeze_macros().
+
+	We keep at most `length` results, and drop the oldest ones while
+	together they have more than `budget` nodes.
+	The newest result is always kept.
+
+	Results may be added as Pendings, which are built
+	the first time they're read.
+	"""
+
+	def __init__(self, length: int = 10, budget: int = 1_000_000):
+		self.length = length
+		self.budget = budget
+		self.entries = collections.deque()
+
+		# The number of nodes in all entries.
+		self.nodes = 0
+
+		# Whether each entry is normal (see is_normal), by id.
+		# Entries are kept with their ids, since ids can be reused.
+		self.normal = {}
+
+	def __len__(self):
+		return len(self.entries)
+
+	def __getitem__(self, i: int): # -> lbn.Root | None
+		"""
+		Return the i-th newest result, or None if there isn't one.
+		"""
+		if i >= len(self.entries):
+			return None
+		e = self.entries[i]
+		if isinstance(e, Pending):
+			e = e.build()
+			self.entries[i] = e
+		return e
+
+	def add(self, entry) -> None:
+		"""
+		Save a result, as a Root or a Pending.
+		It must not have any history references in it.
+		"""
+		self.entries.appendleft(entry)
+		self.nodes += size(entry)
+		self.trim()
+
+	def trim(self) -> None:
+		while (len(self.entries) > 1) and (
+				(len(self.entries) > self.length) or
+				(self.nodes > self.budget)
+			):
+			e = self.entries.pop()
+			self.nodes -= size(e)
+			self.normal.pop(id(e), None)
+
+	def clear(self) -> None:
+		self.entries.clear()
+		self.nodes = 0
+		self.normal.clear()
+
+	def is_normal(self, root: lbn.Root) -> bool:
+		"""
+		Return True if a result has nothing left to reduce, so $
+		can stand for it without being copied. Results of reductions
+		that stopped early aren't, and nor may results changed by
+		freeze_macros(). We only check each entry once.
+		"""
+		n = self.normal.get(id(root))
+		if (n is not None) and (n[0] is root):
+			return n[1]
+
+		out = lbn.is_normal(root)
+		if any(e is root for e in self.entries):
+			self.normal[id(root)] = (root, out)
+		return out
+
+	def freeze_macros(self, templates: dict, names = None) -> None:
+		"""
+		Expand the macros in `names` in every result,
+		or every macro if `names` is None.
+		Macros that use those are expanded too, since they change with them.
+
+		Call this before those macros are changed or deleted,
+		so results keep standing for what they did.
+		`templates` is runner.macro_templates, which must still
+		hold the old definitions.
+		"""
+
+		if not self.entries:
+			return
+
+		K = lbn.Kind
+		uses = []
+		for e in self.entries:
+			if isinstance(e, Pending):
+				uses.append(lbn.display.macros(e.term))
+			else:
+				uses.append({n.name for _, n in e if n.kind == K.MACRO})
+		used = set().union(*uses)
+
+		if names is None:
+			names = set(templates)
+		names = dependents(templates, names, used)
+		if not (names & used):
+			return
+
+		def only(n):
+			return (n.kind == K.MACRO) and (n.name in names)
+
+		for i, u in enumerate(uses):
+			if not (names & u):
+				continue
+			root = self[i]
+			self.nodes -= root.left.size
+			lbn.expand(root, only = only)
+			self.nodes += root.left.size
+			self.normal.pop(id(root), None)
+		self.trim()
+
+
+def dependents(templates: dict, names: set, used: set) -> set:
+	"""
+	Return the macros in `names` and all macros that use them,
+	directly or through other macros.
+	We only look at the macros in `used` and the ones they use.
+
+	Macros that use themselves through others can't be expanded
+	all the way, so they're left out.
+	"""
+
+	uses = {}
+	todo = [n for n in used if n in templates]
+	while todo:
+		n = todo.pop()
+		if n not in uses:
+			uses[n] = lbn.display.macros(templates[n].term)
+			todo.extend(m for m in uses[n] if (m in templates) and (m not in uses))
+
+	used_by = {}
+	for n, ms in uses.items():
+		for m in ms:
+			used_by.setdefault(m, set()).add(n)
+
+	out = set(names)
+	todo = list(names)
+	while todo:
+		for n in used_by.get(todo.pop(), ()):
+			if n not in out:
+				out.add(n)
+				todo.append(n)
+
+	recursive = set()
+	for n in out:
+		seen = set()
+		todo = [n]
+		while todo:
+			for m in uses.get(todo.pop(), ()):
+				if (m in out) and (m not in seen):
+					seen.add(m)
+					todo.append(m)
+		if n in seen:
+			recursive.add(n)
+	return out - recursive
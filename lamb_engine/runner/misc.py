@@ -1,11 +1,19 @@
 import enum
+import time
+
 import lamb_engine
 
 class StopReason(enum.Enum):
 	BETA_NORMAL		= ("class:text", "β-normal form")
+	WEAK_NORMAL		= ("class:text", "Weak normal form")
+	HEAD_NORMAL		= ("class:text", "Head normal form")
+	WEAK_HEAD_NORMAL = ("class:text", "Weak head normal form")
 	LOOP_DETECTED	= ("class:warn", "Loop detected")
 	MAX_EXCEEDED	= ("class:err", "Too many reductions")
+	SIZE_EXCEEDED	= ("class:err", "Expression too big")
+	MEMORY_EXCEEDED	= ("class:err", "Out of memory")
 	INTERRUPT		= ("class:warn", "User interrupt")
+	TIMEOUT			= ("class:err", "Timed out")
 	SHOW_MACRO		= ("class:text", "Displaying macro content")
 
 class MacroDef:
@@ -40,3 +48,175 @@ class Command:
 	def __init__(self, name, args):
 		self.name = name
 		self.args = args
+
+class Result:
+	"""
+	What happened when we reduced an expression.
+	Made by Runner.evaluate().
+	"""
+
+	def __init__(
+			self,
+			node: lamb_engine.nodes.Root,
+			stop_reason: StopReason,
+			*,
+			reductions: int,
+			macro_expansions: int,
+			runtime: float,
+			strategy: str,
+			loop_length: int = 0,
+			memory_used: int = 0,
+			size = None,
+			formatted = None,
+			only_macro: bool = False,
+			stepped: bool = False
+		):
+		# The expression we ended up with, or None if we didn't
+		# build it because we found no answer (see Runner.evaluate).
+		# This is also the newest entry in runner.history,
+		# which keeps it unbuilt if it's None.
+		self.node = node
+		self.stop_reason = stop_reason
+
+		self.reductions = reductions
+		self.macro_expansions = macro_expansions
+		self.runtime = runtime
+		self.strategy = strategy
+
+		# Only set for the stop reasons they explain.
+		self.loop_length = loop_length
+		self.memory_used = memory_used
+		self.size = size
+
+		# The answer, as formatted text (see lbn.format_node),
+		# or None if we didn't find one.
+		self.formatted = formatted
+
+		# True if the expression was a single macro we just displayed.
+		self.only_macro = only_macro
+
+		# True if we reduced step-by-step.
+		self.stepped = stepped
+
+		# Counters for this evaluation, if they were on.
+		# See lamb_engine.nodes.stats.
+		self.stats = None
+
+	@property
+	def text(self): # -> str | None
+		"""
+		The answer, as printed, or None if we didn't find one.
+		"""
+		if self.formatted is None:
+			return None
+		return "".join(t for _, t in self.formatted)
+
+	def to_dict(self) -> dict:
+		"""
+		Return this result as a dict of plain values, for JSON.
+		"""
+		d = {
+			"stop_reason": self.stop_reason.name.lower(),
+			"exit_reason": self.stop_reason.value[1],
+			"result": self.text,
+			"reductions": self.reductions,
+			"macro_expansions": self.macro_expansions,
+			"runtime": round(self.runtime, 6),
+			"strategy": self.strategy
+		}
+		if self.stop_reason == StopReason.LOOP_DETECTED:
+			d["loop_length"] = self.loop_length
+		elif self.stop_reason == StopReason.MEMORY_EXCEEDED:
+			d["memory_used"] = self.memory_used
+		elif self.stop_reason == StopReason.SIZE_EXCEEDED:
+			d["size"] = self.size
+		if self.stats is not None:
+			d["stats"] = self.stats.to_dict()
+		return d
+
+class LoopDetector:
+	"""
+	Finds cycles in the states of a reduction with Brent's algorithm,
+	so only one state is kept no matter how long the reduction runs.
+
+	States are sampled every `interval` steps. Once two samples match,
+	we know we're in a cycle, and check every step until the same state
+	comes back to find out exactly how long the cycle is.
+
+	Getting a state can be slow for big expressions, so the interval
+	is doubled whenever sampling takes more than `budget` of our time.
+	"""
+
+	budget = 0.1
+
+	def __init__(self, interval: int = 1):
+		self.interval = interval
+
+		# Time spent getting states, and when we started counting.
+		self.spent = 0.0
+		self.start = time.perf_counter()
+
+		# True once we know we're in a cycle.
+		self.in_cycle = False
+
+		self.restart()
+
+	def restart(self):
+		# The state we compare others to, and the step we saw it after.
+		self.saved = None
+		self.saved_step = 0
+
+		# Brent's algorithm: the saved state is replaced
+		# after `power` samples, and power is then doubled.
+		self.power = 1
+		self.samples = 0
+
+	def check(self, k: int, reducer): # -> int | None
+		"""
+		Look at the state of `reducer` after step `k`.
+		Returns the length of the cycle if this state was seen before,
+		and None otherwise.
+		"""
+
+		if (not self.in_cycle) and (k % self.interval != 0):
+			return None
+
+		t = time.perf_counter()
+		state = reducer.state()
+		now = time.perf_counter()
+
+		if self.saved is None:
+			self.saved = state
+			self.saved_step = k
+			return None
+
+		if state == self.saved:
+			if self.in_cycle or (self.interval == 1):
+				return k - self.saved_step
+			self.in_cycle = True
+			self.saved = state
+			self.saved_step = k
+			return None
+
+		if self.in_cycle:
+			return None
+
+		self.samples += 1
+		if self.samples == self.power:
+			self.saved = state
+			self.saved_step = k
+			self.power *= 2
+			self.samples = 0
+
+		# Sample less often if this is slowing us down.
+		# Samples must be evenly spaced, so we start over.
+		self.spent += now - t
+		over = self.spent / (self.budget * max(now - self.start, 1e-9))
+		if over > 1:
+			while over > 1:
+				self.interval *= 2
+				over /= 2
+			self.spent = 0.0
+			self.start = now
+			self.restart()
+		return None
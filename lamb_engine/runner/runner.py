@@ -3,7 +3,6 @@ from prompt_toolkit.formatted_text import FormattedText
 from prompt_toolkit.key_binding import KeyBindings
 from prompt_toolkit import prompt
 from prompt_toolkit import print_formatted_text as printf
-import collections
 import math
 import time
 
@@ -12,9 +11,41 @@ import lamb_engine
 from lamb_engine.runner.misc import MacroDef
 from lamb_engine.runner.misc import Command
 from lamb_engine.runner.misc import StopReason
+from lamb_engine.runner.misc import LoopDetector
+from lamb_engine.runner.misc import Result
+from lamb_engine.runner.history import ResultHistory
+from lamb_engine.runner.history import Pending
 from lamb_engine.runner import commands as cmd
 
 
+# Reduction engines, selected with :engine.
+# Each of these is made from a prepared Root,
+# and must provide step(), trace, write_step() and root
+# like lamb_engine.nodes.Reducer.
+# Engines with stepwise = False provide normalize() instead of step().
+engines = {
+	"tree": lamb_engine.nodes.Reducer,
+	"debruijn": lamb_engine.nodes.debruijn.Reducer,
+	"lazy": lamb_engine.nodes.lazy.Reducer,
+	"nbe": lamb_engine.nodes.nbe.Reducer,
+	"parallel": lamb_engine.nodes.parallel.Reducer
+}
+
+
+# Reduction strategies, selected with :strategy.
+# Each has a description, and the stop reason we give
+# when there is nothing left to reduce.
+# Strategies other than "normal" only work with the tree engine,
+# their reducers are in lamb_engine.nodes.strategies.reducers.
+strategies = {
+	"normal": ("leftmost-outermost", StopReason.BETA_NORMAL),
+	"applicative": ("leftmost-innermost", StopReason.BETA_NORMAL),
+	"cbv": ("call-by-value, not inside functions", StopReason.WEAK_NORMAL),
+	"head": ("head redexes only", StopReason.HEAD_NORMAL),
+	"whnf": ("head redexes only, not inside functions", StopReason.WEAK_HEAD_NORMAL)
+}
+
+
 # Keybindings for step prompt.
 # Prevents any text from being input.
 step_bindings = KeyBindings()
@@ -30,6 +61,23 @@ class Runner:
 		prompt_message
 	):
 		self.macro_table = {}
+
+		# Compiled copies of the macros in macro_table,
+		# which are much faster to expand.
+		# These must always be updated with macro_table.
+		self.macro_templates = {}
+
+		# Finds macros by what they stand for, for short display.
+		# Made when we first need it, and reset by macros_changed().
+		self.macro_index = None
+
+		# Finds the macros delta rules apply to.
+		# Made when we first need it, and reset by macros_changed().
+		self.delta_matcher = None
+
+		# Bumped whenever a macro changes,
+		# so things made from the macros can tell they're stale.
+		self.macro_version = 0
 		self.prompt_session = prompt_session
 		self.prompt_message = prompt_message
 		self.parser = lamb_engine.parser.LambdaParser(
@@ -48,6 +96,15 @@ class Runner:
 		# Must be at least 1.
 		self.reduction_limit = 1_000_000
 
+		# Maximum size of an expression, in nodes.
+		# If None, no maximum is enforced.
+		self.size_limit = None
+
+		# Maximum memory use, in megabytes.
+		# This is checked every `iter_update` reductions.
+		# If None, no maximum is enforced.
+		self.memory_limit = None
+
 		# Ensure bound variables are unique.
 		# This is automatically incremented whenever we make
 		# a bound variable.
@@ -58,17 +115,53 @@ class Runner:
 		# so that all digits appear to be changing.
 		self.iter_update = 231
 
-		self.history = collections.deque(
-			[None] * 10,
-			10)
+		# Earlier results, for $.
+		self.history = ResultHistory()
 
 
 		# If true, reduce step-by-step.
 		self.step_reduction = False
 
+		# If false, we never prompt or show progress while reducing.
+		# Used when we aren't attached to a terminal.
+		self.interactive = True
+
 		# If true, expand ALL macros when printing output
 		self.full_expansion = False
 
+		# If true, results are shown with macros and numerals
+		# by name, and without the parts that are too deep or too
+		# far along. See lamb_engine.nodes.display.
+		self.short_display = False
+		self.display_depth = 12
+		self.display_length = 2000
+
+		# If true, compute arithmetic on church numerals
+		# directly instead of reducing it step by step.
+		self.delta_rules = False
+
+		# If true, stop reducing when we find a loop.
+		self.loop_detection = True
+
+		# If true, engines that work on de Bruijn terms
+		# share every repeated subterm (hash-consing).
+		self.hash_consing = False
+
+		# The reduction engine to use.
+		# Must be a key in `engines`.
+		self.engine = "tree"
+
+		# The reduction strategy to use.
+		# Must be a key in `strategies`.
+		self.strategy = "normal"
+
+		# Total reductions done with each strategy.
+		self.strategy_reductions = {s: 0 for s in strategies}
+
+		# Counters from the last evaluation, if they were on.
+		# See lamb_engine.nodes.stats.
+		self.last_stats = None
+
 	def prompt(self):
 		return self.prompt_session.prompt(
 			message = self.prompt_message
@@ -90,7 +183,11 @@ class Runner:
 		return e, w
 
 
-	def reduce(self, node: lamb_engine.nodes.Root, *, warnings = []) -> None:
+	def evaluate(self, node: lamb_engine.nodes.Root, *, warnings = []) -> Result:
+		"""
+		Reduce an expression, and return what happened.
+		This only prints warnings, and progress if we're interactive.
+		"""
 
 		# Reduction Counter.
 		# We also count macro (and church) expansions,
@@ -98,9 +195,18 @@ class Runner:
 		k = 0
 		macro_expansions = 0
 
+		# Length of the loop we found, if we found one.
+		loop_length = 0
+
+		# Memory use when we ran out, in bytes.
+		memory_used = 0
+
 		stop_reason = StopReason.MAX_EXCEEDED
 		start_time = time.time()
-		out_text = []
+
+		# Counters from before we started, if they're on.
+		stats = lamb_engine.nodes.stats
+		stats_before = stats.totals.copy() if stats.enabled else None
 
 		only_macro = (
 			isinstance(node.left, lamb_engine.nodes.Macro) or
@@ -111,10 +217,64 @@ class Runner:
 		m, node = lamb_engine.nodes.expand(node, force_all = only_macro)
 		macro_expansions += m
 
+		# History references are expanded when they're reduced,
+		# and the ones that are left are expanded at the end.
+		# We count them all now, like we used to expand them.
+		history_refs = sum(n.kind == lamb_engine.nodes.Kind.HISTORY for _, n in node)
+		macro_expansions += history_refs
+
 		if len(warnings) != 0:
 			printf(FormattedText(warnings), style = lamb_engine.utils.style)
 
-		if self.step_reduction:
+		if self.strategy == "normal":
+			reducer = engines[self.engine](node)
+		else:
+			if self.engine != "tree":
+				printf(FormattedText([
+					("class:warn", "The "),
+					("class:code", self.engine),
+					("class:warn", " engine only does normal order reduction, using "),
+					("class:code", "tree"),
+					("class:warn", " instead.\n"),
+				]), style = lamb_engine.utils.style)
+			reducer = lamb_engine.nodes.strategies.reducers[self.strategy](node)
+		normal_form = strategies[self.strategy][1]
+
+		step_reduction = self.step_reduction and reducer.stepwise and self.interactive
+		if self.step_reduction and self.interactive and not reducer.stepwise:
+			printf(FormattedText([
+				("class:warn", "The "),
+				("class:code", self.engine),
+				("class:warn", " engine can't reduce step-by-step.\n"),
+			]), style = lamb_engine.utils.style)
+
+		# Engines that can't step can't detect loops either.
+		# :loops says so, since detection is on by default.
+		if self.loop_detection and reducer.stepwise:
+			loops = LoopDetector()
+		else:
+			loops = None
+
+		size_limit = self.size_limit
+		if (size_limit is not None) and (reducer.size() is None):
+			size_limit = None
+			printf(FormattedText([
+				("class:warn", "The "),
+				("class:code", self.engine),
+				("class:warn", " engine can't measure expressions, ignoring size limit.\n"),
+			]), style = lamb_engine.utils.style)
+
+		memory_limit = self.memory_limit
+		if (memory_limit is not None) and (lamb_engine.utils.memory_usage() is None):
+			memory_limit = None
+			printf(FormattedText([
+				("class:warn", "Can't measure memory use on this system, ignoring memory limit.\n"),
+			]), style = lamb_engine.utils.style)
+		elif memory_limit is not None:
+			memory_limit = memory_limit * 1024 * 1024
+
+		if step_reduction:
+			reducer.trace = self.display_length
 			printf(FormattedText([
 				("class:warn", "Step-by-step reduction is enabled.\n"),
 				("class:muted", "Press "),
@@ -127,48 +287,92 @@ class Runner:
 
 
 		skip_to_end = False
+		reduce_start = time.perf_counter()
 		try:
+			# Engines that can't step find the normal form in one go.
+			if not (reducer.stepwise or only_macro):
+				k, finished = reducer.normalize(
+					self.reduction_limit,
+					memory_limit = memory_limit
+				)
+				macro_expansions += reducer.applications
+				if finished:
+					stop_reason = normal_form
+				elif reducer.memory_used is not None:
+					stop_reason = StopReason.MEMORY_EXCEEDED
+					memory_used = reducer.memory_used
+
 			while (
 					(
 						(self.reduction_limit is None) or
 						(k < self.reduction_limit)
-					) and not only_macro
+					) and reducer.stepwise and not only_macro
 				):
 
 				# Show reduction count
 				if (
 						( (k >= self.iter_update) and (k % self.iter_update == 0) )
-						and not (self.step_reduction and not skip_to_end)
+						and not (step_reduction and not skip_to_end)
+						and self.interactive
 					):
 					print(f" Reducing... {k:,}", end = "\r")
 
 				# Reduce
-				red_type, node = lamb_engine.nodes.reduce(node)
+				red_type = reducer.step()
 
 				# If we can't reduce this expression anymore,
-				# it's in beta-normal form.
+				# it's in the normal form of our strategy.
 				if red_type == lamb_engine.nodes.ReductionType.NOTHING:
-					stop_reason = StopReason.BETA_NORMAL
+					stop_reason = normal_form
 					break
 
+				# History references were counted before we started.
+				# Expanding one doesn't change the state either,
+				# so there's nothing to check.
+				if red_type == lamb_engine.nodes.ReductionType.HIST_EXPAND:
+					continue
+
 				# Count reductions
 				k += 1
 				if red_type == lamb_engine.nodes.ReductionType.FUNCTION_APPLY:
 					macro_expansions += 1
 
-				# Pause after step if necessary
-				if self.step_reduction and not skip_to_end:
+				# Stop if we've grown too big
+				if (size_limit is not None) and (reducer.size() > size_limit):
+					stop_reason = StopReason.SIZE_EXCEEDED
+					break
+
+				if (memory_limit is not None) and (k % self.iter_update == 0):
+					memory_used = lamb_engine.utils.memory_usage()
+					if memory_used > memory_limit: # type: ignore
+						stop_reason = StopReason.MEMORY_EXCEEDED
+						break
+
+				# Stop if we've been here before
+				if loops is not None:
+					l = loops.check(k, reducer)
+					if l is not None:
+						stop_reason = StopReason.LOOP_DETECTED
+						loop_length = l
+						break
+
+				# Pause after step if necessary.
+				# We only show what this step changed.
+				if step_reduction and not skip_to_end:
+					f = lamb_engine.nodes.Formatter()
+					reducer.write_step(f.write, depth = self.display_depth)
 					try:
 						s = prompt(
 							message = FormattedText([
 								("class:prompt", lamb_engine.nodes.reduction_text[red_type]),
 								("class:prompt", f":{k:03} ")
-							] + lamb_engine.utils.lex_str(str(node))),
+							] + f.result()),
 							style = lamb_engine.utils.style,
 							key_bindings = step_bindings
 						)
 					except KeyboardInterrupt or EOFError:
 						skip_to_end = True
+						reducer.trace = None
 						printf(FormattedText([
 							("class:warn", "Skipping to end."),
 						]), style = lamb_engine.utils.style)
@@ -176,61 +380,176 @@ class Runner:
 		# Gracefully catch keyboard interrupts
 		except KeyboardInterrupt:
 			stop_reason = StopReason.INTERRUPT
+			if not reducer.stepwise:
+				k = reducer.reductions
+
+		stats.add_reduce_time(time.perf_counter() - reduce_start)
+
+		# Building a result we won't show can take far longer than
+		# reducing did (see lbn.lazy), so we only do that if we have to.
+		# Otherwise, history keeps the term and builds it if it's used.
+		shown = (
+			stop_reason == normal_form or
+			stop_reason == StopReason.LOOP_DETECTED or
+			only_macro
+		)
+		if shown or not reducer.builds_root:
+			node = reducer.root
+		else:
+			node = None
+			self.history.add(Pending(reducer.state(), self))
+		if not only_macro:
+			self.strategy_reductions[self.strategy] += k
 
 		# Print a space between step messages
-		if self.step_reduction:
+		if step_reduction:
 			print("")
 
 		# Clear reduction counter if it was printed
-		if k >= self.iter_update:
+		if (k >= self.iter_update) and self.interactive:
 			print(" " * round(14 + math.log10(k)), end = "\r")
 
 		# Expand fully if necessary
-		if self.full_expansion:
+		if node is None:
+			pass
+		elif self.full_expansion:
 			o, node = lamb_engine.nodes.expand(node, force_all = True)
 			macro_expansions += o
+		elif history_refs:
+			node = lamb_engine.nodes.expand(
+				node,
+				only = lambda n: n.kind == lamb_engine.nodes.Kind.HISTORY
+			)[1]
 
-		if only_macro:
+		result = Result(
+			node,
+			stop_reason,
+			reductions = k,
+			macro_expansions = macro_expansions,
+			runtime = time.time() - start_time,
+			strategy = self.strategy,
+			loop_length = loop_length,
+			memory_used = memory_used,
+			size = reducer.size() if stop_reason == StopReason.SIZE_EXCEEDED else None,
+			formatted = self.format(node, only_macro = only_macro) if shown else None,
+			only_macro = only_macro,
+			stepped = step_reduction
+		)
+
+		# Save to history.
+		# Macros in it are expanded only if they change.
+		if node is not None:
+			self.history.add(node)
+
+		if stats_before is not None:
+			result.stats = stats.totals - stats_before
+			self.last_stats = result.stats
+
+		return result
+
+	def format(self, node: lamb_engine.nodes.Root, *, only_macro = False) -> list:
+		"""
+		Format a result for display.
+		A macro on its own is always shown in full,
+		since we're showing what it stands for.
+		"""
+		if (not self.short_display) or only_macro:
+			return lamb_engine.nodes.format_node(node)
+
+		if self.macro_index is None:
+			self.macro_index = lamb_engine.nodes.display.MacroIndex(self)
+		return lamb_engine.nodes.display.format_short(
+			node,
+			self.macro_index,
+			depth = self.display_depth,
+			length = self.display_length
+		)
+
+	def reduce(self, node: lamb_engine.nodes.Root, *, warnings = []) -> None:
+		r = self.evaluate(node, warnings = warnings)
+		out_text = []
+
+		if r.only_macro:
 			out_text += [
 				("class:ok", f"Displaying macro content")
 			]
 
 		else:
-			if not self.step_reduction:
+			if not r.stepped:
 				out_text += [
 					("class:ok", f"Runtime: "),
-					("class:text", f"{time.time() - start_time:.03f} seconds"),
+					("class:text", f"{r.runtime:.03f} seconds"),
 					("class:text", "\n")
 				]
 
 			out_text += [
 				("class:ok", f"Exit reason: "),
-				stop_reason.value,
+				r.stop_reason.value,
 				("class:text", "\n"),
 
 				("class:ok", f"Macro expansions: "),
-				("class:text", f"{macro_expansions:,}"),
+				("class:text", f"{r.macro_expansions:,}"),
 				("class:text", "\n"),
 
 				("class:ok", f"Reductions: "),
-				("class:text", f"{k:,}\t"),
+				("class:text", f"{r.reductions:,}\t"),
 				("class:muted", f"(Limit: {self.reduction_limit:,})")
 			]
 
+			if r.strategy != "normal":
+				out_text += [
+					("class:text", "\n"),
+					("class:ok", f"Strategy: "),
+					("class:text", f"{r.strategy} "),
+					("class:muted", f"({strategies[r.strategy][0]})")
+				]
+
+			if r.stop_reason == StopReason.SIZE_EXCEEDED:
+				out_text += [
+					("class:text", "\n"),
+					("class:ok", f"Size: "),
+					("class:text", f"{r.size:,} nodes\t"),
+					("class:muted", f"(Limit: {self.size_limit:,})")
+				]
+
+			if r.stop_reason == StopReason.MEMORY_EXCEEDED:
+				out_text += [
+					("class:text", "\n"),
+					("class:ok", f"Memory: "),
+					("class:text", f"{r.memory_used / (1024 * 1024):,.0f} MB\t"),
+					("class:muted", f"(Limit: {self.memory_limit:,} MB)")
+				]
+
+			if r.stop_reason == StopReason.LOOP_DETECTED:
+				out_text += [
+					("class:text", "\n"),
+					("class:ok", f"Loop length: "),
+					("class:text", f"{r.loop_length:,} reduction{'' if r.loop_length == 1 else 's'}")
+				]
+
 		if self.full_expansion:
 			out_text += [
 				("class:text", "\n"),
 				("class:ok", "All macros have been expanded")
 			]
 
-		if (
-				stop_reason == StopReason.BETA_NORMAL or
-				stop_reason == StopReason.LOOP_DETECTED or
-				only_macro
-		):
+		if r.stats is not None:
+			t = r.stats.time
+			out_text += [
+				("class:text", "\n"),
+				("class:ok", f"Nodes: "),
+				("class:text", f"{r.stats.nodes_allocated:,} allocated, "),
+				("class:text", f"{r.stats.nodes_copied:,} copied by {r.stats.clone_calls:,} clones"),
+				("class:text", "\n"),
+				("class:ok", f"Time: "),
+				("class:text", ", ".join(f"{name} {t[name]:.03f}s" for name in t)),
+				("class:muted", "\t(:stats for more)")
+			]
+
+		if r.formatted is not None:
 			out_text += [
 				("class:ok", "\n\n    => ")
-			] + lamb_engine.utils.lex_str(str(node))
+			] + r.formatted
 
 
 		printf(
@@ -238,23 +557,25 @@ class Runner:
 			style = lamb_engine.utils.style
 		)
 
-		# Save to history
-		# Do this at the end so we don't always fully expand.
-		self.history.appendleft(
-			lamb_engine.nodes.expand( # type: ignore
-				node,
-				force_all = True
-			)[1]
-		)
-
 	def save_macro(
 			self,
 			macro: MacroDef,
 			*,
-			silent = False
+			silent = False,
+			template = None
 		) -> None:
+		"""
+		Define a macro.
+		`template` is a compiled copy of macro.expr.left, if we already have one.
+		"""
 		was_rewritten = macro.label in self.macro_table
+		if was_rewritten:
+			self.history.freeze_macros(self.macro_templates, {macro.label})
+		if template is None:
+			template = lamb_engine.nodes.Template(macro.expr.left)
 		self.macro_table[macro.label] = macro.expr
+		self.macro_templates[macro.label] = template
+		self.macros_changed()
 
 		if not silent:
 			printf(FormattedText([
@@ -264,6 +585,15 @@ class Runner:
 				("class:code", str(macro.expr))
 			]), style = lamb_engine.utils.style)
 
+	def macros_changed(self) -> None:
+		"""
+		Drop everything we made from the macros.
+		Call this whenever a macro is defined or deleted.
+		"""
+		self.macro_index = None
+		self.delta_matcher = None
+		self.macro_version += 1
+
 	# Apply a list of definitions
 	def run(
 			self,
@@ -279,15 +609,7 @@ class Runner:
 
 		# If this line is a command, do the command.
 		elif isinstance(e, Command):
-			if e.name not in cmd.commands:
-				printf(
-					FormattedText([
-						("class:warn", f"Unknown command \"{e.name}\"")
-					]),
-					style = lamb_engine.utils.style
-				)
-			else:
-				cmd.commands[e.name](e, self)
+			self.run_command(e)
 
 		# If this line is a plain expression, reduce it.
 		elif isinstance(e, lamb_engine.nodes.Node):
@@ -298,6 +620,21 @@ class Runner:
 			raise TypeError(f"I don't know what to do with a {type(e)}")
 
 
+	def run_command(self, command: Command) -> bool:
+		"""
+		Run a command.
+		Returns False if it failed, or if there's no such command.
+		"""
+		if command.name not in cmd.commands:
+			printf(
+				FormattedText([
+					("class:warn", f"Unknown command \"{command.name}\"")
+				]),
+				style = lamb_engine.utils.style
+			)
+			return False
+		return cmd.commands[command.name](command, self) is not False
+
 	def run_lines(self, lines: list[str]):
 		for l in lines:
 			self.run(l, silent = True)
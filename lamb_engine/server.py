@@ -0,0 +1,593 @@
+from prompt_toolkit.application.current import create_app_session
+from prompt_toolkit.output import create_output
+from pyparsing import exceptions as ppx
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+
+import lamb_engine
+from lamb_engine.runner.misc import MacroDef
+from lamb_engine.runner.misc import Command
+
+
+# A long-running evaluation server.
+#
+# Clients speak JSON-RPC 2.0, one message per line, over standard
+# input and output or a UNIX socket. Each session is a Runner that
+# lives in one of our worker processes, so sessions in different
+# workers are reduced at the same time. Requests for a worker are
+# sent to it one by one, in the order they arrive.
+#
+# Methods:
+#	create_session {}						-> {"session": id}
+#	close_session {session}					-> true
+#	define {session, name, expression}		-> {"name", "expression"}
+#	command {session, command}				-> true
+#	macros {session}						-> {name: expression}
+#	evaluate {session, expression, [reduction_limit], [timeout]}
+#											-> like batch.evaluate_line()
+#	cancel {id}								-> true if the request was found
+#
+# A cancelled evaluation stops like it does on Ctrl-C,
+# and returns what it has done so far.
+
+
+# JSON-RPC error codes.
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+LAMB_ERROR = -32000
+REQUEST_CANCELLED = -32800
+
+
+# Methods clients can call.
+methods = {
+	"create_session",
+	"close_session",
+	"define",
+	"command",
+	"macros",
+	"evaluate",
+	"cancel"
+}
+
+
+class RequestError(Exception):
+	"""
+	Raised when a request can't be done.
+	Sent to the client as a JSON-RPC error.
+	"""
+	def __init__(self, code: int, msg: str):
+		self.code = code
+		self.msg = msg
+
+
+class Cancelled(KeyboardInterrupt):
+	"""
+	Raised in a worker when the request it's running is cancelled.
+	Runner.evaluate() stops on this just like it does on Ctrl-C.
+	"""
+	pass
+
+
+def param(params: dict, name: str, kind, *, optional = False):
+	"""
+	Get a parameter of a request, and make sure it has the right type.
+	"""
+	if name not in params:
+		if optional:
+			return None
+		raise RequestError(INVALID_PARAMS, f"Missing parameter \"{name}\".")
+
+	v = params[name]
+	if optional and (v is None):
+		return None
+	if (not isinstance(v, kind)) or (isinstance(v, bool) and (kind is not bool)):
+		raise RequestError(INVALID_PARAMS, f"Bad value for parameter \"{name}\".")
+	return v
+
+
+def worker_session(base: lamb_engine.Runner) -> lamb_engine.Runner:
+	"""
+	Make a runner for a new session.
+	It starts with the macros of `base`, so we only load those once.
+	"""
+	r = lamb_engine.Runner(None, None)
+	r.interactive = False
+	r.macro_table = dict(base.macro_table)
+	r.macro_templates = dict(base.macro_templates)
+	return r
+
+def worker_handle(runner, method: str, params: dict):
+	"""
+	Do a session request in a worker.
+	"""
+
+	if method == "define":
+		name = param(params, "name", str)
+		line = f"{name} = {param(params, 'expression', str)}"
+		try:
+			e, _ = runner.parse(line)
+		except ppx.ParseException as x:
+			raise RequestError(LAMB_ERROR, f"Syntax error at char {x.loc}.")
+		except lamb_engine.nodes.ReductionError as x:
+			raise RequestError(LAMB_ERROR, x.msg)
+		if (not isinstance(e, MacroDef)) or (e.label != name):
+			raise RequestError(INVALID_PARAMS, f"Bad macro name \"{name}\".")
+		runner.save_macro(e, silent = True)
+		return {"name": name, "expression": str(e.expr)}
+
+	elif method == "command":
+		line = param(params, "command", str).strip()
+		if not line.startswith(":"):
+			line = ":" + line
+		try:
+			e = runner.parser.parse_line(line)
+		except ppx.ParseException as x:
+			raise RequestError(LAMB_ERROR, f"Syntax error at char {x.loc}.")
+		if not isinstance(e, Command):
+			raise RequestError(INVALID_PARAMS, "That isn't a command.")
+		if e.name not in lamb_engine.runner.commands.commands:
+			raise RequestError(LAMB_ERROR, f"Unknown command \"{e.name}\"")
+		try:
+			ok = runner.run_command(e)
+		except lamb_engine.nodes.ReductionError as x:
+			raise RequestError(LAMB_ERROR, x.msg)
+		if not ok:
+			raise RequestError(LAMB_ERROR, f"Command :{e.name} failed.")
+		return True
+
+	elif method == "macros":
+		return {name: str(m) for name, m in runner.macro_table.items()}
+
+	elif method == "evaluate":
+		line = param(params, "expression", str)
+		reduction_limit = param(params, "reduction_limit", int, optional = True)
+		timeout = param(params, "timeout", (int, float), optional = True)
+		if (reduction_limit is not None) and (reduction_limit < 1):
+			raise RequestError(INVALID_PARAMS, "reduction_limit must be at least 1.")
+		if (timeout is not None) and (timeout <= 0):
+			raise RequestError(INVALID_PARAMS, "timeout must be positive.")
+
+		old_limit = runner.reduction_limit
+		if reduction_limit is not None:
+			runner.reduction_limit = reduction_limit
+		try:
+			info = lamb_engine.batch.evaluate_line(
+				runner, line,
+				timeout = timeout,
+				expressions_only = True
+			)
+		finally:
+			runner.reduction_limit = old_limit
+
+		if "error" in info: # type: ignore
+			raise RequestError(LAMB_ERROR, info["error"]) # type: ignore
+		del info["input"] # type: ignore
+		return info
+
+	raise RequestError(METHOD_NOT_FOUND, f"Unknown method \"{method}\".")
+
+def worker_main(conn, setup: list[str]) -> None:
+	"""
+	The main loop of a worker process.
+
+	We get (session, method, params) from `conn`,
+	and send back ("ok", result) or ("error", code, message).
+	"""
+
+	# Ctrl-C goes to every process. Only the server should handle it,
+	# it stops the workers itself. Requests are cancelled with SIGUSR1.
+	signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+	# Worker processes shouldn't start workers of their own.
+	lamb_engine.nodes.parallel.processes = 1
+
+	# Our standard output may be the server's protocol stream.
+	sys.stdout = open(os.devnull, "w")
+	session = create_app_session(output = create_output(stdout = sys.stdout))
+	session.__enter__()
+
+	base = lamb_engine.Runner(None, None)
+	base.interactive = False
+	for l in setup:
+		lamb_engine.batch.evaluate_line(base, l)
+
+	sessions = {}
+
+	# Only cancel while an evaluation is running. Other requests
+	# change the macro table, and stopping one halfway would break it.
+	running = False
+	def cancel(signum, frame):
+		if running:
+			raise Cancelled()
+	signal.signal(signal.SIGUSR1, cancel)
+
+	while True:
+		try:
+			session_id, method, params = conn.recv()
+		except EOFError:
+			break
+
+		try:
+			try:
+				running = method == "evaluate"
+				if method == "create_session":
+					sessions[session_id] = worker_session(base)
+					reply = ("ok", {"session": session_id})
+				elif method == "close_session":
+					del sessions[session_id]
+					reply = ("ok", True)
+				else:
+					reply = ("ok", worker_handle(sessions[session_id], method, params))
+			finally:
+				running = False
+		except RequestError as x:
+			reply = ("error", x.code, x.msg)
+		except Cancelled:
+			reply = ("error", REQUEST_CANCELLED, "Request cancelled.")
+
+		conn.send(reply)
+
+
+class Request:
+	"""
+	A request waiting for a worker.
+	"""
+	def __init__(self, session: int, method: str, params: dict):
+		self.session = session
+		self.method = method
+		self.params = params
+		self.future = asyncio.get_running_loop().create_future()
+
+class Worker:
+	"""
+	A worker process, and the requests waiting for it.
+	"""
+
+	def __init__(self, setup: list[str]):
+		self.conn, child = multiprocessing.Pipe()
+		self.process = multiprocessing.Process(
+			target = worker_main,
+			args = (child, setup),
+			daemon = True
+		)
+		self.process.start()
+		child.close()
+
+		self.queue = asyncio.Queue()
+		self.current = None
+		self.sessions = 0
+		self.task = asyncio.get_running_loop().create_task(self.serve())
+
+	async def receive(self):
+		"""
+		Wait for a reply from our process.
+		"""
+		loop = asyncio.get_running_loop()
+		ready = loop.create_future()
+		fd = self.conn.fileno()
+		loop.add_reader(fd, lambda: ready.done() or ready.set_result(None))
+		try:
+			await ready
+		finally:
+			loop.remove_reader(fd)
+		return self.conn.recv()
+
+	async def serve(self) -> None:
+		"""
+		Send requests to our process one by one.
+		"""
+		while True:
+			req = await self.queue.get()
+			if req.future.done():
+				continue
+
+			self.current = req
+			try:
+				self.conn.send((req.session, req.method, req.params))
+				reply = await self.receive()
+			except (EOFError, OSError):
+				reply = ("error", LAMB_ERROR, "Worker stopped.")
+			finally:
+				self.current = None
+
+			if not req.future.done():
+				req.future.set_result(reply)
+
+	def cancel(self, req: Request) -> None:
+		"""
+		Cancel a request, whether it's running or waiting.
+		"""
+		if req is self.current:
+			os.kill(self.process.pid, signal.SIGUSR1) # type: ignore
+		elif not req.future.done():
+			req.future.set_result(("error", REQUEST_CANCELLED, "Request cancelled."))
+
+	def close(self) -> None:
+		self.task.cancel()
+		self.process.terminate()
+		self.process.join()
+		self.conn.close()
+
+
+class Server:
+	"""
+	Keeps worker processes with warm macro tables, and
+	runs JSON-RPC requests from clients on them.
+
+	Every worker runs the lines in `setup` (like :load) once,
+	when it starts. Must be started with start() in a running loop.
+	"""
+
+	def __init__(self, processes = None, *, setup: list[str] = []):
+		self.processes = processes if processes is not None else (os.cpu_count() or 1)
+		self.setup = list(setup)
+		self.workers = []
+
+		# Session ids, and the worker that has each session.
+		self.session_ids = itertools.count(1)
+		self.sessions = {}
+
+	def start(self) -> None:
+		self.workers = [Worker(self.setup) for _ in range(self.processes)]
+
+	def close(self) -> None:
+		for w in self.workers:
+			w.close()
+		self.workers = []
+
+	async def send(self, worker: Worker, req: Request, running: dict, id):
+		"""
+		Queue a request on a worker, and return its result.
+		While we wait, it can be cancelled with the id of the JSON-RPC request.
+		"""
+		if id is not None:
+			running[id] = (worker, req)
+		try:
+			await worker.queue.put(req)
+			reply = await req.future
+		finally:
+			if (id is not None) and (running.get(id) == (worker, req)):
+				del running[id]
+
+		if reply[0] == "error":
+			raise RequestError(reply[1], reply[2])
+		return reply[1]
+
+	async def call(self, method: str, params: dict, client: set, running: dict, id):
+		"""
+		Do a JSON-RPC request.
+		`client` holds the sessions made by this client,
+		and `running` holds its requests that may be cancelled.
+		"""
+
+		if method not in methods:
+			raise RequestError(METHOD_NOT_FOUND, f"Unknown method \"{method}\".")
+
+		if method == "cancel":
+			r = running.get(param(params, "id", (int, str)))
+			if r is None:
+				return False
+			r[0].cancel(r[1])
+			return True
+
+		# Sessions can be used as soon as we've picked their worker,
+		# since that worker gets their requests in order.
+		if method == "create_session":
+			s = next(self.session_ids)
+			w = min(self.workers, key = lambda w: w.sessions)
+			w.sessions += 1
+			self.sessions[s] = w
+			client.add(s)
+			return await self.send(w, Request(s, method, params), running, id)
+
+		s = param(params, "session", int)
+		if s not in client:
+			raise RequestError(INVALID_PARAMS, f"Unknown session {s}.")
+		w = self.sessions[s]
+
+		if method == "close_session":
+			client.discard(s)
+			self.sessions.pop(s)
+			w.sessions -= 1
+		return await self.send(w, Request(s, method, params), running, id)
+
+	async def handle(self, message, client: set, running: dict): # -> dict | None
+		"""
+		Answer one JSON-RPC message.
+		Returns None for notifications, which get no answer.
+		"""
+
+		if (
+				(not isinstance(message, dict)) or
+				(message.get("jsonrpc") != "2.0") or
+				(not isinstance(message.get("method"), str))
+			):
+			return {
+				"jsonrpc": "2.0",
+				"id": None,
+				"error": {"code": INVALID_REQUEST, "message": "Invalid request."}
+			}
+
+		id = message.get("id")
+		params = message.get("params", {})
+		try:
+			if not isinstance(params, dict):
+				raise RequestError(INVALID_PARAMS, "Params must be an object.")
+			out = {"result": await self.call(message["method"], params, client, running, id)}
+		except RequestError as x:
+			out = {"error": {"code": x.code, "message": x.msg}}
+
+		if id is None:
+			return None
+		return {"jsonrpc": "2.0", "id": id, **out}
+
+	async def serve(self, readline, write) -> None:
+		"""
+		Answer messages from one client until it disconnects.
+		`readline` is a coroutine that returns the next line as bytes,
+		or b"" at the end, and `write` sends bytes to the client.
+
+		Messages are handled at the same time, so answers
+		may come in a different order than their requests.
+		"""
+
+		client = set()
+		running = {}
+		tasks = set()
+
+		def reply(out):
+			if out is not None:
+				write((json.dumps(out, ensure_ascii = False) + "\n").encode("utf-8"))
+
+		async def answer(message):
+			reply(await self.handle(message, client, running))
+
+		try:
+			while True:
+				line = await readline()
+				if not line:
+					break
+				if line.strip() == b"":
+					continue
+
+				try:
+					message = json.loads(line)
+				except ValueError:
+					reply({
+						"jsonrpc": "2.0",
+						"id": None,
+						"error": {"code": PARSE_ERROR, "message": "Parse error."}
+					})
+					continue
+
+				t = asyncio.get_running_loop().create_task(answer(message))
+				tasks.add(t)
+				t.add_done_callback(tasks.discard)
+
+			if tasks:
+				await asyncio.wait(tasks)
+
+		finally:
+			# Nobody is waiting for these anymore.
+			for w, req in list(running.values()):
+				w.cancel(req)
+			for s in list(client):
+				w = self.sessions.pop(s)
+				w.sessions -= 1
+				await w.queue.put(Request(s, "close_session", {}))
+
+	async def serve_client(self, reader, writer) -> None:
+		"""
+		Answer a client on a stream, like a socket.
+		"""
+		try:
+			await self.serve(reader.readline, writer.write)
+		finally:
+			writer.close()
+
+
+async def serve_stdio(server: Server) -> None:
+	"""
+	Answer a client on standard input and output.
+	"""
+	loop = asyncio.get_running_loop()
+	lines = asyncio.Queue()
+
+	# Standard input may be a file, which asyncio can't wait for,
+	# so we read it in a thread. This thread doesn't keep us running.
+	def read():
+		for line in sys.stdin.buffer:
+			loop.call_soon_threadsafe(lines.put_nowait, line)
+		loop.call_soon_threadsafe(lines.put_nowait, b"")
+	threading.Thread(target = read, daemon = True).start()
+
+	def write(data):
+		sys.stdout.buffer.write(data)
+		sys.stdout.buffer.flush()
+
+	await server.serve(lines.get, write)
+
+async def serve_socket(server: Server, path: str) -> None:
+	s = await asyncio.start_unix_server(server.serve_client, path = path)
+	async with s:
+		await s.serve_forever()
+
+
+usage = (
+	"Usage: lamb --server [options]\n"
+	"\n"
+	"Options:\n"
+	"\t--socket PATH\tListen on a UNIX socket instead of standard input\n"
+	"\t--load FILE\tLoad macros from FILE in every worker\n"
+	"\t--jobs N\tStart N worker processes (default: one per CPU)\n"
+)
+
+def main(args: list[str]) -> int:
+	"""
+	Run a server until standard input is closed,
+	or until we're stopped with Ctrl-C if we use a socket.
+	`args` are the arguments after --server.
+
+	Returns the exit code: 0 if the server ran, and 2 if the
+	arguments are wrong or a file given with --load can't be loaded.
+	"""
+
+	path = None
+	processes = None
+	setup = []
+
+	args = list(args)
+	try:
+		while args:
+			a = args.pop(0)
+			if a == "--socket":
+				path = args.pop(0)
+			elif a == "--load":
+				setup.append(":load --quiet " + args.pop(0))
+			elif a == "--jobs":
+				processes = int(args.pop(0))
+				if processes < 1:
+					raise ValueError()
+			else:
+				raise ValueError()
+	except (IndexError, ValueError):
+		sys.stderr.write(usage)
+		return 2
+
+	# Workers print to /dev/null, so we try the setup here first.
+	# Sessions without the macros we were asked to load
+	# would give wrong results, not errors.
+	with create_app_session(output = create_output(stdout = sys.stderr)):
+		runner = lamb_engine.Runner(None, None)
+		runner.interactive = False
+		for l in setup:
+			if lamb_engine.batch.evaluate_line(runner, l) is not None:
+				return 2
+
+	async def run():
+		server = Server(processes, setup = setup)
+		server.start()
+		try:
+			if path is None:
+				await serve_stdio(server)
+			else:
+				await serve_socket(server, path)
+		finally:
+			server.close()
+
+	try:
+		asyncio.run(run())
+	except KeyboardInterrupt:
+		pass
+	finally:
+		if (path is not None) and os.path.exists(path):
+			os.remove(path)
+	return 0
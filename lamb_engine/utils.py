@@ -6,8 +6,15 @@ from prompt_toolkit import print_formatted_text as printf
 from importlib.metadata import version
 from prompt_toolkit.document import Document
 
+import os
 import re
 
+# Not available on Windows.
+try:
+	import resource
+except ImportError:
+	resource = None
+
 
 style = Style.from_dict({ # type: ignore
 	# Basic formatting
@@ -162,4 +169,25 @@ def subscript(num: int):
 
 	return "".join(
 		[sub[str(x)] for x in qb]
-	)
\ No newline at end of file
+	)
+
+def memory_usage(): # -> int | None
+	"""
+	Return the memory this process is using, in bytes.
+	If we can't find the current usage, we return the peak usage.
+	If we can't find either, we return None.
+	"""
+	try:
+		with open("/proc/self/statm") as f:
+			return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+	except (OSError, ValueError, IndexError):
+		pass
+
+	if resource is None:
+		return None
+
+	# This is in kilobytes everywhere but macOS.
+	r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	if os.uname().sysname == "Darwin":
+		return r
+	return r * 1024
@@ -0,0 +1,37 @@
+from prompt_toolkit.application.current import create_app_session
+from prompt_toolkit.output import create_output
+import contextlib
+import io
+import os
+
+import lamb_engine
+
+
+macros_file = os.path.join(os.path.dirname(__file__), "..", "macros.lamb")
+
+
+def make_runner(engine: str = "tree", limit: int = 100000) -> lamb_engine.Runner:
+	"""
+	Make a quiet runner with macros.lamb loaded.
+	"""
+	r = lamb_engine.Runner(None, None)
+	r.interactive = False
+	r.run(f":load --quiet {macros_file}")
+	r.engine = engine
+	r.reduction_limit = limit
+	return r
+
+def evaluate(r: lamb_engine.Runner, text: str):
+	"""
+	Evaluate one expression and return its Result.
+	"""
+	return r.evaluate(r.parse(text)[0])
+
+@contextlib.contextmanager
+def output():
+	"""
+	Collect everything printed with prompt_toolkit.
+	"""
+	out = io.StringIO()
+	with create_app_session(output = create_output(stdout = out)):
+		yield out
@@ -0,0 +1,62 @@
+import io
+import json
+import time
+
+import lamb_engine
+from conftest import make_runner
+
+
+def run(lines: list[str], **kwargs) -> str:
+	out = io.StringIO()
+	lamb_engine.batch.run_file(make_runner(limit = 300), lines, out, **kwargs)
+	return out.getvalue()
+
+def test_results():
+	lines = ["NOT T", "# comment", "", "X = ADD 1 2", "S X", "T"]
+	assert run(lines) == "F\nλfa.(f (f (f (f a))))\nλab.a\n"
+
+def test_stopped_terms_are_not_results():
+	lines = ["(λx.x x)(λx.x x)", "(λx.(x x x)) (λx.(x x x))"]
+	assert run(lines) == "! Loop detected\n! Too many reductions\n"
+
+	infos = [json.loads(l) for l in run(lines, as_json = True).splitlines()]
+	assert [i["stop_reason"] for i in infos] == ["loop_detected", "max_exceeded"]
+	assert infos[0]["line"] == 1
+
+def test_errors():
+	out = io.StringIO()
+	errors = lamb_engine.batch.run_file(make_runner(), ["λ.", "q"], out)
+	assert errors == 1
+	assert out.getvalue() == "! Syntax error at char 1.\nq'\n"
+
+def test_timeout_in_finalizer(monkeypatch):
+	# The timer goes off while __del__ runs, where exceptions are ignored.
+	class Slow:
+		def __del__(self):
+			start = time.time()
+			while time.time() - start < 0.3:
+				pass
+
+	r = make_runner(limit = 10 ** 9)
+	parse = r.parse
+	def slow_parse(line):
+		Slow()
+		return parse(line)
+	monkeypatch.setattr(r, "parse", slow_parse)
+
+	# We may stop while parsing or while reducing.
+	info = lamb_engine.batch.evaluate_line(r, "(λx.(x x x)) (λx.(x x x))", timeout = 0.1)
+	assert lamb_engine.batch.format_text(info) == "! Timed out"
+
+def test_failed_commands():
+	out = io.StringIO()
+	lines = [":load /nonexistent", ":strategy nope", "q"]
+	errors = lamb_engine.batch.run_file(make_runner(), lines, out)
+	assert errors == 2
+	assert out.getvalue() == "! Command :load failed.\n! Command :strategy failed.\nq'\n"
+
+def test_failed_load(tmp_path, capsys):
+	f = tmp_path / "t.lamb"
+	f.write_text("NOT T\n")
+	assert lamb_engine.batch.main(["--load", "/nonexistent", str(f)]) == 2
+	assert capsys.readouterr().out == ""
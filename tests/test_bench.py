@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+import lamb_engine.bench as bench
+from conftest import macros_file
+
+
+def run(capsys, *args) -> tuple[int, str]:
+	code = bench.main(["--quick", "--repeat", "1", "--macros", macros_file, *args])
+	return code, capsys.readouterr().out
+
+@pytest.fixture(scope = "module")
+def saved(tmp_path_factory) -> dict:
+	# One run of every benchmark, shared by these tests.
+	out = tmp_path_factory.mktemp("bench") / "base.json"
+	assert bench.main(["--quick", "--repeat", "1", "--macros", macros_file, "--out", str(out)]) == 0
+	with open(out) as f:
+		return json.load(f)
+
+def test_every_benchmark_runs(saved):
+	names = [b.name for b in bench.benchmarks(macros_file, quick = True)]
+	assert list(saved["benchmarks"]) == names
+	assert saved["quick"] and (saved["engine"] == "tree")
+	for r in saved["benchmarks"].values():
+		assert r["operations"] > 0
+		assert r["time"] >= 0
+	assert saved["benchmarks"]["Y FAC 2"]["reductions"] > 0
+
+def write_baseline(tmp_path, saved: dict, factor: float) -> str:
+	# `saved`, as if everything took `factor` times as long and as much memory.
+	baseline = json.loads(json.dumps(saved))
+	for r in baseline["benchmarks"].values():
+		r["time"] *= factor
+		r["peak_memory"] *= factor
+	path = tmp_path / "baseline.json"
+	path.write_text(json.dumps(baseline))
+	return str(path)
+
+def test_regressions_are_flagged(tmp_path, capsys, saved):
+	code, out = run(capsys, "--baseline", write_baseline(tmp_path, saved, 0.01), "clone")
+	assert code == 1
+	assert "Regressions (threshold 10%):" in out
+	assert "clone: " in out and "% slower" in out
+
+def test_no_regressions(tmp_path, capsys, saved):
+	code, out = run(capsys, "--baseline", write_baseline(tmp_path, saved, 100), "clone")
+	assert code == 0
+	assert "No regressions." in out
+
+def test_compare():
+	r = {"unit": "ops", "operations": 10, "time": 1.5, "peak_memory": 100}
+	results = {"engine": "tree", "quick": True, "benchmarks": {"a": r, "b": dict(r, operations = 5)}}
+	baseline = {"engine": "lazy", "quick": True, "benchmarks": {
+		"a": dict(r, time = 1.0, peak_memory = 200),
+		"b": r
+	}}
+	assert bench.compare(results, baseline, 0.1) == [
+		"Engine changed from lazy to tree",
+		"a: 50.0% slower",
+		"b: did 5 ops, baseline did 10"
+	]
+	assert bench.compare(results, baseline, 0.6)[1:] == ["b: did 5 ops, baseline did 10"]
+
+def test_bad_arguments(capsys):
+	assert bench.main(["--macros", "no such file.lamb"]) == 2
+	assert bench.main(["--repeat", "0"]) == 2
+	assert bench.main(["--macros", macros_file, "no such benchmark"]) == 2
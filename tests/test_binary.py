@@ -0,0 +1,91 @@
+import mmap
+
+import pytest
+
+import lamb_engine
+import lamb_engine.binary as binary
+import lamb_engine.nodes as lbn
+import lamb_engine.nodes.debruijn as dbn
+from conftest import make_runner, evaluate, output
+
+
+def test_macro_table():
+	r = make_runner()
+	image = binary.loads(binary.dumps(r.macro_table))
+	assert image.names == list(r.macro_table)
+	for name, term in image.items():
+		assert term == dbn.from_node(r.macro_table[name].left)
+		assert str(image.node(name)) == str(r.macro_table[name].left)
+
+@pytest.mark.parametrize("expr", ["λa.(5 a q)", "λab.(a (1000 b) 0)", "q r", "λa.(a (a a))"])
+def test_terms(expr):
+	r = make_runner()
+	root = r.parse(expr)[0]
+	lbn.expand(root, force_all = True)
+	term = dbn.from_node(root.left)
+
+	image = binary.loads(binary.dumps({"X": root, "Y": term}))
+	# Folds are saved as the calls they stand for.
+	want = dbn.from_node(dbn.to_node(term), unfold = True)
+	assert image.term("X") == want
+	assert image.term("Y") == want
+	assert str(image.node("X")) == str(root.left)
+
+def test_shared_subterms():
+	a = dbn.Lam(dbn.App(dbn.Var(0), dbn.Free("q")), "a")
+	data = binary.dumps({"X": dbn.App(a, a), "Y": a})
+	image = binary.loads(data)
+	assert image.term("X").fn is image.term("X").arg # type: ignore
+	assert image.term("Y") is image.term("X").fn # type: ignore
+	assert image.term("X") == dbn.App(a, a)
+
+def test_history():
+	# $ is saved as the result it stands for.
+	r = make_runner()
+	evaluate(r, "NOT T")
+	image = binary.loads(binary.dumps({"X": r.parse("$ q")[0]}))
+	assert str(image.node("X")) == "(F q')"
+
+	with pytest.raises(ValueError):
+		binary.dumps({"X": lbn.History()})
+
+def test_bad_files(tmp_path):
+	r = make_runner()
+	data = binary.dumps(r.macro_table)
+
+	with pytest.raises(ValueError, match = "truncated"):
+		binary.loads(data[:-3])
+	with pytest.raises(ValueError, match = "isn't a lamb binary"):
+		binary.loads(b"NOTLAMB\0" + data[8:])
+	with pytest.raises(ValueError, match = "isn't a lamb binary"):
+		binary.loads(data[:10])
+
+	path = tmp_path / "bad.lamb"
+	path.write_bytes(data[:-3])
+	assert binary.is_binary(str(path))
+	with output() as out:
+		make_runner().run(f":load {path}")
+	assert "This file is truncated." in out.getvalue()
+
+	path.write_text("T = λab.a\n")
+	assert not binary.is_binary(str(path))
+
+def test_save_and_load(tmp_path):
+	path = str(tmp_path / "macros.bin")
+	a = make_runner()
+	a.run("QQ = λa.(a q 5)", silent = True)
+	with output():
+		a.run(f":save --binary {path}")
+	assert binary.is_binary(path)
+
+	with binary.load(path) as image:
+		assert isinstance(image.buffer, mmap.mmap)
+		assert len(image) == len(a.macro_table)
+
+	b = lamb_engine.Runner(None, None)
+	b.interactive = False
+	with output():
+		b.run(f":load {path}")
+	assert {n: str(m) for n, m in b.macro_table.items()} == {n: str(m) for n, m in a.macro_table.items()}
+	assert evaluate(b, "Y FAC 3").text == evaluate(a, "Y FAC 3").text
+	assert evaluate(b, "QQ NOT").text == evaluate(a, "QQ NOT").text
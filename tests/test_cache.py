@@ -0,0 +1,83 @@
+import os
+import shutil
+
+import pytest
+
+import lamb_engine
+from lamb_engine.runner import cache
+from conftest import macros_file, evaluate
+
+
+@pytest.fixture
+def library(tmp_path, monkeypatch) -> str:
+	# We're run from the repository, where caches are off.
+	monkeypatch.setattr(cache, "engine_version", lambda: "1.0")
+	target = str(tmp_path / "macros.lamb")
+	shutil.copy(macros_file, target)
+	return target
+
+def runner(*lines) -> lamb_engine.Runner:
+	r = lamb_engine.Runner(None, None)
+	r.interactive = False
+	for l in lines:
+		r.run(l, silent = True)
+	return r
+
+def macros(r: lamb_engine.Runner) -> dict:
+	return {name: str(m) for name, m in r.macro_table.items()}
+
+def no_parsing(monkeypatch):
+	# Only the :load command may be parsed.
+	parse = lamb_engine.Runner.parse
+	def only_commands(self, line):
+		if not line.startswith(":"):
+			raise AssertionError(f"Parsed {line!r}")
+		return parse(self, line)
+	monkeypatch.setattr(lamb_engine.Runner, "parse", only_commands)
+
+
+def test_hit(library, monkeypatch):
+	a = runner(f":load --quiet {library}")
+	assert os.path.exists(cache.path(library))
+
+	with monkeypatch.context() as m:
+		no_parsing(m)
+		b = runner(f":load --quiet {library}")
+	assert macros(b) == macros(a)
+	assert evaluate(b, "Y FAC 3").text == evaluate(a, "Y FAC 3").text
+
+def test_edited_file(library):
+	runner(f":load --quiet {library}")
+	with open(library, "a") as f:
+		f.write("\nNEWMAC = λa.(a a)\n")
+	r = runner(f":load --quiet {library}")
+	assert str(r.macro_table["NEWMAC"]) == "λa.(a a)"
+
+	with open(library, "w") as f:
+		f.write("T = λab.b\n")
+	r = runner(f":load --quiet {library}")
+	assert list(r.macro_table) == ["T"]
+	assert str(r.macro_table["T"]) == "λab.b"
+
+def test_other_version(library, monkeypatch):
+	runner(f":load --quiet {library}")
+	monkeypatch.setattr(cache, "engine_version", lambda: "2.0")
+	assert cache.load(library, open(library).read(), set()) is None
+
+	# Nor from a copy of the repository.
+	monkeypatch.setattr(cache, "engine_version", lambda: None)
+	assert cache.load(library, open(library).read(), set()) is None
+
+def test_defined_before(library):
+	# UX is a free variable in this file, unless it's defined first.
+	with open(library, "w") as f:
+		f.write("USE = λa.(UX a)\n")
+	r = runner(f":load --quiet {library}")
+	assert evaluate(r, "USE q").text == "(UX' q')"
+
+	# Defining other macros first doesn't matter.
+	assert cache.load(library, open(library).read(), {"T", "F"}) is not None
+	assert cache.load(library, open(library).read(), {"UX"}) is None
+
+	r = runner("UX = λa.(a a)", f":load --quiet {library}")
+	assert evaluate(r, "USE q").text == "(q' q')"
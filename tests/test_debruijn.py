@@ -0,0 +1,34 @@
+import lamb_engine.nodes as lbn
+import lamb_engine.nodes.debruijn as dbn
+from conftest import make_runner
+
+
+def term(text: str) -> dbn.Term:
+	r = make_runner()
+	return dbn.from_node(r.parse(text)[0].left)
+
+def test_alpha_equivalent_terms_are_equal():
+	a = term("λab.(a (b q))")
+	b = term("λxy.(x (y q))")
+	assert a == b
+	assert hash(a) == hash(b)
+	assert a != term("λab.(b (a q))")
+
+def test_round_trip():
+	for text in ["λab.(a (b q))", "λx.(x λy.(y x))", "(λa.a) NOT"]:
+		t = term(text)
+		assert dbn.from_node(dbn.to_node(t)) == t
+		assert str(t) == str(term(text))
+
+def test_instantiate():
+	# (λx.λy.(x y)) applied to λz.z
+	body = term("λxy.(x y)").body # type: ignore
+	out = dbn.instantiate(body, term("λz.z"))
+	assert out == term("λy.((λz.z) y)")
+
+def test_free_and_normal():
+	t = term("λx.(x q)")
+	assert t.free == 0
+	assert t.normal
+	assert not term("(λx.x) q").normal
+	assert dbn.shift(t.body, 1).free == 2 # type: ignore
@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+import lamb_engine
+from conftest import make_runner, evaluate
+
+
+arithmetic = {
+	"ADD 2 3": "5",
+	"MULT 3 4": "12",
+	"S 4": "5",
+	"D 2": "1",
+	"Z 0": "T",
+	"Z 3": "F"
+}
+
+
+def test_off_by_default():
+	r = make_runner()
+	assert not r.delta_rules
+	res = evaluate(r, "D 2")
+	assert res.text == "λfa.(f a)"
+	assert res.reductions > 1
+
+@pytest.mark.parametrize("engine", ["tree", "debruijn", "lazy", "nbe"])
+@pytest.mark.parametrize("expr", arithmetic)
+def test_single_step(engine, expr):
+	r = make_runner(engine)
+	r.delta_rules = True
+	res = evaluate(r, expr)
+	assert res.text == arithmetic[expr]
+	assert res.reductions == 1
+
+def test_same_normal_form():
+	# Numerals made by rules are shown by value,
+	# unless we expand everything.
+	r = make_runner()
+	plain = evaluate(r, "MULT (ADD 1 2) 4").text
+	r.delta_rules = True
+	r.full_expansion = True
+	assert evaluate(r, "MULT (ADD 1 2) 4").text == plain
+
+def test_not_applied_to_free_variables():
+	r = make_runner()
+	r.delta_rules = True
+	assert evaluate(r, "ADD q 2").text == "((q' S) 2)"
+
+def test_redefined_macros_lose_their_rules():
+	r = make_runner()
+	r.delta_rules = True
+	assert evaluate(r, "S 2").text == "3"
+	r.run("S = λnfa.(n f a)", silent = True)
+	assert evaluate(r, "S 2").text == "λfa.(f (f a))"
+
+def test_macro_chain_stops_at_limit():
+	# Each macro doubles the one before it,
+	# so fully expanding them to look for a rule never ends.
+	r = make_runner("tree", 50)
+	r.delta_rules = True
+	names = ["Q" + chr(ord("A") + i) for i in range(23)]
+	r.run(f"{names[0]} = λx.(x x)", silent = True)
+	for a, b in zip(names, names[1:]):
+		r.run(f"{b} = λx.({a} ({a} x))", silent = True)
+
+	start = time.time()
+	res = evaluate(r, f"{names[-1]} q")
+	assert res.stop_reason == lamb_engine.StopReason.MAX_EXCEEDED
+	assert time.time() - start < 10
@@ -0,0 +1,68 @@
+import pytest
+
+import lamb_engine.nodes as lbn
+from conftest import make_runner, evaluate
+
+
+def short_runner(**settings):
+	r = make_runner()
+	r.short_display = True
+	for k, v in settings.items():
+		setattr(r, k, v)
+	return r
+
+@pytest.mark.parametrize("expr, text", [
+	("MULT 2 3", "6"),
+	("NOT F", "T"),
+	# Names of variables don't matter.
+	("λxy.x", "T"),
+	("λpq.q", "F"),
+	# 0 is also F, macros win.
+	("λfa.a", "F"),
+	("λa.(a (λxy.y) (λfx.(f (f x))))", "λa.((a F) 2)"),
+	("PAIR 1 2", "λi.((i 1) 2)"),
+	# A macro on its own is shown in full.
+	("T", "λab.a")
+])
+def test_names(expr, text):
+	assert evaluate(short_runner(), expr).text == text
+
+def test_off():
+	r = make_runner()
+	assert evaluate(r, "MULT 2 3").text == "λfa.(f (f (f (f (f (f a))))))"
+	assert evaluate(r, "λxy.x").text == "λxy.x"
+
+def test_new_macros_are_found():
+	r = short_runner()
+	assert evaluate(r, "λxy.(y x)").text == "λxy.(y x)"
+	r.run("SWAP = λab.(b a)", silent = True)
+	assert evaluate(r, "λxy.(y x)").text == "SWAP"
+	r.run("SWAP = λab.(a b)", silent = True)
+	assert evaluate(r, "λxy.(y x)").text == "λxy.(y x)"
+
+def test_aliases():
+	# J and I stand for the same term. Each keeps its own name.
+	r = short_runner()
+	r.run("I = λx.x", silent = True)
+	r.run("J = I", silent = True)
+	assert evaluate(r, "λz.(z I J)").text == "λz.((z I) J)"
+	assert evaluate(r, "λz.(z J I)").text == "λz.((z J) I)"
+
+	# So do 0 and F.
+	assert evaluate(r, "λz.(z 0 F)").text == "λz.((z 0) F)"
+
+def test_depth():
+	r = short_runner(display_depth = 3)
+	assert evaluate(r, "λa.(a (a (a (a (a (a q))))))").text == "λa.(a (a (a …)))"
+	assert evaluate(r, "q (q (q (q (q (q (q r))))))").text == "(q' (q' (q' (q' …))))"
+
+	r.display_depth = 100
+	assert evaluate(r, "q (q (q (q (q (q (q r))))))").text == "(q' (q' (q' (q' (q' (q' (q' r')))))))"
+
+def test_length():
+	r = short_runner(display_length = 20)
+	assert evaluate(r, "1000 q r").text == "(q' (q' (q' (q' (q' …)))))"
+
+	# The answer is kept whole.
+	t = r.history[0]
+	assert lbn.print_node(t) == "(q' " * 1000 + "r'" + ")" * 1000
@@ -0,0 +1,114 @@
+import pytest
+
+import lamb_engine
+import lamb_engine.nodes.parallel as parallel
+from conftest import make_runner, evaluate
+
+
+# Every engine should give the same normal form for these.
+corpus = [
+	"NOT T",
+	"AND T F",
+	"XOR T T",
+	"S 3",
+	"ADD 2 3",
+	"MULT 2 3",
+	"D 4",
+	"Z 0",
+	"NZ 2",
+	"Y FAC 3",
+	"λa.(a (5 q r))",
+	"3 (λx.(x x)) q",
+	"λfx.(f (f x))",
+	"(λab.b) (M M) q",
+	"λa.(a (1000 q r))",
+	"PAIR 1 2 F"
+]
+
+# Engines that count reductions the same way as the tree engine.
+same_counts = ["debruijn"]
+engines = ["debruijn", "lazy", "nbe"]
+
+
+@pytest.fixture(scope = "module")
+def expected() -> dict:
+	r = make_runner("tree")
+	return {e: evaluate(r, e) for e in corpus}
+
+@pytest.mark.parametrize("engine", engines)
+@pytest.mark.parametrize("expr", corpus)
+def test_same_normal_form(expected, engine, expr):
+	r = make_runner(engine)
+	res = evaluate(r, expr)
+	want = expected[expr]
+
+	assert res.stop_reason == lamb_engine.StopReason.BETA_NORMAL
+	assert res.text == want.text
+	if engine in same_counts:
+		assert res.reductions == want.reductions
+	else:
+		assert res.reductions <= want.reductions
+
+@pytest.mark.parametrize("engine", ["tree"] + engines)
+def test_stops_at_limit(engine):
+	r = make_runner(engine, 200)
+	r.loop_detection = False
+	res = evaluate(r, "M M")
+	assert res.stop_reason == lamb_engine.StopReason.MAX_EXCEEDED
+	assert res.reductions == 200
+
+
+@pytest.fixture
+def workers(monkeypatch):
+	# Send every part to a worker, however small.
+	monkeypatch.setattr(parallel, "processes", 2)
+	monkeypatch.setattr(parallel, "local_steps", 0)
+	yield
+	parallel.stop_pool()
+
+def test_parallel_matches_debruijn(expected, workers):
+	# One runner, so the workers are started once.
+	r = make_runner("parallel")
+	for expr in corpus:
+		res = evaluate(r, expr)
+		want = expected[expr]
+		assert res.stop_reason == lamb_engine.StopReason.BETA_NORMAL
+		assert res.text == want.text
+		assert res.reductions == want.reductions
+	assert parallel.pool is not None
+
+def test_parallel_shares_limit(workers):
+	r = make_runner("parallel", 200)
+	res = evaluate(r, "q (M M) (M M) (M M)")
+	assert res.stop_reason == lamb_engine.StopReason.MAX_EXCEEDED
+	assert res.reductions == 200
+
+	# Stopping at the limit keeps the workers.
+	pool = parallel.pool
+	assert pool is not None
+	res = evaluate(r, "q (M M) (M M)")
+	assert res.reductions == 200
+	assert parallel.pool is pool
+	assert evaluate(r, "q (NOT T) (NOT F)").text == "((q' F) T)"
+	assert parallel.pool is pool
+
+def test_parallel_memory_limit_keeps_workers(workers):
+	r = make_runner("parallel", None) # type: ignore
+	r.memory_limit = 1
+	res = evaluate(r, "q (M M) (M M)")
+	assert res.stop_reason == lamb_engine.StopReason.MEMORY_EXCEEDED
+	assert parallel.pool is not None
+	assert parallel.pool_budget.value == 0 # type: ignore
+
+def test_parallel_recovers_from_interrupt(workers, monkeypatch):
+	r = make_runner("parallel", None) # type: ignore
+
+	def interrupt(self):
+		raise KeyboardInterrupt()
+	with monkeypatch.context() as m:
+		m.setattr(parallel.Reducer, "check_memory", interrupt)
+		res = evaluate(r, "q (M M) (M M)")
+	assert res.stop_reason == lamb_engine.StopReason.INTERRUPT
+	assert parallel.pool is None
+
+	assert evaluate(r, "q (NOT T) (NOT F)").text == "((q' F) T)"
@@ -0,0 +1,47 @@
+import pytest
+
+import lamb_engine.nodes as lbn
+import lamb_engine.nodes.debruijn as dbn
+from conftest import make_runner
+
+
+def test_folds_print_as_calls():
+	r = make_runner()
+	root = r.parse("3")[0]
+	lbn.expand(root, force_all = True)
+	assert root.left.left.left.kind == lbn.Kind.FOLD
+	assert str(root) == "λfa.(f (f (f a)))"
+	assert str(dbn.church(3)) == "λfa.(f (f (f a)))"
+
+def test_unfolded_terms_are_equal():
+	assert dbn.church(4) != dbn.church(4, unfold = True)
+	assert dbn.from_node(dbn.to_node(dbn.church(4)), unfold = True) == dbn.church(4, unfold = True)
+	f = dbn.church(4).body.body # type: ignore
+	assert f.unfold().arg == dbn.Fold(dbn.Var(1), dbn.Var(0), 3)
+
+@pytest.mark.parametrize("engine", ["debruijn", "lazy"])
+def test_big_numerals_stay_folded(engine):
+	# Only the parts reduction reaches are unfolded.
+	r = make_runner(engine)
+	root = r.parse("λb.(b (1000000000 q))")[0]
+	reducer = lbn.debruijn.Reducer(root) if engine == "debruijn" else lbn.lazy.Reducer(root)
+	steps = 0
+	while reducer.step() != lbn.ReductionType.NOTHING:
+		steps += 1
+	assert steps < 10
+
+	# λb.(b λa.(q (q ... a)))
+	t = reducer.state().body.arg.body # type: ignore
+	assert t.kind == dbn.FOLD
+	assert t.count == 1000000000 # type: ignore
+
+def test_tree_unfolds_as_it_goes():
+	r = make_runner()
+	root = r.parse("3 (λx.(x x)) q")[0]
+	reducer = lbn.Reducer(root)
+	reducer.step()
+	reducer.step()
+	assert any(n.kind == lbn.Kind.FOLD for _, n in root)
+	while reducer.step() != lbn.ReductionType.NOTHING:
+		pass
+	assert not any(n.kind == lbn.Kind.FOLD for _, n in root)
@@ -0,0 +1,106 @@
+import pytest
+
+import lamb_engine.nodes as lbn
+from lamb_engine.runner.history import Pending, ResultHistory, dependents, size
+from conftest import make_runner, evaluate
+
+
+def text(r, line: str) -> str:
+	return evaluate(r, line).text
+
+def consistent(h: ResultHistory) -> bool:
+	return h.nodes == sum(size(e) for e in h.entries)
+
+
+@pytest.mark.parametrize("engine", ["tree", "debruijn", "lazy", "nbe"])
+def test_dollar_after_redefinition(engine):
+	r = make_runner(engine)
+	r.run("A = λa.a", silent = True)
+	r.run("B = λx.(A x)", silent = True)
+	assert text(r, "q B") == "(q' B)"
+
+	# B uses A, so it's expanded with A's old body.
+	r.run("A = λa.(a a)", silent = True)
+	assert "A" not in {n.name for _, n in r.history[0] if n.kind == lbn.Kind.MACRO}
+	assert "B" not in {n.name for _, n in r.history[0] if n.kind == lbn.Kind.MACRO}
+	assert text(r, "$") == "(q' (λx.x))"
+	assert consistent(r.history)
+
+@pytest.mark.parametrize("engine", ["tree", "debruijn", "lazy", "nbe"])
+def test_dollar_after_mdel(engine):
+	r = make_runner(engine)
+	assert text(r, "q NOT") == "(q' NOT)"
+	r.run(":mdel NOT", silent = True)
+	assert "NOT" not in r.macro_table
+	assert text(r, "$") == "(q' (λa.((a F) T)))"
+	assert consistent(r.history)
+
+@pytest.mark.parametrize("engine", ["tree", "debruijn"])
+def test_dollar_after_stop(engine):
+	# A result that isn't normal is reduced when $ is used, wherever it is.
+	r = make_runner(engine, limit = 2)
+	evaluate(r, "q (NOT T)")
+	assert not r.history.is_normal(r.history[0])
+	r.reduction_limit = 100
+	assert text(r, "$") == "(q' F)"
+	assert r.history.is_normal(r.history[0])
+	assert text(r, "r $") == "(r' (q' F))"
+
+def test_budget_drops_old_entries():
+	r = make_runner("tree")
+	r.history.budget = 8
+	for v in "abcd":
+		evaluate(r, f"{v} NOT")
+	assert consistent(r.history)
+	assert r.history.nodes <= 8
+	assert len(r.history) < 4
+	assert text(r, "$") == "(d' NOT)"
+
+	# The newest result is kept, however big it is.
+	evaluate(r, "a b c d e f g h i j k l m")
+	assert len(r.history) == 1
+	assert consistent(r.history)
+
+def test_length_drops_old_entries():
+	h = ResultHistory(length = 3)
+	roots = [lbn.Root(lbn.FreeVar(f"x{i}")) for i in range(5)]
+	for root in roots:
+		h.add(root)
+	assert len(h) == 3
+	assert [h[i] for i in range(3)] == roots[:1:-1]
+	assert h[3] is None
+	assert consistent(h)
+
+	h.clear()
+	assert (len(h), h.nodes) == (0, 0)
+
+def test_pending():
+	r = make_runner("debruijn", limit = 5)
+	evaluate(r, "q ((λx.(x x x)) (λx.(x x x)))")
+	assert isinstance(r.history.entries[0], Pending)
+	assert consistent(r.history)
+
+	# It's built the first time it's read.
+	root = r.history[0]
+	assert isinstance(root, lbn.Root)
+	assert r.history[0] is root
+	assert consistent(r.history)
+
+def test_pending_frozen():
+	r = make_runner("debruijn", limit = 5)
+	evaluate(r, "(λa.(a ((λx.(x x x)) (λx.(x x x))))) NOT")
+	assert isinstance(r.history.entries[0], Pending)
+	r.run("NOT = λa.a", silent = True)
+	assert consistent(r.history)
+	assert "NOT" not in {n.name for _, n in r.history[0] if n.kind == lbn.Kind.MACRO}
+
+def test_dependents():
+	r = make_runner()
+	t = r.macro_templates
+	assert dependents(t, {"T"}, {"NOT"}) == {"T", "NOT"}
+	assert dependents(t, {"T"}, {"AND"}) == {"T"}
+	assert dependents(t, {"F"}, {"NOT", "AND", "M"}) == {"F", "NOT", "AND"}
+
+	# Macros that use them through others count too.
+	r.run("NAND = λab.(NOT (AND a b))", silent = True)
+	assert dependents(r.macro_templates, {"T"}, {"NAND"}) == {"T", "NOT", "NAND"}
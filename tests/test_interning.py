@@ -0,0 +1,48 @@
+import pytest
+
+import lamb_engine.nodes.debruijn as dbn
+from conftest import make_runner, evaluate
+
+
+def test_identical_subterms_are_shared():
+	i = dbn.Interner()
+	a = dbn.App(dbn.Lam(dbn.Var(0), "x"), dbn.Free("q"))
+	b = dbn.App(dbn.Lam(dbn.Var(0), "x"), dbn.Free("q"))
+	t = i.intern(dbn.App(a, b))
+	assert t.fn is t.arg # type: ignore
+	assert t == dbn.App(a, b)
+	assert i.intern(a) is t.fn # type: ignore
+
+def test_names_are_kept():
+	i = dbn.Interner()
+	a = i.intern(dbn.Lam(dbn.Var(0), "x"))
+	b = i.intern(dbn.Lam(dbn.Var(0), "y"))
+	assert a == b
+	assert a is not b
+	assert str(b) == "λy.y"
+
+def test_prune():
+	i = dbn.Interner()
+	keep = i.intern(dbn.Lam(dbn.App(dbn.Var(0), dbn.Var(0)), "x"))
+	i.intern(dbn.Lam(dbn.Free("q"), "x"))
+	i.prune(keep)
+	assert keep in i
+	assert keep.body in i # type: ignore
+	assert len(i) == 3
+
+@pytest.mark.parametrize("engine", ["debruijn", "lazy", "nbe"])
+@pytest.mark.parametrize("expr", ["Y FAC 3", "MULT 3 (ADD 2 2)", "λa.(a (5 q r))"])
+def test_same_results(engine, expr):
+	r = make_runner(engine)
+	plain = evaluate(r, expr)
+	r.hash_consing = True
+	shared = evaluate(r, expr)
+	assert shared.text == plain.text
+	assert shared.reductions == plain.reductions
+
+def test_command():
+	r = make_runner()
+	r.run(":intern yes")
+	assert r.hash_consing
+	r.run(":intern")
+	assert not r.hash_consing
@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+import lamb_engine
+import lamb_engine.nodes as lbn
+from lamb_engine.runner.history import Pending
+from conftest import make_runner, evaluate
+
+
+def test_fewer_reductions():
+	tree = evaluate(make_runner("tree"), "Y FAC 3")
+	lazy = evaluate(make_runner("lazy"), "Y FAC 3")
+	assert lazy.text == tree.text
+	assert lazy.reductions < tree.reductions
+
+def test_stops_at_limit_quickly():
+	# Reading this back used to unshare the whole argument,
+	# which took minutes.
+	r = make_runner("lazy", 100)
+	start = time.time()
+	res = evaluate(r, "((λc.(c 2) λb.(NOT b)) (((S S) 2) 3))")
+	assert res.stop_reason == lamb_engine.StopReason.MAX_EXCEEDED
+	assert time.time() - start < 10
+
+def test_readback_keeps_sharing():
+	# Each x is shared, so the result stands for 2^30 copies of q,
+	# which we could never build one at a time.
+	r = make_runner("lazy")
+	text = "λq.(" + "(λx.(x x)) (" * 30 + "q" + ")" * 31
+	reducer = lbn.lazy.Reducer(r.parse(text)[0])
+	while reducer.step() != lbn.ReductionType.NOTHING:
+		pass
+	t = reducer.state()
+	assert t.size > 2 ** 30
+	assert lbn.display.macros(t) == set()
+
+@pytest.mark.parametrize("engine", ["debruijn", "lazy", "nbe"])
+def test_unfinished_result_is_kept(engine):
+	# Results we don't show are only built when $ uses them,
+	# but they must still be saved.
+	r = make_runner(engine, 50)
+	r.loop_detection = False
+	evaluate(r, "NOT T")
+	res = evaluate(r, "Y (λx.x)")
+	assert res.stop_reason == lamb_engine.StopReason.MAX_EXCEEDED
+	assert res.node is None
+	assert isinstance(r.history.entries[0], Pending)
+
+	res = evaluate(r, "$")
+	assert res.stop_reason == lamb_engine.StopReason.MAX_EXCEEDED
+	assert len(r.history) == 3
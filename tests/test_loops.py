@@ -0,0 +1,43 @@
+import pytest
+
+import lamb_engine
+from conftest import make_runner, evaluate, output
+
+
+@pytest.mark.parametrize("engine", ["tree", "debruijn", "lazy"])
+@pytest.mark.parametrize("expr", ["M M", "W W", "Y (λx.x)", "(λxy.(x x y)) (λxy.(x x y)) q"])
+def test_loops_are_found(engine, expr):
+	r = make_runner(engine, 1000)
+	res = evaluate(r, expr)
+	assert res.stop_reason == lamb_engine.StopReason.LOOP_DETECTED
+	assert res.loop_length == 2
+	assert res.reductions < 20
+
+@pytest.mark.parametrize("engine", ["tree", "debruijn", "lazy"])
+def test_growing_terms_are_not_loops(engine):
+	r = make_runner(engine, 300)
+	res = evaluate(r, "(λx.(x x x)) (λx.(x x x))")
+	assert res.stop_reason == lamb_engine.StopReason.MAX_EXCEEDED
+
+def test_disabled():
+	r = make_runner("tree", 300)
+	r.run(":loops no")
+	assert not r.loop_detection
+	res = evaluate(r, "M M")
+	assert res.stop_reason == lamb_engine.StopReason.MAX_EXCEEDED
+	assert res.reductions == 300
+
+@pytest.mark.parametrize("engine", ["nbe", "parallel"])
+def test_engines_without_loop_detection(engine):
+	# These ignore loop detection, which is on by default,
+	# so they only say so when it's turned on.
+	r = make_runner(engine, 300)
+	with output() as out:
+		res = evaluate(r, "M M")
+	assert res.stop_reason == lamb_engine.StopReason.MAX_EXCEEDED
+	assert out.getvalue() == ""
+
+	r.run(":loops no")
+	with output() as out:
+		r.run(":loops yes")
+	assert "can't detect loops" in out.getvalue()
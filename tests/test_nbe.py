@@ -0,0 +1,29 @@
+import pytest
+
+import lamb_engine
+from conftest import make_runner, evaluate
+
+
+def test_fewer_reductions():
+	tree = evaluate(make_runner("tree"), "Y FAC 3")
+	nbe = evaluate(make_runner("nbe"), "Y FAC 3")
+	assert nbe.text == tree.text
+	assert nbe.reductions < tree.reductions
+
+@pytest.mark.parametrize("expr", [
+	"M M",
+	"(λx.(x x x)) (λx.(x x x))",
+	"Y (λx.x)"
+])
+def test_divergent_terms_reach_limit(expr):
+	# These used to run out of stack before the limit.
+	r = make_runner("nbe", 20000)
+	res = evaluate(r, expr)
+	assert res.stop_reason == lamb_engine.StopReason.MAX_EXCEEDED
+	assert res.reductions == 20000
+
+def test_deep_result():
+	r = make_runner("nbe")
+	res = evaluate(r, "λa.(a (3000 q r))")
+	assert res.stop_reason == lamb_engine.StopReason.BETA_NORMAL
+	assert res.text.count("q'") == 3000
@@ -0,0 +1,50 @@
+import pytest
+
+import lamb_engine.nodes as lbn
+from conftest import make_runner
+
+
+def measure(n: lbn.Node) -> int:
+	"""
+	Count the nodes under `n`, and every call its folds stand for.
+	"""
+	if n.kind >= lbn.Kind.END:
+		return 1
+	if n.kind == lbn.Kind.FUNC or n.kind == lbn.Kind.ROOT:
+		return 1 + measure(n.left)
+	if n.kind == lbn.Kind.FOLD:
+		return n.count * (1 + measure(n.left)) + measure(n.right) # type: ignore
+	return 1 + measure(n.left) + measure(n.right)
+
+def test_nodes_have_no_dict():
+	nodes = [
+		lbn.Root(lbn.FreeVar("a")),
+		lbn.Func(lbn.Bound("a"), lbn.FreeVar("b")),
+		lbn.Call(lbn.FreeVar("a"), lbn.FreeVar("b")),
+		lbn.Fold(lbn.FreeVar("a"), lbn.FreeVar("b"), 3),
+		lbn.Macro("A"),
+		lbn.Church(2),
+		lbn.History()
+	]
+	for n in nodes:
+		assert not hasattr(n, "__dict__")
+
+def test_kind_order():
+	K = lbn.Kind
+	for cls in (lbn.Bound, lbn.FreeVar, lbn.Macro, lbn.Church, lbn.History):
+		assert cls.kind >= K.END
+	for cls in (lbn.Macro, lbn.Church, lbn.History):
+		assert cls.kind >= K.EXPANDABLE
+	for cls in (lbn.Root, lbn.Func, lbn.Call, lbn.Fold):
+		assert cls.kind < K.END
+
+@pytest.mark.parametrize("expr", ["λab.(a (b a))", "NOT (AND T F) q", "3 q r"])
+def test_sizes(expr):
+	r = make_runner()
+	root = r.parse(expr)[0]
+	lbn.expand(root, force_all = True)
+	assert root.size == measure(root)
+
+	c = lbn.clone(root.left)
+	assert c.size == root.left.size
+	assert str(c) == str(root.left)
@@ -0,0 +1,107 @@
+import pytest
+import pyparsing as pp
+
+import lamb_engine
+from conftest import macros_file
+
+
+class Tree:
+	"""
+	What our actions build, so we can compare
+	the trees both parsers make.
+	"""
+
+	def __init__(self, kind: str, args):
+		self.kind = kind
+		self.args = plain(args)
+
+	def __eq__(self, other):
+		return (self.kind, self.args) == (other.kind, other.args)
+
+	def __repr__(self):
+		return f"<{self.kind} {self.args!r}>"
+
+def plain(x):
+	if isinstance(x, (list, pp.ParseResults)):
+		return [plain(i) for i in x]
+	return x
+
+def tag(kind: str):
+	return lambda result: Tree(kind, result)
+
+def parsers():
+	p = lamb_engine.parser.LambdaParser(
+		action_command = tag("command"),
+		action_macro_def = tag("macro_def"),
+		action_church = tag("church"),
+		action_func = tag("func"),
+		action_bound = tag("bound"),
+		action_macro = tag("macro"),
+		action_call = tag("call"),
+		action_history = tag("history")
+	)
+	return p, p.reference()
+
+def parse(p, line: str):
+	try:
+		return p.parse_line(line)
+	except pp.ParseException as x:
+		return ("error", x.loc)
+
+with open(macros_file, "r") as f:
+	macro_lines = [l.strip() for l in f if l.strip() and not l.strip().startswith("#")]
+
+corpus = [
+	# Names and numerals
+	"a", "T", "FAC", "a_b", "aB", "ab", "a₁", "a₁₂ b₀", "x₀y", "0", "123", "12ab",
+
+	# Functions and calls
+	"λa.a", "\\a.a", "λab.(a b)", "λa b . a", "λa.λb.a", "λa.a b c",
+	"λa.(λb.b) a", "a b", "a b c d", "NOT T", "ADD 2 3",
+	"(a)", "((a))", "((a b))", "(a b) (c d)", "a (b (c (d e)))",
+	"(λa.a) (λb.b)", "λa.(a)", "( a  b )", "\ta b",
+
+	# History
+	"$", "($)", "(($))", "$ a", "a $", "$ $", "λa.$", "λa.($)", "λa.a $", "($ a)",
+
+	# Definitions and commands
+	"X = a", "X = λa.a", "X=a b", "X = $", "X = ($)", "X = $ a", "X = 3",
+	"ab = a", ":load macros.lamb", ":rlimit none", ": rlimit 5",
+	":step", ":save --binary a.lamb",
+
+	# Bad input
+	"", "(", ")", "a)", "(a", "()", "( )", "λ.a", "λa a", "λa.", "λA.a",
+	"λa.)", "X =", "X = ", "a = b = c", "X = λ", ":", ":1", "a ( b",
+	"a.b", "$$", "λ", "a $ (", "(a b c", "((a)", "Ab = λa.(a"
+]
+
+long_lines = [
+	"a " * 300,
+	"(" * 40 + "a" + ")" * 40,
+	"λa." * 40 + "a",
+	"(λa." * 20 + "a" + ")" * 20,
+	"(" * 40 + "a" + ")" * 39,
+	"(a " * 40 + "b" + ")" * 40
+]
+
+
+@pytest.mark.parametrize("line", macro_lines + corpus + long_lines, ids = lambda l: repr(l[:40]))
+def test_same_as_reference(line):
+	p, ref = parsers()
+	assert parse(p, line) == parse(ref, line)
+
+def test_deep_lines():
+	# These are too deep for the reference parser.
+	p, _ = parsers()
+	depth = 20000
+
+	t = p.parse_line("(" * depth + "a b" + ")" * depth)
+	assert t == Tree("call", [Tree("bound", ["a"]), Tree("bound", ["b"])])
+
+	t = p.parse_line("λa." * depth + "a")
+	for _ in range(depth):
+		assert t.kind == "func"
+		t = t.args[1]
+	assert t == Tree("bound", ["a"])
+
+	assert parse(p, "(" * depth + "a" + ")" * (depth - 1)) == ("error", 2 * depth)
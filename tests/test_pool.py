@@ -0,0 +1,71 @@
+import io
+import pytest
+
+import lamb_engine
+from conftest import macros_file
+
+
+setup = [f":load --quiet {macros_file}", "ID = λa.a"]
+
+def test_ordered():
+	lines = [f"ID {i}" for i in range(30)]
+	with lamb_engine.pool.RunnerPool(2, setup = setup) as p:
+		out = list(p.run(lines))
+	assert [i["index"] for i in out] == list(range(30))
+	assert [i["input"] for i in out] == lines
+	assert out[3]["result"] == "3"
+
+def test_unordered():
+	lines = ["Y FAC 3", "NOT T", "AND T F"] * 5
+	with lamb_engine.pool.RunnerPool(2, setup = setup) as p:
+		out = list(p.run(lines, ordered = False, chunksize = 2))
+	assert sorted(i["index"] for i in out) == list(range(15))
+	for i in out:
+		assert i["input"] == lines[i["index"]]
+		assert i["stop_reason"] == "beta_normal"
+
+def test_workers_keep_macros():
+	# Every job, in every worker, sees the macros from setup.
+	with lamb_engine.pool.RunnerPool(2, setup = setup) as p:
+		out = list(p.run(["ID = λa.(a a)", "ID q"] * 10))
+	for i in out[0::2]:
+		assert i["error"] == "Only expressions can be run here."
+	for i in out[1::2]:
+		assert i["result"] == "q'"
+
+def test_errors_dont_stop_pool():
+	jobs = [
+		"λ.a",
+		lamb_engine.pool.Job("(λx.(x x x)) (λx.(x x x))", reduction_limit = 50),
+		lamb_engine.pool.Job("(λx.(x x x)) (λx.(x x x))", reduction_limit = 10 ** 9, timeout = 0.2),
+		"NOT T"
+	]
+	with lamb_engine.pool.RunnerPool(1, setup = setup) as p:
+		out = list(p.run(jobs))
+		assert out[0]["error"] == "Syntax error at char 1."
+		assert out[1]["stop_reason"] == "max_exceeded"
+		assert out[1]["reductions"] == 50
+		assert out[2]["stop_reason"] == "timeout"
+		assert out[3]["result"] == "F"
+
+		# The same worker goes on.
+		assert [i["result"] for i in p.run(["NOT F"])] == ["T"]
+
+def test_run_pool():
+	files = [("t.lamb", ["ID q", "X = T", "NOT X"])]
+	out = io.StringIO()
+	assert lamb_engine.batch.run_pool(files, out, processes = 1, setup = setup) == 0
+	assert out.getvalue() == "q'\nF\n"
+
+def test_run_pool_refuses_changes():
+	# These give different results than they would in order.
+	for lines in [
+		["X = 1", "X", "X = 2", "X"],
+		["X", "X = 1"],
+		["ID q", "ID = λa.(a a)"],
+		["X = 1", "X", ":strategy whnf"]
+	]:
+		out = io.StringIO()
+		with pytest.raises(ValueError):
+			lamb_engine.batch.run_pool([("t.lamb", lines)], out, processes = 1, setup = setup)
+		assert out.getvalue() == ""
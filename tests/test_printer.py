@@ -0,0 +1,175 @@
+import pytest
+
+import lamb_engine
+import lamb_engine.nodes as lbn
+from conftest import make_runner, evaluate, output
+
+
+def old_print_node(node: lbn.Node, *, export: bool = False) -> str:
+	"""
+	print_node() as it was before write_node(), to compare with.
+	"""
+	K = lbn.Kind
+	out = ""
+	bound_subs = {}
+	fold_starts = []
+
+	for s, n in node:
+		k = n.kind
+		if k >= K.END:
+			if k == K.BOUND:
+				out += bound_subs[n.identifier]
+			else:
+				out += n.print_value(export = export)
+
+		elif k == K.FUNC:
+			parent_kind = None if (n.parent is None) or (n is node) else n.parent.kind
+
+			if s == lbn.Direction.UP:
+				o = n.input.print_value(export = export)
+				if o in bound_subs.values():
+					i = -1
+					p = o
+					while o in bound_subs.values():
+						o = p + lamb_engine.utils.subscript(i := i + 1)
+				bound_subs[n.input.identifier] = o
+
+				if (parent_kind == K.CALL) or (parent_kind == K.FOLD):
+					out += "("
+				if parent_kind != K.FUNC:
+					out += "λ"
+				out += o
+				if n.left.kind != K.FUNC:
+					out += "."
+
+			elif s == lbn.Direction.LEFT:
+				if (parent_kind == K.CALL) or (parent_kind == K.FOLD):
+					out += ")"
+				del bound_subs[n.input.identifier]
+
+		elif k == K.CALL:
+			if s == lbn.Direction.UP:
+				out += "("
+			elif s == lbn.Direction.LEFT:
+				out += " "
+			elif s == lbn.Direction.RIGHT:
+				out += ")"
+
+		elif k == K.FOLD:
+			if s == lbn.Direction.UP:
+				out += "("
+				fold_starts.append(len(out))
+			elif s == lbn.Direction.LEFT:
+				fn = out[fold_starts.pop():]
+				out += " " + ("(" + fn + " ") * (n.count - 1)
+			elif s == lbn.Direction.RIGHT:
+				out += ")" * n.count
+
+	return out
+
+
+def func(name: str, body) -> lbn.Func:
+	"""
+	Make λname.body, where body is a function of our input.
+	"""
+	b = lbn.Bound(name)
+	return lbn.Func(b, body(lambda: lbn.Bound(name, forced_id = b.identifier)))
+
+def call(*nodes) -> lbn.Node:
+	return lbn.Call.from_parse(nodes)
+
+# Bound variables with names that clash.
+# The parser doesn't allow these, but reduction makes them.
+clashes = [
+	func("a", lambda a: func("a", lambda b: call(a(), b()))),
+	func("a", lambda a:
+		func("a", lambda b:
+			func("a", lambda c:
+				func("a", lambda d:
+					func("a", lambda e:
+						func("a", lambda f: call(a(), c(), f(), e(), func("a", lambda g: call(g(), b())))))))
+		)
+	),
+	func("a₀", lambda a: func("a", lambda b: func("a", lambda c: func("a", lambda d: call(a(), b(), c(), d()))))),
+	func("a", lambda a: call(
+		func("a", lambda b: func("a", lambda c: func("a", lambda d: func("a", lambda e: call(a(), e()))))),
+		func("a", lambda b: func("a₁", lambda c: func("a", lambda d: call(b(), c(), d()))))
+	)),
+	call(func("a", lambda a: func("a", lambda b: b())), lbn.Church(5), func("a", lambda a: a()))
+]
+
+def trees() -> list:
+	r = make_runner()
+	out = [lbn.Root(c) for c in clashes]
+	for name, m in r.macro_table.items():
+		root = r.parse(name)[0]
+		lbn.expand(root, force_all = True)
+		out.append(root)
+	for e in ["Y FAC 3", "λa.(a (4 q r))", "3 (λx.(x x)) q", "(λab.(a (a b))) (λab.(a b))"]:
+		out.append(r.parse(e)[0])
+		out.append(evaluate(r, e).node)
+	return out
+
+def test_same_as_old_printer():
+	for t in trees():
+		for export in (False, True):
+			pieces = []
+			lbn.write_node(t, pieces.append, export = export)
+			assert "".join(pieces) == old_print_node(t, export = export)
+			assert lbn.print_node(t, export = export) == "".join(pieces)
+
+def test_clashes():
+	assert lbn.print_node(clashes[0]) == "λaa₀.(a a₀)"
+
+	# Subscripts are in base 4.
+	t = lbn.FreeVar("q")
+	for _ in range(100):
+		t = func("a", lambda a, t = t: call(a(), t))
+	out = lbn.print_node(t)
+	assert out == old_print_node(t)
+	assert "a₁₂₃" in out
+
+@pytest.mark.parametrize("length", [1, 5, 12, 30])
+def test_length(length):
+	r = make_runner()
+	t = evaluate(r, "λa.(a (6 q r))").node
+	full = lbn.print_node(t)
+
+	pieces = []
+	names = lbn.Names()
+	lbn.write_node(t, pieces.append, length = length, names = names)
+	out = "".join(pieces)
+
+	head = out[:out.index(lbn.display.elided)].rstrip(" ")
+	assert full.startswith(head)
+	# The last piece we wrote may have been a space.
+	assert length - 1 <= len(head) < length + 4
+	assert out[len(head):].strip(" )") == lbn.display.elided
+	assert out.count("(") == out.count(")")
+	assert not names.used
+
+	pieces = []
+	lbn.write_node(t, pieces.append, length = len(full) + 1)
+	assert "".join(pieces) == full
+
+def test_names():
+	n = lbn.Names()
+	assert [n.take("a") for _ in range(6)] == ["a", "a₀", "a₁", "a₂", "a₃", "a₁₀"]
+	n.free("a₁")
+	n.free("a")
+	assert n.take("a") == "a"
+	assert n.take("a") == "a₁"
+	assert n.take("a") == "a₁₁"
+
+def test_out(tmp_path):
+	r = make_runner()
+	path = tmp_path / "out.lamb"
+	with output() as out:
+		r.run(f":out {path}")
+	assert "no result" in out.getvalue()
+
+	res = evaluate(r, "λa.(a (3 q r) PAIR)")
+	with output():
+		r.run(f":out {path}")
+	assert path.read_text() == old_print_node(r.history[0], export = True) + "\n"
+	assert path.read_text() == res.text + "\n"
@@ -0,0 +1,52 @@
+import pytest
+
+import lamb_engine.nodes as lbn
+from conftest import make_runner
+
+
+corpus = [
+	"NOT T",
+	"AND T F",
+	"XOR T T",
+	"S 3",
+	"ADD 2 3",
+	"MULT 2 3",
+	"D 4",
+	"Z 0",
+	"NZ 2",
+	"Y FAC 3",
+	"λa.(a (5 q r))",
+	"3 (λx.(x x)) q",
+	"(λab.b) (M M) q",
+	"PAIR 1 2 F"
+]
+
+
+def steps(root: lbn.Root, step) -> list:
+	out = []
+	while (r := step()) != lbn.ReductionType.NOTHING:
+		out.append(r)
+	return out
+
+@pytest.mark.parametrize("expr", corpus)
+def test_resumed_search_matches_full_search(expr):
+	# A Reducer keeps its place between steps,
+	# lbn.reduce() searches from the root every time.
+	r = make_runner()
+	a = r.parse(expr)[0]
+	b = r.parse(expr)[0]
+
+	reducer = lbn.Reducer(a)
+	resumed = steps(a, reducer.step)
+	searched = steps(b, lambda: lbn.reduce(b)[0])
+
+	assert resumed == searched
+	assert str(a) == str(b)
+
+def test_reducer_stays_done():
+	r = make_runner()
+	root = r.parse("NOT T")[0]
+	reducer = lbn.Reducer(root)
+	steps(root, reducer.step)
+	assert reducer.step() == lbn.ReductionType.NOTHING
+	assert str(root) == "F"
@@ -0,0 +1,158 @@
+import asyncio
+import json
+
+import lamb_engine
+from conftest import macros_file
+
+
+class Client:
+	"""
+	Talks to a server over an in-process pair of streams,
+	like serve_stdio() does over standard input and output.
+	"""
+
+	def __init__(self, server: lamb_engine.server.Server):
+		self.lines = asyncio.Queue()
+		self.replies = asyncio.Queue()
+		self.task = asyncio.get_running_loop().create_task(
+			server.serve(self.lines.get, self.write)
+		)
+
+	def write(self, data: bytes):
+		assert data.endswith(b"\n")
+		self.replies.put_nowait(json.loads(data))
+
+	def send_line(self, line: bytes):
+		self.lines.put_nowait(line)
+
+	def send(self, request_id, method: str, **params):
+		self.send_line(json.dumps({
+			"jsonrpc": "2.0", "id": request_id,
+			"method": method, "params": params
+		}).encode("utf-8") + b"\n")
+
+	async def reply(self) -> dict:
+		return await asyncio.wait_for(self.replies.get(), 10)
+
+	async def call(self, method: str, **params):
+		self.send(0, method, **params)
+		r = await self.reply()
+		assert r["id"] == 0
+		return r.get("result", r.get("error"))
+
+	async def close(self):
+		self.send_line(b"")
+		await asyncio.wait_for(self.task, 10)
+
+def run(test):
+	"""
+	Run a test coroutine with a client of a new server.
+	"""
+	async def main():
+		server = lamb_engine.server.Server(1, setup = [f":load --quiet {macros_file}"])
+		server.start()
+		try:
+			client = Client(server)
+			await test(client)
+			await client.close()
+		finally:
+			server.close()
+	asyncio.run(main())
+
+
+def test_session():
+	async def test(c: Client):
+		s = (await c.call("create_session"))["session"]
+
+		assert await c.call("define", session = s, name = "ID", expression = "λa.a") == {
+			"name": "ID", "expression": "λa.a"
+		}
+		assert (await c.call("macros", session = s))["ID"] == "λa.a"
+		assert await c.call("command", session = s, command = ":strategy whnf") is True
+
+		r = await c.call("evaluate", session = s, expression = "ID (NOT T)")
+		assert r["result"] == "F"
+		assert r["stop_reason"] == "weak_head_normal"
+
+		r = await c.call("evaluate", session = s, expression = "M M", reduction_limit = 10)
+		assert r["stop_reason"] == "loop_detected"
+
+		# Sessions don't share macros.
+		t = (await c.call("create_session"))["session"]
+		assert "ID" not in await c.call("macros", session = t)
+
+		assert await c.call("close_session", session = s) is True
+		assert (await c.call("macros", session = s))["code"] == lamb_engine.server.INVALID_PARAMS
+	run(test)
+
+def test_cancel():
+	async def test(c: Client):
+		s = (await c.call("create_session"))["session"]
+
+		# This grows forever, so it isn't a loop.
+		c.send(1, "evaluate", session = s, expression = "(λx.(x x x)) (λx.(x x x))")
+		c.send(2, "evaluate", session = s, expression = "NOT T")
+		await asyncio.sleep(0.5)
+
+		# The second one is still waiting.
+		c.send(3, "cancel", id = 2)
+		c.send(4, "cancel", id = 1)
+		c.send(5, "cancel", id = 99)
+		replies = {}
+		for _ in range(5):
+			r = await c.reply()
+			replies[r["id"]] = r
+
+		assert replies[1]["result"]["stop_reason"] == "interrupt"
+		assert replies[1]["result"]["reductions"] > 0
+		assert replies[2]["error"]["code"] == lamb_engine.server.REQUEST_CANCELLED
+		assert replies[3]["result"] is True
+		assert replies[4]["result"] is True
+		assert replies[5]["result"] is False
+
+		# The session still works.
+		assert (await c.call("evaluate", session = s, expression = "NOT T"))["result"] == "F"
+	run(test)
+
+def test_bad_requests():
+	async def test(c: Client):
+		c.send_line(b"{not json\n")
+		r = await c.reply()
+		assert r["id"] is None
+		assert r["error"]["code"] == lamb_engine.server.PARSE_ERROR
+
+		c.send_line(b'{"jsonrpc": "1.0", "id": 1, "method": "macros"}\n')
+		r = await c.reply()
+		assert r["error"]["code"] == lamb_engine.server.INVALID_REQUEST
+
+		c.send_line(b'[1, 2]\n')
+		r = await c.reply()
+		assert r["error"]["code"] == lamb_engine.server.INVALID_REQUEST
+
+		r = await c.call("nope")
+		assert r["code"] == lamb_engine.server.METHOD_NOT_FOUND
+		r = await c.call("evaluate", session = 12345, expression = "a")
+		assert r["code"] == lamb_engine.server.INVALID_PARAMS
+		assert r["message"] == "Unknown session 12345."
+		r = await c.call("evaluate", session = "a", expression = "a")
+		assert r["code"] == lamb_engine.server.INVALID_PARAMS
+
+		s = (await c.call("create_session"))["session"]
+		r = await c.call("evaluate", session = s, expression = "λ.a")
+		assert r["code"] == lamb_engine.server.LAMB_ERROR
+		r = await c.call("evaluate", session = s, expression = "A = a")
+		assert r["code"] == lamb_engine.server.LAMB_ERROR
+		r = await c.call("define", session = s, name = "a b", expression = "a")
+		assert r["code"] in (lamb_engine.server.LAMB_ERROR, lamb_engine.server.INVALID_PARAMS)
+		r = await c.call("command", session = s, command = "load /nonexistent")
+		assert r["code"] == lamb_engine.server.LAMB_ERROR
+		assert r["message"] == "Command :load failed."
+
+		# Notifications get no answer.
+		c.send_line(b'{"jsonrpc": "2.0", "method": "macros", "params": {"session": 1}}\n')
+		assert (await c.call("evaluate", session = s, expression = "NOT F"))["result"] == "T"
+		assert c.replies.empty()
+	run(test)
+
+def test_failed_load():
+	assert lamb_engine.server.main(["--load", "/nonexistent"]) == 2
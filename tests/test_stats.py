@@ -0,0 +1,81 @@
+import pytest
+
+import lamb_engine.nodes as lbn
+from lamb_engine.nodes import stats
+from conftest import make_runner, evaluate
+
+
+@pytest.fixture
+def counting():
+	stats.reset()
+	stats.enable()
+	yield
+	stats.disable()
+	stats.reset()
+
+def replaced() -> list:
+	# Everything enable() may replace, as it is now.
+	return [
+		lbn.Node.__dict__["__init__"],
+		lbn.Node.go_left, lbn.Node.go_right, lbn.Node.go_up,
+		lbn.Macro.expand, lbn.Church.expand, lbn.History.expand,
+		lbn.debruijn.Reducer.expand_macro
+	] + [
+		getattr(owner, name)
+		for owner in (lbn, lbn.functions)
+		for name in ("clone", "call_func", "write_node")
+	]
+
+def test_disable_restores_originals():
+	before = replaced()
+	stats.enable()
+	try:
+		during = replaced()
+		assert all(a is not b for a, b in zip(before, during))
+
+		# Turning them on twice doesn't wrap anything twice.
+		stats.enable()
+		assert all(a is b for a, b in zip(during, replaced()))
+	finally:
+		stats.disable()
+	assert all(a is b for a, b in zip(before, replaced()))
+	assert stats.patched == []
+
+def test_nothing_is_counted_while_off():
+	stats.reset()
+	r = make_runner()
+	evaluate(r, "Y FAC 2")
+	assert stats.totals.to_dict() == stats.Stats().to_dict()
+
+def counts(s: stats.Stats) -> dict:
+	d = s.to_dict()
+	del d["time"]
+	return d
+
+def test_evaluations_are_differences(counting):
+	r = make_runner()
+	results = []
+	for line in ["NOT T", "Y FAC 2", "MULT 2 3"]:
+		root = r.parse(line)[0]
+		before = stats.totals.copy()
+		results.append(r.evaluate(root))
+		assert counts(results[-1].stats) == counts(stats.totals - before)
+		assert r.last_stats is results[-1].stats
+
+	fac = results[1].stats
+	assert fac.nodes_allocated > 0
+	assert fac.clone_calls > 0
+	assert fac.macro_expansions["FAC"] > 0
+	assert "FAC" not in results[2].stats.macro_expansions
+
+def test_reducer_moves_are_counted(counting):
+	r = make_runner()
+	root = r.parse("NOT (AND T F)")[0]
+	lbn.prepare(root)
+	reducer = lbn.Reducer(root)
+
+	stats.reset()
+	while reducer.step() != lbn.ReductionType.NOTHING:
+		pass
+	assert stats.totals.walker_steps > 0
+	assert stats.totals.walker_steps >= root.left.size
@@ -0,0 +1,84 @@
+import pytest
+
+import lamb_engine.nodes as lbn
+import lamb_engine.runner.runner
+from conftest import make_runner, evaluate, output
+
+
+expr = "λz.(z (NOT T) (λabcdefg.(g f e d c b a)))"
+
+steps = [
+	"M:001 λz.((… ([NOT → λa.((a F) T)] …)) …)",
+	"F:002 λz.((… [((λa.((a F) T)) T) → ((T F) T)]) …)",
+	"M:003 λz.((… ([T → λab.a] …)) …)",
+	"F:004 λz.((… ([((λab.a) F) → λb.F] …)) …)",
+	"F:005 λz.((… [((λb.F) T) → F]) …)",
+]
+
+@pytest.fixture
+def prompts(monkeypatch) -> list:
+	# Every step prompt, as text. Enter is pressed at each one.
+	out = []
+	def prompt(message, **kwargs):
+		out.append("".join(t for _, t in message))
+		return ""
+	monkeypatch.setattr(lamb_engine.runner.runner, "prompt", prompt)
+	return out
+
+def stepped(engine: str, text: str, **settings):
+	r = make_runner(engine)
+	r.interactive = True
+	r.step_reduction = True
+	for k, v in settings.items():
+		setattr(r, k, v)
+	with output():
+		return evaluate(r, text)
+
+@pytest.mark.parametrize("engine", ["tree", "debruijn", "lazy"])
+def test_steps(engine, prompts):
+	result = stepped(engine, expr)
+	assert prompts == steps
+	assert result.text == evaluate(make_runner(engine), expr).text
+
+def test_only_changes_are_written(prompts, monkeypatch):
+	# Everything write_node() printed since the last prompt.
+	written = []
+	write_node = lbn.functions.write_node
+	def spy(node, *args, **kwargs):
+		written.append(node)
+		return write_node(node, *args, **kwargs)
+	monkeypatch.setattr(lbn.functions, "write_node", spy)
+
+	def binders(node) -> set:
+		return {n.input.print_value() for _, n in node if n.kind == lbn.Kind.FUNC}
+
+	seen = []
+	prompt = lamb_engine.runner.runner.prompt
+	def checking_prompt(message, **kwargs):
+		seen.append(set().union(*(binders(n) for n in written)))
+		written.clear()
+		return prompt(message, **kwargs)
+	monkeypatch.setattr(lamb_engine.runner.runner, "prompt", checking_prompt)
+
+	stepped("tree", expr)
+	assert prompts == steps
+
+	# Neither λz nor λabcdefg is ever printed, only the redexes.
+	assert len(seen) == len(steps)
+	assert all(b <= {"a", "b"} for b in seen)
+
+@pytest.mark.parametrize("engine", ["tree", "debruijn", "lazy"])
+@pytest.mark.parametrize("text", [
+	"MULT 2 3",
+	"λab.(AND (NOT a) (OR b F))",
+	"(λfx.(f (f x))) (λy.(y y))",
+	"PAIR (NOT T) (ADD 1 1)",
+])
+def test_result_is_unchanged(engine, text, prompts):
+	full = evaluate(make_runner(engine), text).text
+
+	# Short steps don't cut the result off.
+	result = stepped(engine, text, display_length = 5, display_depth = 2)
+	assert result.text == full
+	assert len(prompts) == result.reductions
+	assert all(p.count("→") == 1 for p in prompts)
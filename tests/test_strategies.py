@@ -0,0 +1,85 @@
+import pytest
+
+import lamb_engine
+from conftest import make_runner, evaluate, output
+
+
+S = lamb_engine.StopReason
+
+# Each strategy, an expression, and what it should reduce to.
+known = [
+	("applicative", "(λa.(a a)) ((λb.b) q)", "(q' q')", S.BETA_NORMAL),
+	("applicative", "λa.((λb.b) a)", "λa.a", S.BETA_NORMAL),
+	("applicative", "(λa.a) (λb.((λc.c) b))", "λb.b", S.BETA_NORMAL),
+	("cbv", "(λa.(a a)) ((λb.b) q)", "(q' q')", S.WEAK_NORMAL),
+	("cbv", "λa.((λb.b) a)", "λa.((λb.b) a)", S.WEAK_NORMAL),
+	("cbv", "(λa.a) (λb.((λc.c) b))", "λb.((λc.c) b)", S.WEAK_NORMAL),
+	("cbv", "q ((λa.a) r)", "(q' r')", S.WEAK_NORMAL),
+	("head", "(λab.b) (M M) x", "x'", S.HEAD_NORMAL),
+	("head", "λa.((λb.b) a)", "λa.a", S.HEAD_NORMAL),
+	("head", "q ((λa.a) r)", "(q' ((λa.a) r'))", S.HEAD_NORMAL),
+	("head", "(λa.(a a)) ((λb.b) q)", "(q' ((λb.b) q'))", S.HEAD_NORMAL),
+	("whnf", "(λab.b) (M M) x", "x'", S.WEAK_HEAD_NORMAL),
+	("whnf", "λa.((λb.b) a)", "λa.((λb.b) a)", S.WEAK_HEAD_NORMAL),
+	("whnf", "q ((λa.a) r)", "(q' ((λa.a) r'))", S.WEAK_HEAD_NORMAL),
+	("whnf", "MULT 2 3", "λf.(2 (3 f))", S.WEAK_HEAD_NORMAL)
+]
+
+# These have a β-normal form that applicative order finds too.
+corpus = ["NOT T", "AND T F", "XOR T T", "S 3", "ADD 2 3", "MULT 2 3", "D 4", "Z 0", "PAIR 1 2 F"]
+
+
+@pytest.mark.parametrize("strategy, expr, text, stop_reason", known)
+def test_known_results(strategy, expr, text, stop_reason):
+	r = make_runner(limit = 300)
+	r.strategy = strategy
+	res = evaluate(r, expr)
+	assert res.stop_reason == stop_reason
+	assert res.text == text
+	assert res.strategy == strategy
+
+@pytest.mark.parametrize("strategy", ["applicative", "cbv"])
+def test_strict_strategies_diverge(strategy):
+	r = make_runner(limit = 300)
+	r.strategy = strategy
+	r.loop_detection = False
+	res = evaluate(r, "(λab.b) (M M) x")
+	assert res.stop_reason == S.MAX_EXCEEDED
+	assert res.reductions == 300
+
+@pytest.mark.parametrize("expr", corpus)
+def test_applicative_finds_normal_form(expr):
+	r = make_runner()
+	want = evaluate(r, expr).text
+	r.strategy = "applicative"
+	assert evaluate(r, expr).text == want
+
+@pytest.mark.parametrize("strategy, stop_reason", [
+	("normal", S.BETA_NORMAL),
+	("applicative", S.BETA_NORMAL),
+	("cbv", S.WEAK_NORMAL),
+	("head", S.HEAD_NORMAL),
+	("whnf", S.WEAK_HEAD_NORMAL)
+])
+def test_strategy_command(strategy, stop_reason):
+	r = make_runner()
+	with output() as out:
+		r.run(f":strategy {strategy.upper()}")
+	assert r.strategy == strategy
+	assert f"Using the {strategy} strategy." in out.getvalue()
+	with output() as out:
+		r.run("λa.a b")
+	assert f"Exit reason: {stop_reason.value[1]}" in out.getvalue()
+
+	with output() as out:
+		r.run(":strategy nope")
+	assert r.strategy == strategy
+	assert "Strategy must be one of" in out.getvalue()
+
+def test_other_engines_use_tree():
+	r = make_runner("nbe")
+	r.strategy = "head"
+	with output() as out:
+		res = evaluate(r, "q ((λa.a) r)")
+	assert "using tree instead" in out.getvalue()
+	assert res.text == "(q' ((λa.a) r'))"
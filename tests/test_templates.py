@@ -0,0 +1,44 @@
+import lamb_engine.nodes as lbn
+import lamb_engine.nodes.debruijn as dbn
+from conftest import make_runner, evaluate
+
+
+def bound_ids(node: lbn.Node) -> set:
+	return {n.identifier for _, n in node if n.kind == lbn.Kind.BOUND}
+
+def test_instantiate_makes_fresh_copies():
+	r = make_runner()
+	t = r.macro_templates["FAC"]
+	a = t.instantiate()
+	b = t.instantiate()
+	assert str(a) == str(b) == str(r.macro_table["FAC"].left)
+	assert not (bound_ids(a) & bound_ids(b))
+	assert a.size == r.macro_table["FAC"].left.size
+
+def test_folds_are_kept():
+	r = make_runner()
+	root = r.parse("λa.(5 a)")[0]
+	lbn.expand(root, force_all = True)
+	t = lbn.Template(root.left)
+	out = t.instantiate()
+	assert any(n.kind == lbn.Kind.FOLD for _, n in out)
+	assert str(out) == str(root.left)
+
+def test_term():
+	r = make_runner()
+	t = r.macro_templates["NOT"]
+	assert t.term == dbn.from_node(r.macro_table["NOT"].left)
+
+def test_from_ops():
+	r = make_runner()
+	t = r.macro_templates["PAIR"]
+	c = lbn.Template.from_ops(t.ops, t.binders)
+	assert str(c.source) == str(t.source)
+
+def test_redefinition_replaces_template():
+	r = make_runner()
+	r.run("QA = λx.x", silent = True)
+	assert evaluate(r, "QA q").text == "q'"
+	r.run("QA = λx.(x x)", silent = True)
+	assert str(r.macro_templates["QA"].source) == "λx.(x x)"
+	assert evaluate(r, "QA q").text == "(q' q')"